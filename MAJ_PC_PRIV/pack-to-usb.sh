@@ -5,16 +5,26 @@ set -euo pipefail
 SRC="/c/dev/galerie-flask"   # ton projet côté Git Bash (C:\dev\galerie-flask)
 USB="/e"                     # ta clé USB (E:\ = /e)
 NAME="galerie-flask-$(date +%Y-%m-%d-%H%M).tar.gz"
+REPO="$USB/galerie-backup"   # dépôt incrémental DB + médias (blocs adressés par contenu)
 # ===============================
 
 OUT="$USB/$NAME"
 
-echo "🧩 Création archive (sans venv/.git/__pycache__/*.pyc) → $OUT"
+# 1) Code seul (quelques Mo) : la DB et les médias passent par tools/backup.py
+echo "🧩 Création archive du code (sans venv/.git/__pycache__/*.pyc/instance) → $OUT"
 tar -czf "$OUT" \
   --exclude='venv' \
   --exclude='.git' \
   --exclude='*/__pycache__' \
   --exclude='*.pyc' \
+  --exclude='./instance' \
   -C "$SRC" .
 
+# 2) Données : instantané SQLite à chaud + médias locaux, seuls les blocs nouveaux sont écrits
+if command -v python3 >/dev/null 2>&1; then PY=python3; else PY=python; fi
+[ -x "$SRC/venv/Scripts/python.exe" ] && PY="$SRC/venv/Scripts/python.exe"
+[ -x "$SRC/venv/bin/python" ] && PY="$SRC/venv/bin/python"
+echo "💾 Sauvegarde incrémentale → $REPO"
+(cd "$SRC" && "$PY" tools/backup.py backup "$REPO" && "$PY" tools/backup.py prune "$REPO" --keep 7)
+
 echo "✅ Archive prête: $OUT"
@@ -4,6 +4,7 @@ set -euo pipefail
 # ===== À ADAPTER =====
 ARCHIVE="/e/galerie-flask-*.tar.gz"   # chemin vers l’archive sur la clé (E:\ = /e)
 DEST="/c/dev/galerie-flask"           # dossier où vit ton projet sur le PC Privé
+REPO="/e/galerie-backup"              # dépôt incrémental écrit par pack-to-usb.sh
 # =====================
 
 # 0) Choisir la dernière archive si * correspond
@@ -11,28 +12,33 @@ LATEST_ARCHIVE="$(ls -t $ARCHIVE | head -n1)"
 [ -f "$LATEST_ARCHIVE" ] || { echo "❌ Archive introuvable: $ARCHIVE"; exit 1; }
 echo "📦 Archive détectée: $LATEST_ARCHIVE"
 
-# 1) Sauvegarder l'ancien dossier (pour préserver DB/.env si besoin)
+# 1) Sauvegarder l'ancien dossier : copie de retour arrière si l'archive ou la restauration
+#    est mauvaise (rm -rf "$DEST" && mv "$BACKUP" "$DEST")
 if [ -d "$DEST" ]; then
-  BACKUP="${DEST}.bak-$(date +%Y-%m-%d-%H%M)"
+  BACKUP="${DEST}.bak-$(date +%Y-%m-%d-%H%M%S)"
+  [ -e "$BACKUP" ] && BACKUP="$BACKUP-$$"
   echo "🗄  Backup de l'ancienne version → $BACKUP"
-  mv "$DEST" "$BACKUP"
+  mv -T "$DEST" "$BACKUP"
+  trap 'echo "❌ Échec : ancienne version intacte dans $BACKUP (rm -rf \"$DEST\" && mv \"$BACKUP\" \"$DEST\")"' ERR
 fi
 
-# 2) Extraire dans DEST
+# 2) Extraire le code dans DEST (l'archive ne contient ni instance/ ni .env)
 mkdir -p "$DEST"
-echo "📤 Extraction dans: $DEST"
+echo "📤 Extraction du code dans: $DEST"
 tar -xzf "$LATEST_ARCHIVE" -C "$DEST"
 
-# 3) Si une ancienne DB/.env existent dans le backup et que tu veux les garder, remets-les
+# 3) Reprendre .env et instance/ (DB, médias) de l'ancienne version. instance/ en liens durs :
+#    instantané et sans place en plus ; la restauration (étape 5) remplace chaque fichier
+#    modifié par un nouveau (os.replace), la copie du backup reste donc intacte.
 if [ -n "${BACKUP-}" ]; then
-  if [ -f "$BACKUP/gallery.db" ] && [ ! -f "$DEST/gallery.db" ]; then
-    echo "💾 Préserve l'ancienne DB"
-    cp "$BACKUP/gallery.db" "$DEST/gallery.db"
-  fi
   if [ -f "$BACKUP/.env" ] && [ ! -f "$DEST/.env" ]; then
     echo "🔐 Préserve l'ancien .env"
     cp "$BACKUP/.env" "$DEST/.env"
   fi
+  if [ -d "$BACKUP/instance" ] && [ ! -e "$DEST/instance" ]; then
+    echo "💾 Reprend instance/ (DB, médias)"
+    cp -al "$BACKUP/instance" "$DEST/instance" 2>/dev/null || { rm -rf "$DEST/instance"; cp -a "$BACKUP/instance" "$DEST/instance"; }
+  fi
 fi
 
 # 4) Créer/activer le venv + installer deps
@@ -53,15 +59,27 @@ fi
 pip install --upgrade pip
 pip install -r requirements.txt
 
-# 5) Migrer la DB si absente et migrations présentes
+# 5) Données : seuls les blocs différents de la DB et des médias locaux sont réécrits
+#    (application arrêtée : la base est remplacée d'un bloc)
+if [ -d "$REPO/snapshots" ]; then
+  echo "💾 Restauration incrémentale depuis $REPO"
+  python tools/backup.py restore "$REPO"
+fi
+
+# 6) Migrer la DB si absente et migrations présentes
 export FLASK_APP=app.py
-if [ ! -f gallery.db ] && [ -d migrations ]; then
+if [ ! -f instance/gallery.db ] && [ -d migrations ]; then
   echo "🛠  gallery.db absente → flask db upgrade"
   if ! flask db upgrade; then
     echo "⚠️  'flask db upgrade' a échoué (vérifie FLASK_APP/migrations)."
   fi
 fi
 
+# 7) PC privé sans accès Cloudinary : servir les médias depuis le disque
+if [ -f .env ] && ! grep -q '^STORAGE_BACKEND=' .env; then
+  echo "ℹ️  Pour un stockage 100% local, ajoute dans .env : STORAGE_BACKEND=local (fichiers sous instance/media)"
+fi
+
 echo "✅ Projet mis à jour dans: $DEST"
 echo "▶️  Pour lancer maintenant:"
 echo "    flask run"
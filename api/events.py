@@ -0,0 +1,213 @@
+# api/events.py — journal des modifications (change_event) + flux SSE /api/events
+# Rôle : chaque écriture sur les médias/dossiers ajoute ses événements dans la même
+#        transaction (ORM : hook after_flush ; SQL ensembliste : record() explicite).
+#        Hooks posés par init_app sur db.session seulement : les sessions des outils et
+#        des migrations n'écrivent pas dans change_event.
+#        Les onglets ouverts reçoivent les deltas par SSE et reprennent après une
+#        coupure depuis Last-Event-ID, au lieu de recharger listes et dossiers.
+# Un flux dure STREAM_MAX s puis se ferme : EventSource se reconnecte seul (Last-Event-ID).
+# Même process : réveil immédiat au commit ; autres workers : relecture toutes les POLL s.
+# Profil gthread : un flux tient un thread de requête pendant STREAM_MAX ; au-delà de
+# EVENTS_MAX_STREAMS flux par process (gunicorn.conf.py) → 503, et la page repasse en
+# relève courte sur /api/events/poll.
+import os, json, time, threading
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from sqlalchemy import event, inspect, select, insert, delete, func
+from extensions import db
+from models import Media, Folder, FolderStats, ChangeEvent
+
+events_bp = Blueprint("events", __name__)
+
+KEEP       = int(os.getenv("EVENTS_KEEP", "10000"))   # événements conservés (au-delà : reset client)
+POLL       = float(os.getenv("EVENTS_POLL", "2"))
+STREAM_MAX = int(os.getenv("EVENTS_STREAM_MAX", "300"))
+HEARTBEAT  = 15
+BATCH      = 200
+RETRY_MS   = 3000
+MAX_STREAMS = int(os.getenv("EVENTS_MAX_STREAMS", "0"))   # 0 = pas de plafond propre (limits.py seul)
+_streams = threading.BoundedSemaphore(MAX_STREAMS) if MAX_STREAMS > 0 else None
+E = ChangeEvent.__table__
+
+# ─── Écriture ────────────────────────────────────────────────────────────────
+def row(entity: str, op: str, entity_id=None, **data) -> dict:
+    return {"entity": entity, "op": op, "entity_id": entity_id, "created_at": datetime.utcnow(),
+            "data": json.dumps(data) if data else None}
+
+def record(entity: str, op: str, entity_id=None, **data):
+    """Ajoute un événement dans la transaction courante de db.session (écritures SQL directes)."""
+    record_many([row(entity, op, entity_id, **data)])
+
+def record_many(rows: list):
+    if not rows: return
+    db.session.execute(insert(E), rows)
+    db.session.info["change_events"] = True
+
+def _after_flush(session, flush_context):
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, Media):    rows.append(row("media", "insert", obj.id, folder_id=obj.folder_id))
+        elif isinstance(obj, Folder): rows.append(row("folder", "insert", obj.id))
+    for obj in session.dirty:
+        st = inspect(obj)
+        if isinstance(obj, Media):
+            # has_changes() et non .deleted : l'ancienne valeur manque si l'objet était expiré
+            fh = st.attrs.folder_id.history
+            if fh.has_changes() or st.attrs.url.history.has_changes() or st.attrs.public_id.history.has_changes():
+                rows.append(row("media", "update", obj.id, folder_id=obj.folder_id,
+                                from_folder=fh.deleted[0] if fh.deleted else None))
+        elif isinstance(obj, Folder):
+            if st.attrs.name.history.has_changes() or st.attrs.pinned.history.has_changes():
+                rows.append(row("folder", "update", obj.id))
+    for obj in session.deleted:
+        if isinstance(obj, Media):    rows.append(row("media", "delete", obj.id, folder_id=obj.folder_id))
+        elif isinstance(obj, Folder): rows.append(row("folder", "delete", obj.id))
+    if rows:
+        session.connection().execute(insert(E), rows)
+        session.info["change_events"] = True
+
+def _after_commit(session):
+    if session.info.pop("change_events", False):
+        _bump()
+
+def _after_rollback(session):
+    session.info.pop("change_events", None)
+
+def init_app(app):
+    """Branche le journal sur les sessions de l'application (db.session)."""
+    for name, fn in (("after_flush", _after_flush), ("after_commit", _after_commit),
+                     ("after_rollback", _after_rollback)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
+
+# ─── Réveil des flux du process ──────────────────────────────────────────────
+_cond = threading.Condition()
+_seq = 0
+
+def _bump():
+    global _seq
+    with _cond:
+        _seq += 1
+        _cond.notify_all()
+
+def seq() -> int:
+    return _seq
+
+def wait(since: int, timeout: float) -> int:
+    """Attend un commit local (ou le délai) ; renvoie le nouveau compteur."""
+    with _cond:
+        _cond.wait_for(lambda: _seq != since, timeout)
+        return _seq
+
+# ─── Lecture ─────────────────────────────────────────────────────────────────
+def last_id() -> int:
+    return db.session.execute(select(func.max(E.c.id))).scalar() or 0
+
+def start_id(header: str | None, query: str | None) -> int:
+    """Curseur de départ : Last-Event-ID (reconnexion) ou ?last_event_id, sinon « maintenant »."""
+    for raw in (header, query):
+        try:
+            if raw not in (None, ""): return max(0, int(raw))
+        except ValueError:
+            pass
+    return last_id()
+
+def _folder_summaries(ids) -> dict:
+    if not ids: return {}
+    rows = db.session.execute(select(Folder, FolderStats).outerjoin(FolderStats, Folder.id == FolderStats.folder_id)
+                              .where(Folder.id.in_(ids))).all()
+    return {f.id: {"id": f.id, "name": f.name, "pinned": bool(f.pinned), "count": st.media_count if st else 0}
+            for f, st in rows}
+
+_pruned_at = 0.0
+
+def _prune():
+    global _pruned_at
+    if time.monotonic() - _pruned_at < 60: return
+    _pruned_at = time.monotonic()
+    top = last_id()
+    if top > KEEP:
+        db.session.execute(delete(E).where(E.c.id <= top - KEEP))
+        db.session.commit()
+
+def _related(d: dict) -> list:
+    """Dossiers dont le résumé (nombre) change avec l'événement."""
+    return [d[k] for k in ("folder_id", "from_folder", "target") if d.get(k)] + list(d.get("folder_ids") or ())
+
+def poll(after: int) -> tuple[list, int]:
+    """
+    Événements d'id > after, enrichis de l'état courant (média sérialisé, résumé du
+    dossier). Curseur trop ancien (purgé) → un seul événement « reset ».
+    Aucune connexion n'est gardée entre deux appels.
+    """
+    from api.media import _serialize
+    try:
+        _prune()
+        rows = db.session.execute(select(E).where(E.c.id > after).order_by(E.c.id).limit(BATCH)).all()
+        if rows and rows[0].id > after + 1:
+            oldest = db.session.execute(select(func.min(E.c.id))).scalar()
+            if oldest is not None and oldest > after + 1:
+                top = last_id()
+                return [(top, {"op": "reset"})], top
+        if not rows: return [], after
+        data = {r.id: json.loads(r.data) if r.data else {} for r in rows}
+        mids = {r.entity_id for r in rows if r.entity == "media" and r.op in ("insert", "update")}
+        fids = {r.entity_id for r in rows if r.entity == "folder" and r.op in ("insert", "update", "move")}
+        fids |= {f for d in data.values() for f in _related(d)}
+        medias = {m.id: _serialize(m) for m in db.session.execute(select(Media).where(Media.id.in_(mids))).scalars()} if mids else {}
+        folders = _folder_summaries(fids)
+        out = []
+        for r in rows:
+            d = data[r.id]
+            ev = {"entity": r.entity, "op": r.op, "id": r.entity_id, **d}
+            if r.entity == "media" and r.op in ("insert", "update"): ev["item"] = medias.get(r.entity_id)
+            related = [r.entity_id] if r.entity == "folder" else []
+            related += _related(d)
+            ev["folders"] = [folders[f] for f in dict.fromkeys(related) if f in folders]
+            out.append((r.id, ev))
+        return out, rows[-1].id
+    finally:
+        db.session.close()
+
+def sse(event_id: int, payload: dict) -> str:
+    kind = "reset" if payload.get("op") == "reset" else "change"
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+# ─── Flux (chemin WSGI ; asgi.py sert la même route en async) ────────────────
+@events_bp.get("")
+def stream():
+    cursor = start_id(request.headers.get("Last-Event-ID"), request.args.get("last_event_id"))
+    db.session.close()
+    if _streams is not None and not _streams.acquire(blocking=False):
+        import limits
+        return limits.refuse(503, "busy", 5)
+
+    def generate():
+        nonlocal cursor
+        yield f"retry: {RETRY_MS}\n: curseur {cursor}\n\n"
+        end, beat, tick = time.monotonic() + STREAM_MAX, time.monotonic(), seq()
+        while time.monotonic() < end:
+            batch, cursor = poll(cursor)
+            for eid, ev in batch:
+                yield sse(eid, ev)
+            if batch:
+                beat = time.monotonic()
+                if len(batch) >= BATCH: continue        # rattrapage : lot suivant sans attendre
+            elif time.monotonic() - beat >= HEARTBEAT:
+                beat = time.monotonic()
+                yield ": ping\n\n"
+            tick = wait(tick, POLL)
+
+    resp = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"       # pas de mise en tampon côté proxy
+    if _streams is not None:
+        resp.call_on_close(_streams.release)
+    return resp
+
+@events_bp.get("/poll")
+def poll_once():
+    """Relève courte quand le flux est refusé : ?last_event_id= → {events, cursor}."""
+    cursor = start_id(None, request.args.get("last_event_id"))
+    batch, cursor = poll(cursor)
+    return jsonify({"ok": True, "cursor": cursor, "events": [{"event_id": eid, **ev} for eid, ev in batch]})
@@ -0,0 +1,88 @@
+# api/export.py — export du catalogue (NDJSON / CSV) en streaming
+# Rôle : sauvegardes et indexation externe sans charger toute la table en RAM
+import csv, io, json
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from sqlalchemy import select
+from extensions import db
+from models import Media, Folder
+from api.media import _guess_kind_from_url, _thumb_url
+
+export_bp = Blueprint("export", __name__)
+
+EXPORT_FIELDS = ["id", "url", "public_id", "folder_id", "folder_name",
+                 "kind", "ext", "thumb", "title", "created_at"]
+_BATCH = 500   # lignes par lot (curseur serveur + taille des morceaux HTTP)
+
+def _iter_rows(folder_id: int | None):
+    """
+    Parcourt la table media via un curseur côté serveur (stream_results) :
+    on ne sélectionne que des colonnes (pas d'objets ORM → pas d'identity map),
+    donc la mémoire reste constante quelle que soit la taille de la galerie.
+    """
+    stmt = (select(Media.id, Media.url, Media.public_id, Media.folder_id,
+                   Folder.name.label("folder_name"), Media.created_at, Media.title, Media.content_hash)
+            .outerjoin(Folder, Media.folder_id == Folder.id)
+            .order_by(Media.id.asc()))
+    if folder_id is not None:
+        stmt = stmt.where(Media.folder_id == folder_id)
+    res = db.session.execute(stmt.execution_options(stream_results=True, yield_per=_BATCH))
+    for r in res:
+        kind, ext = _guess_kind_from_url(r.url)
+        yield {
+            "id": r.id,
+            "url": r.url,
+            "public_id": r.public_id,
+            "folder_id": r.folder_id,
+            "folder_name": r.folder_name,
+            "kind": kind,
+            "ext": ext,
+            "thumb": _thumb_url(r.public_id, kind, r.url, r.id, bool(r.content_hash)),
+            "title": r.title,
+            "created_at": (r.created_at.isoformat() if hasattr(r.created_at, "isoformat") else r.created_at),
+        }
+
+def _ndjson(rows):
+    buf = []
+    for row in rows:
+        buf.append(json.dumps(row, ensure_ascii=False))
+        if len(buf) >= _BATCH:
+            yield "\n".join(buf) + "\n"; buf = []
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+def _csv(rows):
+    out = io.StringIO()
+    w = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+    w.writeheader()
+    n = 0
+    for row in rows:
+        w.writerow(row); n += 1
+        if n % _BATCH == 0:
+            yield out.getvalue(); out.seek(0); out.truncate(0)
+    if out.tell():
+        yield out.getvalue()
+
+@export_bp.get("")
+def export_catalog():
+    fmt = (request.args.get("format") or "ndjson").lower()
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"ok": False, "error": "bad_format"}), 400
+    folder_id = request.args.get("folder_id", type=int)
+    name = "galerie"
+    if folder_id is not None:
+        f = db.session.get(Folder, folder_id)
+        if not f:
+            return jsonify({"ok": False, "error": "folder_not_found"}), 404
+        name = f"galerie-folder-{f.id}"
+
+    rows = _iter_rows(folder_id)
+    if fmt == "csv":
+        body, mime = _csv(rows), "text/csv; charset=utf-8"
+    else:
+        body, mime = _ndjson(rows), "application/x-ndjson; charset=utf-8"
+    # stream_with_context : la session reste ouverte jusqu'au dernier octet envoyé
+    resp = Response(stream_with_context(body), mimetype=mime)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{name}.{fmt}"'
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
@@ -0,0 +1,140 @@
+# api/folder_stats.py — résumé par dossier (nombre par type, dernier ajout, couverture)
+# Rôle : table folder_stats tenue à jour par deltas, dans la transaction de chaque
+#        écriture (ORM : hook after_flush sur db.session, posé par init_app ;
+#        SQL ensembliste : appels explicites),
+#        pour que les listes de dossiers ne parcourent jamais la table media.
+# Reconstruction complète : flask folders rebuild-stats
+from sqlalchemy import event, inspect, select, update, delete, func, case, insert as sa_insert
+from models import Media, Folder, FolderStats
+
+KINDS       = ("photos", "videos", "audio", "documents")
+COVER_KINDS = ("photos", "videos")
+T, M = FolderStats.__table__, Media.__table__
+
+def _kind(url: str) -> str:
+    from api.media import _guess_kind_from_url
+    return _guess_kind_from_url(url)[0]
+
+class Deltas:
+    """Variations accumulées par dossier, appliquées ensuite en un UPDATE par dossier."""
+
+    def __init__(self):
+        self.by_folder = {}
+
+    def __bool__(self):
+        return bool(self.by_folder)
+
+    def _d(self, fid: int) -> dict:
+        return self.by_folder.setdefault(fid, {"media_count": 0, **{k: 0 for k in KINDS},
+                                               "last": None, "cover": None, "any": None, "removed": False})
+
+    def add(self, folder_id, url, created_at=None, media_id=None):
+        if folder_id is None: return
+        kind, d = _kind(url), self._d(folder_id)
+        d["media_count"] += 1; d[kind] += 1
+        if created_at is not None and (d["last"] is None or created_at > d["last"]):
+            d["last"] = created_at
+        if media_id:
+            d["any"] = max(d["any"] or 0, media_id)
+            if kind in COVER_KINDS: d["cover"] = max(d["cover"] or 0, media_id)
+
+    def remove(self, folder_id, url):
+        if folder_id is None: return
+        kind, d = _kind(url), self._d(folder_id)
+        d["media_count"] -= 1; d[kind] -= 1; d["removed"] = True
+
+    def apply(self, conn):
+        for fid, d in self.by_folder.items():
+            _ensure_row(conn, fid)
+            values = {c: getattr(T.c, c) + d[c] for c in ("media_count", *KINDS) if d[c]}
+            if d["removed"]:
+                # un retrait peut emporter le plus récent ou la couverture : recalcul (index folder_id)
+                values["last_added_at"] = (select(func.max(M.c.created_at))
+                                           .where(M.c.folder_id == fid).scalar_subquery())
+                values["cover_media_id"] = func.coalesce(
+                    select(M.c.id).where(M.c.id == T.c.cover_media_id, M.c.folder_id == fid).scalar_subquery(),
+                    select(func.max(M.c.id)).where(M.c.folder_id == fid).scalar_subquery())
+            else:
+                if d["last"] is not None:
+                    values["last_added_at"] = case(
+                        (T.c.last_added_at.is_(None) | (T.c.last_added_at < d["last"]), d["last"]),
+                        else_=T.c.last_added_at)
+                if d["cover"] is not None:
+                    values["cover_media_id"] = case(
+                        (T.c.cover_media_id.is_(None) | (T.c.cover_media_id < d["cover"]), d["cover"]),
+                        else_=T.c.cover_media_id)
+                elif d["any"] is not None:
+                    values["cover_media_id"] = func.coalesce(T.c.cover_media_id, d["any"])
+            if values:
+                conn.execute(update(T).where(T.c.folder_id == fid).values(**values))
+
+def _ensure_row(conn, fid: int):
+    name = conn.dialect.name
+    if name in ("postgresql", "sqlite"):
+        if name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        conn.execute(insert(T).values(folder_id=fid).on_conflict_do_nothing(index_elements=["folder_id"]))
+    elif conn.execute(select(T.c.folder_id).where(T.c.folder_id == fid)).first() is None:
+        conn.execute(sa_insert(T).values(folder_id=fid))
+
+def apply_rows(conn, added=(), removed=()):
+    """added : (folder_id, url, created_at, id) ; removed : (folder_id, url)."""
+    d = Deltas()
+    for fid, url, created, mid in added: d.add(fid, url, created, mid)
+    for fid, url in removed: d.remove(fid, url)
+    if d: d.apply(conn)
+
+def forget(conn, folder_ids):
+    conn.execute(delete(T).where(T.c.folder_id.in_(list(folder_ids))))
+
+def rebuild(conn, folder_ids=None, batch: int = 5000) -> int:
+    """Recalcule le résumé (tous les dossiers, ou ceux donnés) en un parcours de media."""
+    acc = Deltas()
+    q = select(M.c.folder_id, M.c.url, M.c.created_at, M.c.id).where(M.c.folder_id.is_not(None))
+    fq = select(Folder.__table__.c.id)
+    if folder_ids is not None:
+        folder_ids = list(folder_ids)
+        q = q.where(M.c.folder_id.in_(folder_ids))
+        fq = fq.where(Folder.__table__.c.id.in_(folder_ids))
+    for fid, url, created, mid in conn.execute(q.execution_options(stream_results=True, yield_per=batch)):
+        acc.add(fid, url, created, mid)
+    fids = list(conn.execute(fq).scalars())
+    conn.execute(delete(T) if folder_ids is None else delete(T).where(T.c.folder_id.in_(folder_ids)))
+    rows = []
+    for fid in fids:
+        d = acc.by_folder.get(fid) or acc._d(fid)
+        rows.append({"folder_id": fid, "media_count": d["media_count"], **{k: d[k] for k in KINDS},
+                     "last_added_at": d["last"], "cover_media_id": d["cover"] or d["any"]})
+    for i in range(0, len(rows), batch):
+        conn.execute(sa_insert(T), rows[i:i + batch])
+    return len(rows)
+
+# ─── Écritures ORM : deltas calculés au flush, dans la même transaction ─────────
+def _after_flush(session, flush_context):
+    deltas, gone = Deltas(), set()
+    for obj in session.deleted:
+        if isinstance(obj, Folder): gone.add(obj.id)
+        elif isinstance(obj, Media): deltas.remove(obj.folder_id, obj.url)
+    for obj in session.new:
+        if isinstance(obj, Media): deltas.add(obj.folder_id, obj.url, obj.created_at, obj.id)
+    for obj in session.dirty:
+        if not isinstance(obj, Media): continue
+        st = inspect(obj)
+        fh, uh = st.attrs.folder_id.history, st.attrs.url.history
+        if not (fh.deleted or uh.deleted): continue
+        deltas.remove(fh.deleted[0] if fh.deleted else obj.folder_id, uh.deleted[0] if uh.deleted else obj.url)
+        deltas.add(obj.folder_id, obj.url, obj.created_at, obj.id)
+    for fid in gone:
+        deltas.by_folder.pop(fid, None)
+    if not (deltas or gone): return
+    conn = session.connection()
+    if gone: forget(conn, gone)
+    if deltas: deltas.apply(conn)
+
+def init_app(app):
+    """Branche le hook de flush sur les sessions de l'application (db.session)."""
+    from extensions import db
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
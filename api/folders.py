@@ -1,16 +1,27 @@
 # api/folders.py  — COMPLET (tri A→Z, Z→A, récents, anciens, plus fournis)
 # api/folders.py  ─────────────────────────────────────────────────────────────
 # api/folders.py
+import json, base64
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import click
 from flask import Blueprint, request, jsonify
-from sqlalchemy import func
+from sqlalchemy import func, select, update, delete, exists, or_, and_
 from extensions import db
-from models import Folder, Media
+from models import Folder, Media, FolderStats
+from api import folder_stats, events
+import jobs
+import proxy_cache
 
 folders_bp = Blueprint("folders", __name__)
 
+MERGE_BATCH    = 1000   # lignes déplacées par transaction (verrous courts)
+MERGE_SYNC_MAX = 2000   # au-delà, la fusion part en tâche de fond
+MOVE_BATCH     = 200
+MOVE_WORKERS   = 4
+
 def _with_counts(query):
-    counts = dict(db.session.query(Media.folder_id, func.count(Media.id))
-                  .group_by(Media.folder_id).all())
+    counts = dict(db.session.query(FolderStats.folder_id, FolderStats.media_count).all())
     out = []
     for f in query:
         out.append({
@@ -18,7 +29,7 @@ def _with_counts(query):
             "name": f.name,
             "pinned": bool(f.pinned),
             "created_at": (f.created_at.isoformat() if hasattr(f.created_at, "isoformat") else str(f.created_at)),
-            "count": int(counts.get(f.id, 0))
+            "count": int(counts.get(f.id) or 0)
         })
     return out
 
@@ -38,15 +49,102 @@ def list_folders():
     elif sort == "oldest":
         q = q.order_by(Folder.created_at.asc())
     elif sort == "count":
-        sub = (db.session.query(Media.folder_id, func.count(Media.id).label("c"))
-               .group_by(Media.folder_id).subquery())
-        q = q.outerjoin(sub, Folder.id == sub.c.folder_id) \
-             .order_by((sub.c.c.is_(None)).asc(), sub.c.c.desc(), Folder.name.asc())
+        q = q.outerjoin(FolderStats, Folder.id == FolderStats.folder_id) \
+             .order_by(func.coalesce(FolderStats.media_count, 0).desc(), Folder.name.asc())
     else:
         q = q.order_by(Folder.name.asc())
 
     return jsonify(_with_counts(q.all()))
 
+# ─── Pagination par curseur (keyset) + saisie semi-automatique ───────────────
+PAGE_MAX = 200
+_COUNT = func.coalesce(FolderStats.media_count, 0)
+# tri → (clé, ordre décroissant ?) ; l'id sert toujours de départage
+_SORTS = {
+    "az":     (Folder.name, False),
+    "za":     (Folder.name, True),
+    "recent": (Folder.created_at, True),
+    "oldest": (Folder.created_at, False),
+    "count":  (_COUNT, True),
+}
+
+def _encode_cursor(key, fid: int) -> str:
+    if hasattr(key, "isoformat"): key = key.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([key, fid]).encode()).decode().rstrip("=")
+
+def _decode_cursor(raw: str, sort: str):
+    key, fid = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+    if sort in ("recent", "oldest"): key = datetime.fromisoformat(key)
+    return key, int(fid)
+
+def _page_item(f, st, covers: dict) -> dict:
+    from api.media import _guess_kind_from_url, _thumb_url
+    cover = None
+    if st is not None and st.cover_media_id:
+        m = covers.get(st.cover_media_id)
+        if m:
+            kind, _ = _guess_kind_from_url(m.url)
+            cover = {"id": m.id, "thumb": _thumb_url(m.public_id, kind, m.url, m.id, bool(m.content_hash))}
+    return {
+        "id": f.id, "name": f.name, "pinned": bool(f.pinned),
+        "created_at": f.created_at.isoformat() if hasattr(f.created_at, "isoformat") else f.created_at,
+        "count": st.media_count if st else 0,
+        "kinds": {k: (getattr(st, k) if st else 0) for k in folder_stats.KINDS},
+        "last_added_at": st.last_added_at.isoformat() if st and st.last_added_at else None,
+        "cover": cover,
+    }
+
+@folders_bp.get("/page")
+def folders_page():
+    """
+    Page de dossiers avec résumé (folder_stats) : ?sort=&q=&limit=&after=<curseur>.
+    mode=typeahead : {id, name} seulement, noms commençant par q
+    (lower(name) LIKE 'q%' : index ix_folder_name_lower sous Postgres).
+    """
+    sort = (request.args.get("sort") or "az").lower()
+    if sort not in _SORTS: sort = "az"
+    qtxt = (request.args.get("q") or "").strip()
+    limit = max(1, min(request.args.get("limit", type=int, default=50), PAGE_MAX))
+
+    if request.args.get("mode") == "typeahead":
+        rows = db.session.execute(
+            select(Folder.id, Folder.name).where(Folder.name.istartswith(qtxt, autoescape=True))
+            .order_by(Folder.name).limit(min(limit, 20))).all()
+        return jsonify({"ok": True, "items": [{"id": r.id, "name": r.name} for r in rows]})
+
+    key, desc = _SORTS[sort]
+    stmt = (select(Folder, FolderStats).outerjoin(FolderStats, Folder.id == FolderStats.folder_id)
+            .order_by(key.desc() if desc else key.asc(), Folder.id.desc() if desc else Folder.id.asc()))
+    if qtxt:
+        stmt = stmt.where(func.lower(Folder.name).contains(qtxt.lower(), autoescape=True))
+    after = request.args.get("after")
+    if after:
+        try:
+            last_key, last_id = _decode_cursor(after, sort)
+        except (ValueError, TypeError):
+            return jsonify({"ok": False, "error": "bad_cursor"}), 400
+        if desc:
+            stmt = stmt.where(or_(key < last_key, and_(key == last_key, Folder.id < last_id)))
+        else:
+            stmt = stmt.where(or_(key > last_key, and_(key == last_key, Folder.id > last_id)))
+    rows = db.session.execute(stmt.limit(limit + 1)).all()
+    more, rows = len(rows) > limit, rows[:limit]
+    nxt = None
+    if more:
+        f, st = rows[-1]
+        val = (st.media_count if st else 0) if sort == "count" else getattr(f, key.key)
+        nxt = _encode_cursor(val, f.id)
+    ids = [st.cover_media_id for _, st in rows if st is not None and st.cover_media_id]
+    covers = {m.id: m for m in db.session.execute(select(Media).where(Media.id.in_(ids))).scalars()} if ids else {}
+    return jsonify({"ok": True, "items": [_page_item(f, st, covers) for f, st in rows], "next": nxt})
+
+@folders_bp.cli.command("rebuild-stats")
+def rebuild_stats_cmd():
+    """Recalcule la table folder_stats : flask folders rebuild-stats"""
+    n = folder_stats.rebuild(db.session.connection())
+    db.session.commit()
+    click.echo(f"folder_stats : {n} dossier(s) recalculé(s).")
+
 @folders_bp.post("/create")
 def create_folder():
     data = request.get_json(silent=True) or {}
@@ -60,20 +158,120 @@ def create_folder():
     db.session.add(f); db.session.commit()
     return jsonify({"ok": True, "id": f.id, "name": f.name})
 
+# ─── Fusion / renommage (ensemblistes, par lots) ─────────────────────────────
+def merge_into(src_id: int, dst_id: int, batch: int = MERGE_BATCH, on_progress=None) -> int:
+    """
+    Déplace les médias par lots (UPDATE … WHERE id IN (SELECT … LIMIT n)), un commit
+    par lot, puis supprime le dossier source en SQL direct : aucune ligne n'est
+    chargée en mémoire (pas de cascade ORM) et chaque verrou reste bref.
+    """
+    moved = 0
+    returning = db.engine.dialect.update_returning
+    while True:
+        ids = select(Media.id).where(Media.folder_id == src_id).order_by(Media.id).limit(batch)
+        stmt = (update(Media).where(Media.id.in_(ids)).values(folder_id=dst_id)
+                .execution_options(synchronize_session=False))
+        conn = db.session.connection()
+        if returning:
+            # résumé folder_stats déplacé dans la même transaction que le lot
+            rows = db.session.execute(stmt.returning(Media.url, Media.created_at, Media.id)).all()
+            folder_stats.apply_rows(conn, added=[(dst_id, *r) for r in rows],
+                                    removed=[(src_id, r.url) for r in rows])
+            n = len(rows)
+        else:
+            n = db.session.execute(stmt).rowcount
+            if n: folder_stats.rebuild(conn, [src_id, dst_id])
+        if n: events.record("folder", "move", src_id, target=dst_id, count=n)
+        db.session.commit()
+        moved += n
+        if on_progress: on_progress(moved)
+        if n: continue
+        # ne supprime le dossier que s'il est vide (un upload a pu s'y glisser entre-temps)
+        gone = db.session.execute(
+            delete(Folder).where(Folder.id == src_id, ~exists().where(Media.folder_id == src_id))
+            .execution_options(synchronize_session=False)).rowcount
+        if gone:
+            folder_stats.forget(db.session.connection(), [src_id])
+            events.record("folder", "delete", src_id, merged_into=dst_id)
+        db.session.commit()
+        if db.session.get(Folder, src_id) is None:
+            return moved
+
+def move_prefix(folder_id: int, new_name: str, on_progress=None) -> dict:
+    """
+    Range côté stockage les fichiers du dossier sous BASE_FOLDER/<nouveau nom>/.
+    Tout fichier sous BASE_FOLDER/ mais ailleurs (ancien nom, renommages successifs)
+    est déplacé ; les public_id étrangers (imports, YouTube) sont laissés tels quels.
+    """
+    from api.media import _is_youtube
+    from storage import storage_for, BASE_FOLDER
+    stats = {"moved": 0, "skipped": 0, "failed": 0, "errors": []}
+
+    def _one(row):
+        st = storage_for(row.url)
+        base = st.folder_prefix(BASE_FOLDER) + "/"
+        dest = st.folder_prefix(f"{BASE_FOLDER}/{new_name}") + "/"
+        if _is_youtube(row.url) or not row.public_id.startswith(base) or row.public_id.startswith(dest):
+            return row.id, None
+        new_pid = dest + row.public_id.rsplit("/", 1)[-1]
+        return row.id, st.rename(row.public_id, new_pid, url=row.url)
+
+    last = 0
+    with ThreadPoolExecutor(max_workers=MOVE_WORKERS, thread_name_prefix="folder-move") as ex:
+        while True:
+            rows = db.session.execute(
+                select(Media.id, Media.url, Media.public_id)
+                .where(Media.folder_id == folder_id, Media.id > last)
+                .order_by(Media.id).limit(MOVE_BATCH)).all()
+            db.session.rollback()        # pas de transaction ouverte pendant les appels distants
+            if not rows: break
+            last = rows[-1].id
+            moved = []
+            futures = [ex.submit(_one, r) for r in rows]
+            for fut in futures:
+                try:
+                    mid, res = fut.result()
+                except Exception as e:
+                    stats["failed"] += 1
+                    if len(stats["errors"]) < 20: stats["errors"].append(str(e))
+                    continue
+                if res is None:
+                    stats["skipped"] += 1; continue
+                db.session.execute(update(Media).where(Media.id == mid)
+                                   .values(public_id=res["public_id"], url=res["url"]))
+                events.record("media", "update", mid, folder_id=folder_id, from_folder=folder_id)
+                moved.append(mid)
+                stats["moved"] += 1
+            db.session.commit()
+            proxy_cache.evict(moved)      # copies proxy de l'ancienne URL
+            if on_progress: on_progress(**stats)
+    return stats
+
 @folders_bp.post("/rename")
 def rename_folder():
+    """Corps : {id, new_name, move_files?} — move_files déplace aussi le préfixe distant (job)."""
     data = request.get_json(silent=True) or {}
     fid = data.get("id")
     new = (data.get("new_name") or "").strip()
     if not fid or not new:
         return jsonify({"ok": False, "error": "bad_input"}), 400
     f = Folder.query.get_or_404(fid)
-    f.name = new
+    if Folder.query.filter(func.lower(Folder.name) == new.lower(), Folder.id != f.id).first():
+        return jsonify({"ok": False, "error": "name_taken"}), 409
+    if jobs.active("folder_move", folder_id=f.id):
+        return jsonify({"ok": False, "error": "move_in_progress"}), 409
+    old, f.name = f.name, new
     db.session.commit()
-    return jsonify({"ok": True})
+    if not data.get("move_files"):
+        return jsonify({"ok": True})
+    fid = f.id
+    job = jobs.start("folder_move", lambda j: move_prefix(fid, new, on_progress=j.update),
+                     {"folder_id": fid, "from": old, "to": new})
+    return jsonify({"ok": True, "job": job.id}), 202
 
 @folders_bp.post("/merge")
 def merge_folders():
+    """Corps : {source_id, target_id, background?} — gros dossiers : tâche de fond (202 + job)."""
     data = request.get_json(silent=True) or {}
     src = data.get("source_id")
     dst = data.get("target_id")
@@ -81,7 +279,13 @@ def merge_folders():
         return jsonify({"ok": False, "error": "bad_input"}), 400
     s = Folder.query.get_or_404(src)
     d = Folder.query.get_or_404(dst)
-    Media.query.filter_by(folder_id=s.id).update({"folder_id": d.id})
-    db.session.delete(s)
-    db.session.commit()
-    return jsonify({"ok": True})
+    if jobs.active("folder_merge", source_id=s.id) or jobs.active("folder_merge", target_id=s.id):
+        return jsonify({"ok": False, "error": "merge_in_progress"}), 409
+    total = db.session.execute(select(func.count(Media.id)).where(Media.folder_id == s.id)).scalar_one()
+    sid, did = s.id, d.id
+    if data.get("background") or total > MERGE_SYNC_MAX:
+        job = jobs.start("folder_merge",
+                         lambda j: {"moved": merge_into(sid, did, on_progress=lambda n: j.update(moved=n, total=total))},
+                         {"source_id": sid, "target_id": did})
+        return jsonify({"ok": True, "job": job.id, "total": total}), 202
+    return jsonify({"ok": True, "moved": merge_into(sid, did)})
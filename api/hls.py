@@ -0,0 +1,144 @@
+# api/hls.py — lecture adaptative (HLS) des vidéos
+# Rôle : Cloudinary → manifeste du profil de streaming (sp_auto) ;
+#        stockage local → segmentation ffmpeg en tâche de fond (jobs.py), une échelle
+#        de débits limitée à la définition de la source, servie par /hls/<id>/…
+# Sortie : HLS_DIR/<media_id>/master.m3u8 + v<n>/index.m3u8 + v<n>/seg_*.ts
+import os, json, shutil, threading, subprocess
+from flask import Blueprint, jsonify, abort, send_from_directory
+from extensions import db
+from models import Media
+import jobs
+
+hls_bp = Blueprint("hls", __name__)
+
+HLS_DIR = os.getenv("HLS_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "hls")
+WORKERS = int(os.getenv("HLS_WORKERS", "1"))     # ffmpeg est gourmand : segmentations en file
+SEGMENT = 6                                      # durée cible d'un segment (s)
+TIMEOUT = 3600
+
+# Lecteur hls.js (navigateurs sans HLS natif) : copie servie par /static, précachée par le
+# service worker ; tools/vendor_hls.py la télécharge. CDN (même version) tant qu'elle manque.
+HLS_JS_VERSION = "1.5.20"
+HLS_JS_VENDOR  = "js/vendor/hls.min.js"
+HLS_JS_CDN     = f"https://cdn.jsdelivr.net/npm/hls.js@{HLS_JS_VERSION}/dist/hls.min.js"
+
+# (hauteur, débit vidéo, débit max, débit audio)
+LADDER = [
+    (360,  "800k",  "856k",  "96k"),
+    (720,  "2800k", "2996k", "128k"),
+    (1080, "5000k", "5350k", "192k"),
+]
+MASTER = "master.m3u8"
+_MIME  = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t"}
+
+_slots = threading.BoundedSemaphore(max(1, WORKERS))
+
+def _ffmpeg(name: str = "ffmpeg") -> str | None:
+    return shutil.which(name)
+
+def _dir(media_id: int) -> str:
+    return os.path.join(HLS_DIR, str(int(media_id)))
+
+def ready_url(media_id: int) -> str:
+    return f"/hls/{media_id}/{MASTER}" if os.path.exists(os.path.join(_dir(media_id), MASTER)) else ""
+
+def manifest_url(m: Media) -> str:
+    """Manifeste disponible tout de suite (backend ou segmentation déjà faite), sinon ""."""
+    from storage import storage_for
+    return storage_for(m.url).streaming_url(m.public_id, m.url) or ready_url(m.id)
+
+def discard(media_ids):
+    for mid in media_ids:
+        shutil.rmtree(_dir(mid), ignore_errors=True)
+
+# ─── Segmentation locale ─────────────────────────────────────────────────────
+def _probe(src: str) -> tuple[int, bool]:
+    """(hauteur de la vidéo, piste audio présente ?) via ffprobe."""
+    out = subprocess.run([_ffmpeg("ffprobe") or "ffprobe", "-v", "error", "-show_entries",
+                          "stream=codec_type,height", "-of", "json", src],
+                         check=True, capture_output=True, timeout=60).stdout
+    streams = json.loads(out or b"{}").get("streams", [])
+    height = max((s.get("height") or 0 for s in streams if s.get("codec_type") == "video"), default=0)
+    return height, any(s.get("codec_type") == "audio" for s in streams)
+
+def _command(src: str, out_dir: str, height: int, audio: bool) -> list:
+    # pas d'agrandissement : paliers ≤ source (au moins le plus bas)
+    rungs = [r for r in LADDER if r[0] <= height] or LADDER[:1]
+    n = len(rungs)
+    split = f"[0:v]split={n}" + "".join(f"[s{i}]" for i in range(n)) + ";" + ";".join(
+        f"[s{i}]scale=-2:'min({h},ih)'[v{i}]" for i, (h, *_r) in enumerate(rungs))
+    cmd = [_ffmpeg() or "ffmpeg", "-loglevel", "error", "-y", "-i", src, "-filter_complex", split]
+    for i, (h, rate, maxrate, arate) in enumerate(rungs):
+        cmd += ["-map", f"[v{i}]", f"-c:v:{i}", "libx264", "-preset", "veryfast", f"-b:v:{i}", rate,
+                f"-maxrate:v:{i}", maxrate, f"-bufsize:v:{i}", maxrate]
+        if audio:
+            cmd += ["-map", "0:a:0", f"-c:a:{i}", "aac", f"-b:a:{i}", arate, "-ac", "2"]
+    # images clés alignées sur les segments : bascule de débit propre d'un palier à l'autre
+    cmd += ["-sc_threshold", "0", "-force_key_frames", f"expr:gte(t,n_forced*{SEGMENT})",
+            "-f", "hls", "-hls_time", str(SEGMENT), "-hls_playlist_type", "vod",
+            "-hls_segment_filename", os.path.join(out_dir, "v%v", "seg_%03d.ts"),
+            "-master_pl_name", MASTER,
+            "-var_stream_map", " ".join(f"v:{i},a:{i}" if audio else f"v:{i}" for i in range(n)),
+            os.path.join(out_dir, "v%v", "index.m3u8")]
+    return cmd
+
+def segment(media_id: int, job=None) -> dict:
+    """Segmente la vidéo dans un dossier temporaire, puis le publie d'un bloc (rename)."""
+    from api.thumbs import _fetch_source
+    m = db.session.get(Media, media_id)
+    if not m: raise LookupError("media_not_found")
+    db.session.close()          # pas de connexion gardée pendant l'attente ni pendant ffmpeg
+    if job: job.update(step="queued")
+    with _slots:
+        if ready_url(media_id): return {"url": ready_url(media_id)}
+        if job: job.update(step="source")
+        src, _digest, is_tmp = _fetch_source(m)
+        tmp_dir = _dir(media_id) + ".part"
+        shutil.rmtree(tmp_dir, ignore_errors=True); os.makedirs(tmp_dir)
+        try:
+            height, audio = _probe(src)
+            if job: job.update(step="segment", height=height)
+            subprocess.run(_command(src, tmp_dir, height, audio), check=True, timeout=TIMEOUT)
+            shutil.rmtree(_dir(media_id), ignore_errors=True)
+            os.replace(tmp_dir, _dir(media_id))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        finally:
+            if is_tmp and os.path.exists(src): os.remove(src)
+    return {"url": ready_url(media_id)}
+
+def schedule(m: Media):
+    """Lance (une seule fois) la segmentation d'une vidéo locale ; None si rien à faire."""
+    from api.media import _guess_kind_from_url
+    if manifest_url(m) or _guess_kind_from_url(m.url)[0] != "videos" or not _ffmpeg(): return None
+    job = jobs.active("hls", media_id=m.id)
+    if job: return job
+    mid = m.id
+    return jobs.start("hls", lambda job: segment(mid, job), {"media_id": mid})
+
+# ─── Routes ──────────────────────────────────────────────────────────────────
+@hls_bp.get("/api/media/<int:media_id>/hls")
+def hls_status(media_id: int):
+    from api.media import _is_youtube
+    m = db.session.get(Media, media_id)
+    if not m or _is_youtube(m.url):
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    url = manifest_url(m)
+    if url:
+        return jsonify({"ok": True, "url": url})
+    job = schedule(m)
+    if not job:
+        return jsonify({"ok": False, "error": "unsupported"}), 404
+    return jsonify({"ok": True, "url": None, "job": job.id}), 202
+
+@hls_bp.get("/hls/<int:media_id>/<path:name>")
+def hls_file(media_id: int, name: str):
+    ext = os.path.splitext(name)[1].lower()
+    if ext not in _MIME: abort(404)
+    resp = send_from_directory(_dir(media_id), name, mimetype=_MIME[ext], conditional=True, max_age=3600)
+    if ext == ".ts":
+        # un segment publié n'est jamais réécrit (nouvelle segmentation = nouveau dossier)
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
@@ -0,0 +1,142 @@
+# api/importer.py — import en masse de médias déjà hébergés (manifest NDJSON/CSV)
+# Rôle : logique partagée par POST /api/media/import et `flask media import`
+import csv, io, json
+from datetime import datetime
+from sqlalchemy import select, func, insert as sa_insert
+from extensions import db
+from models import Media, Folder
+from api import folder_stats, events
+
+DEFAULT_FOLDER = "General"
+BATCH_SIZE     = 500
+
+def _dialect_insert(table):
+    """INSERT ... ON CONFLICT DO NOTHING selon le moteur (Postgres/SQLite)."""
+    name = db.engine.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
+def iter_manifest(stream, fmt: str = "ndjson"):
+    """
+    Lit un manifest ligne par ligne (flux binaire ou texte) et renvoie des dicts
+    {url, public_id, folder}. Colonnes acceptées : url, public_id, folder|folder_name.
+    """
+    if isinstance(stream, io.TextIOBase):
+        text_stream = stream
+    else:
+        text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        rows = csv.DictReader(text_stream)
+    else:
+        rows = (json.loads(line) for line in text_stream if line.strip())
+    for r in rows:
+        yield {
+            "url": (r.get("url") or "").strip(),
+            "public_id": (r.get("public_id") or "").strip(),
+            "folder": (r.get("folder") or r.get("folder_name") or "").strip() or DEFAULT_FOLDER,
+        }
+
+def _chunks(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch; batch = []
+    if batch:
+        yield batch
+
+def resolve_folders(names, cache: dict) -> dict:
+    """
+    Résout (ou crée) en une passe les dossiers d'un lot. `cache` : nom en minuscules → id,
+    conservé d'un lot à l'autre pour ne requêter que les noms jamais vus.
+    """
+    wanted = {}
+    for n in names:
+        wanted.setdefault(n.lower(), n)       # première orthographe rencontrée
+    missing = [k for k in wanted if k not in cache]
+    if not missing:
+        return cache
+
+    def _lookup():
+        q = select(Folder.id, func.lower(Folder.name)).where(func.lower(Folder.name).in_(missing))
+        for fid, lname in db.session.execute(q):
+            cache[lname] = fid
+
+    _lookup()
+    to_create = [wanted[k] for k in missing if k not in cache]
+    if to_create:
+        now = datetime.utcnow()
+        values = [{"name": n, "pinned": False, "created_at": now} for n in to_create]
+        ins = _dialect_insert(Folder.__table__)
+        if ins is not None:
+            db.session.execute(ins.values(values).on_conflict_do_nothing(index_elements=["name"]))
+        else:
+            db.session.execute(sa_insert(Folder.__table__), values)
+        _lookup()
+    return cache
+
+def _insert_media(values) -> int:
+    ins = _dialect_insert(Media.__table__)
+    if ins is not None:
+        # RETURNING : seules les lignes réellement insérées alimentent folder_stats
+        rows = db.session.execute(ins.values(values).on_conflict_do_nothing(index_elements=["public_id"])
+                                  .returning(Media.folder_id, Media.url, Media.created_at, Media.id)).all()
+        folder_stats.apply_rows(db.session.connection(), added=rows)
+        if rows: _record_import([r.folder_id for r in rows])
+        return len(rows)
+    # Moteur sans ON CONFLICT : on filtre les public_id déjà présents
+    ids = [v["public_id"] for v in values]
+    seen = set(db.session.execute(select(Media.public_id).where(Media.public_id.in_(ids))).scalars())
+    fresh = [v for v in values if v["public_id"] not in seen]
+    if fresh:
+        db.session.execute(sa_insert(Media.__table__), fresh)
+        folder_stats.rebuild(db.session.connection(), {v["folder_id"] for v in fresh})
+        _record_import([v["folder_id"] for v in fresh])
+    return len(fresh)
+
+def _record_import(folder_ids):
+    # un événement par lot (et non par ligne) : les clients rechargent les vues concernées
+    fids = sorted({f for f in folder_ids if f is not None})
+    events.record("media", "import", None, folder_ids=fids, count=len(folder_ids))
+
+def import_rows(rows, batch_size: int = BATCH_SIZE):
+    """
+    Insère les lignes par lots (un INSERT multi-lignes + un commit par lot)
+    et produit un dict de progression après chaque lot.
+    """
+    from api.media import _yt_id, _is_youtube
+    folders = {}
+    totals = {"rows": 0, "inserted": 0, "skipped": 0, "invalid": 0}
+    for n, batch in enumerate(_chunks(rows, batch_size), start=1):
+        valid = []
+        for r in batch:
+            pid = r["public_id"]
+            if not pid and _is_youtube(r["url"]) and _yt_id(r["url"]):
+                pid = f"yt:{_yt_id(r['url'])}"
+            if not r["url"] or not pid:
+                totals["invalid"] += 1
+                continue
+            valid.append({**r, "public_id": pid})
+
+        inserted = 0
+        if valid:
+            resolve_folders([r["folder"] for r in valid], folders)
+            now = datetime.utcnow()
+            uniq = {}
+            for r in valid:
+                uniq.setdefault(r["public_id"], {
+                    "url": r["url"], "public_id": r["public_id"],
+                    "folder_id": folders[r["folder"].lower()], "created_at": now,
+                })
+            inserted = _insert_media(list(uniq.values()))
+            db.session.commit()
+
+        totals["rows"] += len(batch)
+        totals["inserted"] += inserted
+        totals["skipped"] += len(valid) - inserted
+        yield {"batch": n, **totals}
@@ -0,0 +1,12 @@
+# api/jobs.py — suivi des tâches de fond (fusion de dossiers, déplacements de fichiers…)
+from flask import Blueprint, jsonify
+import jobs
+
+jobs_bp = Blueprint("jobs", __name__)
+
+@jobs_bp.get("/<job_id>")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"ok": False, "error": "job_not_found"}), 404
+    return jsonify({"ok": True, "job": job.as_dict()})
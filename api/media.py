@@ -1,22 +1,17 @@
 # api/media.py
-import os, re
-from flask import Blueprint, request, jsonify
+import re, json, shutil, tempfile, logging
+import click
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from sqlalchemy import func
 from extensions import db
 from models import Media, Folder
+from api.importer import iter_manifest, import_rows, BATCH_SIZE
+from storage import get_storage, storage_for, BASE_FOLDER
+from api.thumbs import can_render, PRESETS as THUMB_PRESETS
+from api import hls, metadata, similar, youtube
+import proxy_cache
 
-import cloudinary
-import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
-
-# Cloudinary
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True,
-)
-BASE_FOLDER = os.getenv("CLOUDINARY_FOLDER", "galerie-flask")
+log = logging.getLogger(__name__)
 
 media_bp = Blueprint("media", __name__)
 
@@ -64,24 +59,47 @@ def _guess_kind_from_url(url: str):
     # Par défaut on range dans documents (plus sûr que "photos")
     return ("documents", ext or "")
 
-def _thumb_url(public_id: str, kind: str, url:str) -> str:
-    if kind=="videos":
-        if _is_youtube(url):
-            vid=_yt_id(url)
-            return f"https://img.youtube.com/vi/{vid}/hqdefault.jpg" if vid else ""
-        u,_=cloudinary_url(public_id, resource_type="video", type="upload", format="jpg",
-                           transformation=[{"width":480,"height":320,"crop":"fill","gravity":"auto",
-                                            "quality":"auto","fetch_format":"auto","start_offset":"auto"}])
-        return u
-    if kind=="photos":
-        u,_=cloudinary_url(public_id, resource_type="image", type="upload",
-                           transformation=[{"width":480,"height":320,"crop":"fill","gravity":"auto",
-                                            "quality":"auto","fetch_format":"auto"}])
-        return u
-    return ""
+def _thumb_url(public_id: str, kind: str, url:str, media_id: int | None = None, mirrored: bool = False) -> str:
+    if kind=="videos" and _is_youtube(url):
+        # miniature recopiée en local (api/youtube.py) ; lien direct en attendant
+        if mirrored and media_id is not None: return f"/thumb/{media_id}/auto"
+        vid=_yt_id(url)
+        return f"https://img.youtube.com/vi/{vid}/hqdefault.jpg" if vid else ""
+    u = storage_for(url).thumbnail(public_id, kind, url) if kind in ("videos","photos") else ""
+    # Pas de dérivé côté stockage (disque local, PDF…) → service local /thumb
+    # (auto : taille selon les client hints, « m » à défaut)
+    if not u and media_id is not None and can_render(kind, _ext_from_url(url)):
+        u = f"/thumb/{media_id}/auto"
+    return u
+
+# Dérivés par paliers de largeur : le navigateur choisit selon la taille affichée et le DPR
+GRID_WIDTHS   = (240, 480, 960)          # cartes : cadrage 3:2, comme la miniature par défaut
+SCREEN_WIDTHS = (1024, 1600, 2560)       # visionneuse : proportions conservées, jamais agrandi
+GRID_SIZES    = "(min-width: 900px) 280px, (min-width: 480px) 220px, 50vw"
+SCREEN_SIZES  = "92vw"
+
+def _srcset(pairs) -> str:
+    return ", ".join(f"{u} {w}w" for u, w in pairs if u)
+
+def _responsive(m: Media, kind: str, thumb: str) -> dict:
+    """srcset/sizes des cartes (+ display_srcset pour la visionneuse photo)."""
+    if not thumb or (_is_youtube(m.url) and not thumb.startswith("/thumb/")):
+        return {}
+    if thumb.startswith("/thumb/"):
+        grid = [(f"/thumb/{m.id}/{p}", THUMB_PRESETS[p][0]) for p in ("s", "m", "l")]
+        screen = [(f"/thumb/{m.id}/xl", THUMB_PRESETS["xl"][0])]
+    else:
+        st = storage_for(m.url)
+        grid = [(st.thumbnail(m.public_id, kind, m.url, w, w * 2 // 3), w) for w in GRID_WIDTHS]
+        screen = [(st.thumbnail(m.public_id, kind, m.url, w, None), w) for w in SCREEN_WIDTHS]
+    out = {"srcset": _srcset(grid), "sizes": GRID_SIZES}
+    if kind == "photos":
+        out.update(display_srcset=_srcset(screen), display_sizes=SCREEN_SIZES)
+    return out
 
 def _serialize(m: Media):
     kind, ext = _guess_kind_from_url(m.url)
+    thumb = _thumb_url(m.public_id, kind, m.url, m.id, _is_youtube(m.url) and youtube.is_mirrored(m.content_hash))
     return {
         "id": m.id,
         "url": m.url,
@@ -89,16 +107,25 @@ def _serialize(m: Media):
         "folder_id": m.folder_id,
         "kind": kind,
         "ext": ext,
-        "thumb": _thumb_url(m.public_id, kind, m.url)
+        "thumb": thumb,
+        **_responsive(m, kind, thumb),
+        **({"hls": hls.manifest_url(m)} if kind == "videos" and not _is_youtube(m.url) else {}),
+        **metadata.fields(m),
+        **({"title": m.title} if m.title else {}),
     }
 
 # ─── LIST ────────────────────────────────────────────────────────────────────
+def _search(q):
+    """?q= : titre contenant le texte (liens YouTube résolus)."""
+    qtxt = (request.args.get("q") or "").strip().lower()
+    return q.filter(func.lower(Media.title).contains(qtxt, autoescape=True)) if qtxt else q
+
 @media_bp.get("/list/<int:folder_id>")
 def list_by_folder(folder_id):
     paged  = request.args.get("mode") == "paged"
     offset = request.args.get("offset", type=int, default=0)
     limit  = request.args.get("limit",  type=int, default=60)
-    q = Media.query.filter_by(folder_id=folder_id).order_by(Media.id.desc())
+    q = _search(Media.query.filter_by(folder_id=folder_id)).order_by(Media.id.desc())
     total = q.count(); rows = q.offset(offset).limit(limit).all()
     items = [_serialize(m) for m in rows]
     if not paged:
@@ -112,7 +139,7 @@ def list_by_folder(folder_id):
 def list_all():
     offset = request.args.get("offset", type=int, default=0)
     limit  = request.args.get("limit",  type=int, default=60)
-    q = Media.query.order_by(Media.id.desc())
+    q = _search(Media.query).order_by(Media.id.desc())
     total=q.count(); rows=q.offset(offset).limit(limit).all()
     items=[_serialize(m) for m in rows]
     next_off = offset + limit
@@ -141,18 +168,27 @@ def upload():
             folder = Folder(name="General"); db.session.add(folder); db.session.commit()
 
     try:
-        res = cloudinary.uploader.upload(
-            file,
-            folder=f"{BASE_FOLDER}/{folder.name}",
-            resource_type="auto",
-            overwrite=False,
-            invalidate=True
-        )
-        media = Media(folder_id=folder.id, public_id=res["public_id"], url=res["secure_url"])
+        res = get_storage().put(file, folder=f"{BASE_FOLDER}/{folder.name}", filename=file.filename)
+        try:
+            # en-têtes du fichier local ou réponse du backend : jamais de téléchargement de
+            # l'original pendant la requête (sinon : tâche de fond, metadata.schedule)
+            meta = metadata.extract(res["public_id"], res["url"], backend=res.get("meta"), download=False) or {}
+        except Exception:
+            meta = {}            # laissé au rattrapage (flask metadata backfill)
+        media = Media(folder_id=folder.id, public_id=res["public_id"], url=res["url"], **meta)
         db.session.add(media); db.session.commit()
-        return jsonify({"ok": True, "media": _serialize(media)}), 201
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
+    # ligne insérée : un échec de planification ne doit pas se transformer en 500
+    try:
+        if media.mime is None:
+            metadata.schedule()  # puis empreinte perceptuelle si c'est une photo
+        elif media.mime.startswith("image/"):
+            similar.schedule()   # empreinte perceptuelle (doublons) en tâche de fond
+        hls.schedule(media)      # vidéo locale : segmentation HLS en tâche de fond
+    except Exception:
+        log.exception("upload media %s : tâches de fond non planifiées", media.id)
+    return jsonify({"ok": True, "media": _serialize(media)}), 201
 
 # ─── Lien YouTube ────────────────────────────────────────────────────────────
 @media_bp.post("/add_youtube")
@@ -182,20 +218,79 @@ def add_youtube():
             folder = Folder(name="General"); db.session.add(folder); db.session.commit()
 
     vid=_yt_id(url)
-    m = Media(folder_id=folder.id, url=url, public_id=f"yt:{vid or 'unknown'}")
+    if not vid:
+        return jsonify({"ok":False,"error":"bad_youtube_url"}), 400
+    # public_id unique : on renvoie l'entrée existante si la vidéo est déjà en galerie
+    ex = Media.query.filter_by(public_id=f"yt:{vid}").first()
+    if ex:
+        return jsonify({"ok":True,"media":_serialize(ex),"existing":True}), 200
+    m = Media(folder_id=folder.id, url=url, public_id=f"yt:{vid}", **metadata.extract(f"yt:{vid}", url))
     db.session.add(m); db.session.commit()
+    youtube.schedule()   # titre, durée, miniature locale en tâche de fond
     return jsonify({"ok":True,"media":_serialize(m)}), 201
 
+# ─── IMPORT en masse (manifest NDJSON / CSV) ─────────────────────────────────
+def _manifest_format(filename: str | None) -> str:
+    fmt = (request.args.get("format") or "").lower()
+    if fmt in ("ndjson", "csv"): return fmt
+    if (filename or "").lower().endswith(".csv") or "csv" in (request.mimetype or ""): return "csv"
+    return "ndjson"
+
+@media_bp.post("/import")
+def import_manifest():
+    """
+    Enregistre des médias déjà présents côté stockage (url, public_id, folder).
+    Corps : fichier multipart `manifest` ou flux brut NDJSON/CSV.
+    Réponse : NDJSON de progression, une ligne par lot inséré.
+    """
+    upload = request.files.get("manifest")
+    fmt = _manifest_format(upload.filename if upload else None)
+    batch = max(1, min(request.args.get("batch", type=int, default=BATCH_SIZE), 5000))
+    if upload:
+        # les fichiers multipart sont fermés dès le retour de la vue : copie disque (mémoire constante)
+        stream = tempfile.TemporaryFile()
+        shutil.copyfileobj(upload.stream, stream); stream.seek(0)
+    else:
+        stream = request.stream
+
+    def generate():
+        try:
+            for progress in import_rows(iter_manifest(stream, fmt), batch_size=batch):
+                yield json.dumps(progress) + "\n"
+            yield json.dumps({"done": True}) + "\n"
+        except Exception as e:
+            db.session.rollback()
+            yield json.dumps({"done": False, "error": str(e)}) + "\n"
+        finally:
+            if upload: stream.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@media_bp.cli.command("import")
+@click.argument("manifest", type=click.File("rb"))
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), default=None,
+              help="Format du manifest (déduit de l'extension sinon).")
+@click.option("--batch", type=int, default=BATCH_SIZE, show_default=True)
+def import_manifest_cmd(manifest, fmt, batch):
+    """Importe un manifest NDJSON/CSV : flask media import medias.ndjson"""
+    fmt = fmt or ("csv" if manifest.name.lower().endswith(".csv") else "ndjson")
+    last = None
+    for last in import_rows(iter_manifest(manifest, fmt), batch_size=batch):
+        click.echo(f"lot {last['batch']}: {last['rows']} lignes, {last['inserted']} insérées, "
+                   f"{last['skipped']} déjà présentes, {last['invalid']} invalides")
+    click.echo("Terminé." if last else "Manifest vide.")
+
 # ─── SUPPRESSION ─────────────────────────────────────────────────────────────
 @media_bp.delete("/<int:media_id>")
 def delete_media(media_id):
     m = Media.query.get_or_404(media_id)
     try:
         if not _is_youtube(m.url):
-            cloudinary.uploader.destroy(m.public_id, invalidate=True, resource_type="auto")
+            storage_for(m.url).delete(m.public_id, url=m.url)
     except Exception:
         pass
     db.session.delete(m); db.session.commit()
+    hls.discard([media_id]); proxy_cache.evict([media_id])
     return jsonify({"ok": True, "deleted": media_id})
 
 @media_bp.delete("/bulk")
@@ -207,9 +302,10 @@ def bulk_delete():
     for m in rows:
         try:
             if not _is_youtube(m.url):
-                cloudinary.uploader.destroy(m.public_id, invalidate=True, resource_type="auto")
+                storage_for(m.url).delete(m.public_id, url=m.url)
         except Exception:
             pass
         db.session.delete(m)
     db.session.commit()
+    hls.discard([m.id for m in rows]); proxy_cache.evict([m.id for m in rows])
     return jsonify({"ok": True, "deleted": [m.id for m in rows]})
@@ -1,21 +1,10 @@
 # api/media_cloudinary.py  — endpoints JSON (upload, list, delete)
-import os
 from flask import Blueprint, request, jsonify
 from sqlalchemy import func
 from models import db, Folder, Media
+from storage import get_storage, storage_for
 
-import cloudinary
-import cloudinary.uploader
-
-# Config Cloudinary depuis .env
-#   soit CLOUDINARY_URL=cloudinary://<key>:<secret>@<cloud>
-#   soit CLOUDINARY_CLOUD_NAME + CLOUDINARY_API_KEY + CLOUDINARY_API_SECRET
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True,
-)
+# Stockage : voir storage/ (STORAGE_BACKEND=cloudinary|local, config Cloudinary lue à l'usage)
 
 media_api = Blueprint("media_api", __name__)
 
@@ -76,15 +65,9 @@ def upload_media():
         folder = get_or_create_folder("General")
 
     try:
-        result = cloudinary.uploader.upload(
-            file,
-            folder=f"famille/{folder.name}",  # organise côté Cloudinary
-            resource_type="image",
-            overwrite=False,
-            invalidate=True,
-        )
+        result = get_storage().put(file, folder=f"famille/{folder.name}", filename=file.filename)
         public_id = result["public_id"]      # ex: famille/Album/xyz
-        secure_url = result["secure_url"]
+        secure_url = result["url"]
 
         media = Media(folder_id=folder.id, public_id=public_id, url=secure_url)
         db.session.add(media)
@@ -107,7 +90,7 @@ def upload_media():
 def delete_media(media_id):
     media = Media.query.get_or_404(media_id)
     try:
-        cloudinary.uploader.destroy(media.public_id, invalidate=True, resource_type="image")
+        storage_for(media.url).delete(media.public_id, url=media.url)
     except Exception:
         # on continue quand même à supprimer en base
         pass
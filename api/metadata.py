@@ -0,0 +1,260 @@
+# api/metadata.py — métadonnées des médias (prise de vue, dimensions, durée, type, taille)
+# Rôle : extraction unique vers des colonnes indexées de media — à l'upload, ou en
+#        rattrapage par lots (tâche de fond / flask metadata backfill) — et vue
+#        chronologique /api/timeline (compteurs par période + pages par curseur).
+# Sources, de la moins coûteuse à la plus coûteuse :
+#   backend (Cloudinary : réponse d'upload / Admin API, sans relire l'original),
+#   fichier local, puis original téléchargé (photos, vidéos, audio seulement).
+# mime non NULL = ligne traitée ; taken_at retombe sur la date d'ajout si le fichier
+# n'en dit rien, pour que toute ligne traitée soit dans l'index de la chronologie.
+import os, json, time, base64, logging, mimetypes, subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import Blueprint, request, jsonify
+from sqlalchemy import select, update, func, or_, and_, not_
+from extensions import db
+from models import Media
+import jobs
+
+log = logging.getLogger(__name__)
+
+metadata_bp = Blueprint("metadata", __name__)
+
+BATCH    = 200
+WORKERS  = int(os.getenv("METADATA_WORKERS", "4"))
+PAGE_MAX = 200
+BUCKETS_TTL = int(os.getenv("TIMELINE_BUCKETS_TTL", "60"))   # compteurs par période, mis en cache (s)
+YT_MIME  = "video/x-youtube"
+# étiquettes EXIF : sous-IFD Exif, DateTimeOriginal, DateTimeDigitized, DateTime, Orientation
+_EXIF_IFD, _DATE_ORIGINAL, _DATE_DIGITIZED, _DATE, _ORIENTATION = 0x8769, 0x9003, 0x9004, 0x0132, 0x0112
+_MIME_PREFIX = {"photos": "image/", "videos": "video/", "audio": "audio/"}
+# période → (format strftime SQLite, format to_char PostgreSQL, longueur de la clé)
+GRANULARITY = {"year": ("%Y", "YYYY", 4), "month": ("%Y-%m", "YYYY-MM", 7), "day": ("%Y-%m-%d", "YYYY-MM-DD", 10)}
+
+# ─── Extraction ──────────────────────────────────────────────────────────────
+def _parse_date(raw) -> datetime | None:
+    """Date EXIF (« 2021:05:01 12:00:00 ») ou ISO 8601 → datetime UTC naïf."""
+    s = str(raw or "").replace("\x00", "").strip()
+    if not s or s.startswith("0000"): return None
+    try:
+        d = datetime.strptime(s[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        try:
+            d = datetime.fromisoformat(s.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if d.tzinfo: d = d.astimezone(timezone.utc).replace(tzinfo=None)
+    return d if d.year >= 1900 else None
+
+def _image(path: str) -> dict:
+    from PIL import Image
+    with Image.open(path) as im:
+        w, h = im.size
+        exif = im.getexif()
+        if exif.get(_ORIENTATION) in (5, 6, 7, 8): w, h = h, w     # affichée pivotée d'un quart de tour
+        sub = exif.get_ifd(_EXIF_IFD)
+        taken = _parse_date(sub.get(_DATE_ORIGINAL) or sub.get(_DATE_DIGITIZED) or exif.get(_DATE))
+    return {"width": w, "height": h, "taken_at": taken}
+
+def _av(path: str) -> dict:
+    from api.hls import _ffmpeg
+    probe = _ffmpeg("ffprobe")
+    if not probe: return {}
+    out = subprocess.run([probe, "-v", "error", "-show_entries",
+                          "format=duration:format_tags=creation_time:stream=codec_type,width,height",
+                          "-of", "json", path], check=True, capture_output=True, timeout=60).stdout
+    info = json.loads(out or b"{}")
+    fmt = info.get("format") or {}
+    video = next((s for s in info.get("streams", []) if s.get("codec_type") == "video" and s.get("width")), {})
+    return {"width": video.get("width"), "height": video.get("height"),
+            "duration": float(fmt["duration"]) if fmt.get("duration") else None,
+            "taken_at": _parse_date((fmt.get("tags") or {}).get("creation_time"))}
+
+def from_file(path: str, kind: str) -> dict:
+    """Métadonnées lues dans le fichier (en-têtes seulement pour les images)."""
+    out = {"bytes": os.path.getsize(path)}
+    try:
+        if kind == "photos": out.update(_image(path))
+        elif kind in ("videos", "audio"): out.update(_av(path))
+    except Exception as e:                    # format non lu (HEIC sans greffon…) : taille et type seuls
+        log.debug("métadonnées illisibles (%s) : %s", path, e)
+    return out
+
+def extract(public_id: str, url: str, created_at: datetime | None = None, backend: dict | None = None,
+            download: bool = True) -> dict | None:
+    """
+    Colonnes media (taken_at, width, height, duration, mime, size_bytes) d'un fichier stocké.
+    download=False : None plutôt que télécharger l'original (laissé à schedule()).
+    """
+    from api.media import _guess_kind_from_url, _is_youtube
+    from storage import storage_for
+    fallback = created_at or datetime.utcnow()
+    if _is_youtube(url):
+        return {"mime": YT_MIME, "taken_at": fallback}
+    kind, ext = _guess_kind_from_url(url)
+    st = storage_for(url)
+    meta = backend if backend is not None else st.metadata(public_id, url)
+    if not meta:
+        local = st.local_path(public_id)
+        if local and os.path.isfile(local):
+            meta = from_file(local, kind)
+        elif kind in ("photos", "videos", "audio"):
+            if not download: return None
+            from api.thumbs import _fetch_source
+            src, _digest, is_tmp = _fetch_source(Media(public_id=public_id, url=url))
+            try:
+                meta = from_file(src, kind)
+            finally:
+                if is_tmp and os.path.exists(src): os.remove(src)
+    ext = (meta.get("format") or ext or "").lower()
+    taken = meta.get("taken_at")
+    if isinstance(taken, str): taken = _parse_date(taken)
+    return {"taken_at": taken or fallback,
+            "width": meta.get("width"), "height": meta.get("height"), "duration": meta.get("duration"),
+            "mime": mimetypes.guess_type(f"x.{ext}")[0] or "application/octet-stream",
+            "size_bytes": meta.get("bytes")}
+
+def fields(m: Media) -> dict:
+    """Métadonnées connues, pour la sérialisation d'un média."""
+    out = {k: getattr(m, k) for k in ("width", "height", "duration", "mime", "size_bytes") if getattr(m, k) is not None}
+    if m.taken_at: out["taken_at"] = m.taken_at.isoformat()
+    return out
+
+# ─── Rattrapage (lignes antérieures, imports de manifest) ────────────────────
+def backfill(job=None, batch: int = BATCH) -> dict:
+    """
+    Traite les lignes sans métadonnées par lots (curseur sur l'id), extractions en
+    parallèle hors transaction, puis un UPDATE groupé par lot. Une ligne en échec
+    (réseau, fichier absent) reste à NULL et sera reprise au prochain passage.
+    """
+    todo = select(Media.id, Media.url, Media.public_id, Media.created_at).where(Media.mime.is_(None))
+    stats = {"done": 0, "failed": 0,
+             "total": db.session.execute(select(func.count()).select_from(todo.subquery())).scalar()}
+    db.session.rollback()
+
+    def one(r):
+        try:
+            return r.id, extract(r.public_id, r.url, r.created_at)
+        except Exception as e:
+            log.warning("métadonnées media %s : %s", r.id, e)
+            return r.id, None
+
+    last = 0
+    with ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="metadata") as ex:
+        while True:
+            rows = db.session.execute(todo.where(Media.id > last).order_by(Media.id).limit(batch)).all()
+            db.session.rollback()        # pas de transaction ouverte pendant les lectures distantes
+            if not rows: break
+            last = rows[-1].id
+            values = []
+            for mid, meta in ex.map(one, rows):
+                if meta is None: stats["failed"] += 1
+                else: values.append({"id": mid, **meta})
+            if values:
+                db.session.execute(update(Media), values)      # UPDATE groupé par clé primaire
+                db.session.commit()
+            stats["done"] += len(values)
+            if job: job.update(**stats)
+    return stats
+
+def _backfill_then_phash(job):
+    stats = backfill(job)
+    if stats["done"]:
+        from api import similar
+        similar.schedule()       # empreintes : photos reconnues seulement une fois le mime rempli
+    return stats
+
+def schedule():
+    """Lance l'extraction des métadonnées manquantes (un seul job à la fois)."""
+    return jobs.active("metadata") or jobs.start("metadata", _backfill_then_phash)
+
+@metadata_bp.post("/api/media/metadata/backfill")
+def backfill_start():
+    return jsonify({"ok": True, "job": schedule().id}), 202
+
+@metadata_bp.cli.command("backfill")
+@click.option("--batch", type=int, default=BATCH, show_default=True)
+def backfill_cmd(batch):
+    """Extrait les métadonnées manquantes : flask metadata backfill"""
+    class _Echo:
+        def update(self, **s): click.echo(f"{s['done']}/{s['total']} traités, {s['failed']} en échec")
+    stats = backfill(_Echo(), batch)
+    click.echo(f"Terminé : {stats['done']} traités, {stats['failed']} en échec.")
+
+# ─── Chronologie ─────────────────────────────────────────────────────────────
+def _bucket(granularity: str):
+    sqlite_fmt, pg_fmt, _n = GRANULARITY[granularity]
+    if db.engine.dialect.name == "postgresql":
+        return func.to_char(Media.taken_at, pg_fmt)
+    return func.strftime(sqlite_fmt, Media.taken_at)
+
+def _period_end(raw: str) -> datetime:
+    """« 2024 », « 2024-05 » ou « 2024-05-17 » → début de la période suivante."""
+    parts = [int(x) for x in raw.split("-")]
+    if len(parts) == 1: return datetime(parts[0] + 1, 1, 1)
+    if len(parts) == 2: return datetime(parts[0] + parts[1] // 12, parts[1] % 12 + 1, 1)
+    return datetime.fromordinal(datetime(*parts).toordinal() + 1)
+
+_buckets_cache: dict = {}      # (période, dossier, type) → (instant, compteurs)
+
+def _buckets(gran: str, cond: list, key: tuple) -> list:
+    """Compteurs par période : GROUP BY sur toute la sélection, donc calculés au plus
+    une fois par BUCKETS_TTL et par filtre (par process)."""
+    hit = _buckets_cache.get(key)
+    if hit and time.monotonic() - hit[0] < BUCKETS_TTL: return hit[1]
+    b = _bucket(gran).label("bucket")
+    counts = db.session.execute(select(b, func.count()).where(*cond).group_by(b).order_by(b.desc())).all()
+    out = [{"key": k, "count": c} for k, c in counts]
+    if len(_buckets_cache) > 256: _buckets_cache.clear()
+    _buckets_cache[key] = (time.monotonic(), out)
+    return out
+
+def _encode_cursor(taken: datetime, mid: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([taken.isoformat(), mid]).encode()).decode().rstrip("=")
+
+def _decode_cursor(raw: str):
+    taken, mid = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+    return datetime.fromisoformat(taken), int(mid)
+
+@metadata_bp.get("/api/timeline")
+def timeline():
+    """
+    ?granularity=year|month|day &folder_id= &kind= &limit= &after=<curseur> &at=<période> &buckets=1
+    Médias du plus récent au plus ancien (taken_at, id) par parcours d'index ; at=2024-05
+    saute directement à cette période. buckets=1 ajoute les compteurs par période (en cache).
+    """
+    from api.media import _serialize
+    gran = (request.args.get("granularity") or "month").lower()
+    if gran not in GRANULARITY:
+        return jsonify({"ok": False, "error": "bad_granularity"}), 400
+    limit = max(1, min(request.args.get("limit", type=int, default=60), PAGE_MAX))
+    cond = [Media.taken_at.is_not(None)]
+    folder_id = request.args.get("folder_id", type=int)
+    if folder_id is not None: cond.append(Media.folder_id == folder_id)
+    kind = (request.args.get("kind") or "").lower()
+    if kind in _MIME_PREFIX:
+        cond.append(Media.mime.startswith(_MIME_PREFIX[kind]))
+    elif kind == "documents":
+        cond.append(not_(or_(*(Media.mime.startswith(p) for p in _MIME_PREFIX.values()))))
+
+    page = cond[:]
+    try:
+        if request.args.get("after"):
+            taken, mid = _decode_cursor(request.args["after"])
+            page.append(or_(Media.taken_at < taken, and_(Media.taken_at == taken, Media.id < mid)))
+        elif request.args.get("at"):
+            page.append(Media.taken_at < _period_end(request.args["at"]))
+    except (ValueError, TypeError):
+        return jsonify({"ok": False, "error": "bad_cursor"}), 400
+
+    rows = db.session.execute(select(Media).where(*page)
+                              .order_by(Media.taken_at.desc(), Media.id.desc()).limit(limit + 1)).scalars().all()
+    more, rows = len(rows) > limit, rows[:limit]
+    n = GRANULARITY[gran][2]
+    out = {"ok": True, "granularity": gran,
+           "items": [{**_serialize(m), "bucket": m.taken_at.isoformat()[:n]} for m in rows],
+           "next": _encode_cursor(rows[-1].taken_at, rows[-1].id) if more else None}
+    if request.args.get("buckets") in ("1", "true"):
+        out["buckets"] = _buckets(gran, cond, (gran, folder_id, kind))
+    return jsonify(out)
@@ -0,0 +1,296 @@
+# api/similar.py — photos presque identiques (rafales, ré-exports) par hachage perceptuel
+# Rôle : empreinte dHash 64 bits de chaque photo, calculée en tâche de fond et rangée
+#        dans media.phash (BIGINT signé) ; recherche par distance de Hamming.
+#   GET  /api/media/similar/<id>   photos proches d'une photo (balayage vectorisé)
+#   POST /api/media/duplicates     groupes de doublons d'un dossier ou de toute la galerie (job)
+# NumPy (optionnel) : XOR + popcount sur un tableau uint64 compact. Les doublons passent
+# par un index multiple (multi-index hashing) : avec un seuil t, l'empreinte est coupée en
+# t+1 bandes et deux photos à distance ≤ t ont forcément une bande identique (tiroirs) ;
+# seules les photos d'une même case sont comparées, au lieu de n² paires.
+# Mesure : tools/bench_phash.py (100k empreintes aléatoires, seuil 6 : moins d'une seconde
+# avec NumPy, quelques secondes sans ; les cases se remplissent vite quand le seuil monte).
+import io, os, time, logging, threading
+from flask import Blueprint, request, jsonify
+from sqlalchemy import select, update, func
+from extensions import db
+from models import Media
+import jobs
+
+log = logging.getLogger(__name__)
+
+similar_bp = Blueprint("similar", __name__)
+
+BATCH         = 200
+WORKERS       = int(os.getenv("PHASH_WORKERS", "4"))
+SIMILAR_MAX   = 16       # distance par défaut de /similar (sur 64 bits)
+DUP_THRESHOLD = 6        # distance par défaut des doublons
+DUP_MAX       = 10       # au-delà, des bandes trop étroites : cases trop pleines
+INDEX_TTL     = 30       # secondes avant relecture de l'index (écritures d'autres workers)
+CHUNK         = 2048     # lignes comparées d'un coup dans une case (mémoire bornée)
+_U64 = 1 << 64
+
+def _np():
+    """NumPy (optionnel) : recherche vectorisée ; sinon boucles Python (int.bit_count)."""
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+# ─── Empreinte ───────────────────────────────────────────────────────────────
+def dhash(im) -> int:
+    """dHash : 8 lignes × 8 comparaisons de pixels voisins sur une vignette 9×8 en gris."""
+    from PIL import Image
+    g = im.convert("L").resize((9, 8), Image.LANCZOS).tobytes()
+    v = 0
+    for r in range(8):
+        row = g[r * 9:(r + 1) * 9]
+        for c in range(8):
+            v = (v << 1) | (row[c] > row[c + 1])
+    return v
+
+def to_db(h: int) -> int:
+    return h - _U64 if h >= 1 << 63 else h
+
+def from_db(v: int) -> int:
+    return v % _U64
+
+def _small(fp):
+    """Image réduite chargée en mémoire (JPEG décodé directement à l'échelle), fichier refermé."""
+    from PIL import Image, ImageOps
+    with Image.open(fp) as im:
+        im.draft("RGB", (64, 64))
+        # orientation EXIF appliquée : la photo pivotée et son ré-export « à plat » se ressemblent
+        return ImageOps.exif_transpose(im)
+
+def compute(m) -> int:
+    """Empreinte d'une photo : fichier local, sinon dérivé de 64 px du backend, sinon l'original."""
+    from storage import storage_for
+    st = storage_for(m.url)
+    local = st.local_path(m.public_id)
+    if local and os.path.isfile(local):
+        return dhash(_small(local))
+    small = st.thumbnail(m.public_id, "photos", m.url, 64, None)
+    if small:
+        import requests
+        r = requests.get(small, headers={"Accept": "image/jpeg,image/png,image/*"}, timeout=20)
+        r.raise_for_status()
+        return dhash(_small(io.BytesIO(r.content)))
+    from api.thumbs import _fetch_source
+    src, _digest, is_tmp = _fetch_source(m)
+    try:
+        return dhash(_small(src))
+    finally:
+        if is_tmp and os.path.exists(src): os.remove(src)
+
+# ─── Calcul en tâche de fond ─────────────────────────────────────────────────
+def _photos():
+    # mime rempli par api/metadata.py ; les SVG n'ont pas de pixels à comparer
+    return Media.mime.startswith("image/") & (Media.mime != "image/svg+xml")
+
+def backfill(job=None, batch: int = BATCH) -> dict:
+    """Photos sans empreinte, par lots (curseur sur l'id), calcul parallèle hors transaction."""
+    from concurrent.futures import ThreadPoolExecutor
+    todo = select(Media.id, Media.url, Media.public_id).where(_photos(), Media.phash.is_(None))
+    stats = {"done": 0, "failed": 0,
+             "total": db.session.execute(select(func.count()).select_from(todo.subquery())).scalar()}
+    db.session.rollback()
+
+    def one(r):
+        try:
+            return r.id, compute(r)
+        except Exception as e:
+            log.warning("phash media %s : %s", r.id, e)
+            return r.id, None
+
+    last = 0
+    with ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="phash") as ex:
+        while True:
+            rows = db.session.execute(todo.where(Media.id > last).order_by(Media.id).limit(batch)).all()
+            db.session.rollback()
+            if not rows: break
+            last = rows[-1].id
+            values = [{"id": mid, "phash": to_db(h)} for mid, h in ex.map(one, rows) if h is not None]
+            stats["failed"] += len(rows) - len(values)
+            if values:
+                db.session.execute(update(Media), values)
+                db.session.commit()
+                _index.invalidate()
+            stats["done"] += len(values)
+            if job: job.update(**stats)
+    return stats
+
+def schedule():
+    """Lance le calcul des empreintes manquantes (un seul job à la fois)."""
+    return jobs.active("phash") or jobs.start("phash", backfill)
+
+# ─── Index en mémoire ────────────────────────────────────────────────────────
+class _Index:
+    """(id, dossier, empreinte) de toutes les photos hachées, relu au plus toutes les INDEX_TTL s."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data, self._at = None, 0.0
+
+    def invalidate(self):
+        self._at = 0.0
+
+    def get(self):
+        with self._lock:
+            if self._data is None or time.monotonic() - self._at > INDEX_TTL:
+                rows = db.session.execute(select(Media.id, Media.folder_id, Media.phash)
+                                          .where(Media.phash.is_not(None)).order_by(Media.id)).all()
+                ids = [r.id for r in rows]
+                folders = [r.folder_id or 0 for r in rows]
+                hashes = [from_db(r.phash) for r in rows]
+                np = _np()
+                if np is not None:
+                    ids, folders = np.array(ids, dtype=np.int64), np.array(folders, dtype=np.int64)
+                    hashes = np.array(hashes, dtype=np.uint64)
+                self._data, self._at = (ids, folders, hashes), time.monotonic()
+            return self._data
+
+_index = _Index()
+
+def _popcount(np, x):
+    if hasattr(np, "bitwise_count"): return np.bitwise_count(x)        # NumPy ≥ 2.0
+    return np.unpackbits(x.view(np.uint8)).reshape(-1, 64).sum(1)
+
+def nearest(h: int, threshold: int, folder_id: int | None = None, limit: int = 50) -> list[tuple[int, int]]:
+    """[(id, distance)] des photos à distance ≤ threshold, les plus proches d'abord."""
+    ids, folders, hashes = _index.get()
+    np = _np()
+    if np is None:
+        hits = [(mid, (h ^ x).bit_count()) for mid, f, x in zip(ids, folders, hashes)
+                if folder_id is None or f == folder_id]
+        return sorted(((m, d) for m, d in hits if d <= threshold), key=lambda t: (t[1], -t[0]))[:limit]
+    d = _popcount(np, hashes ^ np.uint64(h))
+    keep = d <= threshold
+    if folder_id is not None: keep &= folders == folder_id
+    idx = np.nonzero(keep)[0]
+    idx = idx[np.lexsort((-ids[idx], d[idx]))][:limit]
+    return [(int(ids[i]), int(d[i])) for i in idx]
+
+# ─── Doublons (index multiple + union-find) ──────────────────────────────────
+def _bands(threshold: int) -> list[tuple[int, int]]:
+    """t+1 bandes (décalage, largeur) couvrant les 64 bits, de largeurs presque égales."""
+    n = threshold + 1
+    widths = [64 // n + (1 if i < 64 % n else 0) for i in range(n)]
+    out, off = [], 0
+    for w in widths:
+        out.append((off, w)); off += w
+    return out
+
+def _pairs(np, hashes, threshold: int):
+    """Paires (i, j), i < j, à distance ≤ threshold : comparaisons limitées aux cases partagées."""
+    seen = set()
+    for off, w in _bands(threshold):
+        mask = (1 << w) - 1
+        if np is None:
+            cases = {}
+            for i, x in enumerate(hashes):
+                cases.setdefault((x >> off) & mask, []).append(i)
+            for members in cases.values():
+                for a, i in enumerate(members):
+                    for j in members[a + 1:]:
+                        if (hashes[i] ^ hashes[j]).bit_count() <= threshold: seen.add((i, j))
+            continue
+        keys = (hashes >> np.uint64(off)) & np.uint64(mask)
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for members in np.split(order, bounds):
+            if len(members) < 2: continue
+            sub = hashes[members]
+            for s in range(0, len(members), CHUNK):
+                d = _popcount(np, (sub[s:s + CHUNK, None] ^ sub[None, :]).ravel()).reshape(-1, len(members))
+                for a, b in zip(*np.nonzero(d <= threshold)):
+                    i, j = int(members[s + a]), int(members[b])
+                    if i < j: seen.add((i, j))
+    return seen
+
+def find_duplicates(folder_id: int | None = None, threshold: int = DUP_THRESHOLD, job=None) -> dict:
+    """Groupes de photos presque identiques : [{ids, keep}], keep = la plus grande (puis la plus ancienne)."""
+    t0 = time.time()
+    threshold = max(0, min(threshold, DUP_MAX))
+    ids, folders, hashes = _index.get()
+    db.session.close()
+    np = _np()
+    if folder_id is not None:
+        if np is None:
+            sel = [i for i, f in enumerate(folders) if f == folder_id]
+            ids, hashes = [ids[i] for i in sel], [hashes[i] for i in sel]
+        else:
+            sel = folders == folder_id
+            ids, hashes = ids[sel], hashes[sel]
+    if job: job.update(step="compare", photos=len(ids))
+    parent = list(range(len(ids)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]; i = parent[i]
+        return i
+
+    for i, j in _pairs(np, hashes, threshold):
+        parent[root(i)] = root(j)
+    groups = {}
+    for i in range(len(ids)):
+        groups.setdefault(root(i), []).append(int(ids[i]))
+    groups = [sorted(g) for g in groups.values() if len(g) > 1]
+
+    # photo gardée : plus grande définition, puis la plus ancienne
+    sizes = dict(db.session.execute(select(Media.id, func.coalesce(Media.width * Media.height, 0))
+                                    .where(Media.id.in_([m for g in groups for m in g]))).all()) if groups else {}
+    out = [{"ids": g, "keep": max(g, key=lambda m: (sizes.get(m, 0), -m))} for g in groups]
+    out.sort(key=lambda g: -len(g["ids"]))
+    return {"photos": len(ids), "threshold": threshold, "groups": out,
+            "duplicates": sum(len(g["ids"]) - 1 for g in out), "seconds": round(time.time() - t0, 3)}
+
+# ─── Routes ──────────────────────────────────────────────────────────────────
+@similar_bp.get("/api/media/similar/<int:media_id>")
+def similar(media_id: int):
+    """?threshold=&limit=&folder_id= — photos proches, la photo elle-même exclue."""
+    from api.media import _serialize
+    m = db.session.get(Media, media_id)
+    if not m: return jsonify({"ok": False, "error": "not_found"}), 404
+    if m.phash is None:
+        if not (m.mime or "").startswith("image/"):
+            return jsonify({"ok": False, "error": "not_a_photo"}), 400
+        try:
+            m.phash = to_db(compute(m)); db.session.commit()       # photo pas encore traitée
+            _index.invalidate()
+        except Exception as e:
+            return jsonify({"ok": False, "error": str(e)}), 502
+    threshold = max(0, min(request.args.get("threshold", type=int, default=SIMILAR_MAX), 64))
+    limit = max(1, min(request.args.get("limit", type=int, default=50), 200))
+    hits = [(mid, d) for mid, d in nearest(from_db(m.phash), threshold, request.args.get("folder_id", type=int), limit + 1)
+            if mid != media_id][:limit]
+    rows = {x.id: x for x in db.session.execute(select(Media).where(Media.id.in_([h for h, _ in hits]))).scalars()}
+    return jsonify({"ok": True, "hash": f"{from_db(m.phash):016x}",
+                    "items": [{**_serialize(rows[mid]), "distance": d} for mid, d in hits if mid in rows]})
+
+@similar_bp.post("/api/media/duplicates")
+def duplicates():
+    """Corps : {folder_id?, threshold?} → 202 + job (résultat : GET /api/jobs/<id>)."""
+    data = request.get_json(silent=True) or {}
+    folder_id = data.get("folder_id")
+    raw = data.get("threshold")
+    try:
+        threshold = DUP_THRESHOLD if raw is None else int(raw)
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "bad_threshold"}), 400
+    threshold = max(0, min(threshold, DUP_MAX))      # mêmes bornes que find_duplicates
+    job = jobs.active("duplicates", folder_id=folder_id, threshold=threshold) or jobs.start(
+        "duplicates", lambda j: find_duplicates(folder_id, threshold, j),
+        {"folder_id": folder_id, "threshold": threshold})
+    return jsonify({"ok": True, "job": job.id}), 202
+
+@similar_bp.post("/api/media/phash/backfill")
+def backfill_start():
+    return jsonify({"ok": True, "job": schedule().id}), 202
+
+@similar_bp.cli.command("backfill")
+def backfill_cmd():
+    """Calcule les empreintes manquantes : flask similar backfill"""
+    import click
+    stats = backfill()
+    click.echo(f"Terminé : {stats['done']} photos hachées, {stats['failed']} en échec.")
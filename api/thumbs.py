@@ -0,0 +1,230 @@
+# api/thumbs.py — miniatures locales (WebP/AVIF) avec cache disque de dérivés
+# Rôle : /thumb/<media_id>/<preset> pour les médias hors Cloudinary et les PDF
+#        (génération dans un pool de processus, cache par empreinte du contenu).
+#        Liens YouTube : miniature recopiée par api/youtube.py (<empreinte>_src.jpg).
+import os, shutil, hashlib, tempfile, threading, subprocess
+from concurrent.futures import ProcessPoolExecutor
+from flask import Blueprint, request, abort, send_file
+from extensions import db
+from models import Media
+import limits
+
+thumbs_bp = Blueprint("thumbs", __name__)
+
+# preset → (largeur, hauteur ou None = proportions conservées)
+PRESETS = {
+    "s":  (240, 160),
+    "m":  (480, 320),
+    "l":  (960, 640),
+    "xl": (1600, None),
+}
+# /thumb/<id>/auto : preset choisi d'après les client hints (pages HTML : en-tête Accept-CH)
+ACCEPT_CH = "Sec-CH-DPR, Sec-CH-Width, Sec-CH-Viewport-Width, DPR, Width, Viewport-Width"
+HINT_PRESETS = ("s", "m", "l")            # même cadrage 3:2 : interchangeables dans une carte
+CACHE_DIR = os.getenv("THUMB_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "thumbs")
+WORKERS   = int(os.getenv("THUMB_WORKERS", str(min(2, os.cpu_count() or 1))))
+TIMEOUT   = 60
+
+IMG_EXT = {"jpg", "jpeg", "png", "gif", "webp", "bmp", "heic", "heif", "avif", "tif", "tiff"}
+
+_pool = None
+_pool_lock = threading.Lock()
+_inflight = {}                 # (media_id, fmt) → Event : une seule génération à la fois par média
+_inflight_lock = threading.Lock()
+
+def _ffmpeg() -> str | None:
+    return shutil.which("ffmpeg")
+
+def _pdf_lib():
+    """PyMuPDF (optionnel) : `pymupdf` récent, sinon l'ancien nom `fitz`."""
+    try:
+        import pymupdf
+        return pymupdf
+    except ImportError:
+        try:
+            import fitz
+            return fitz
+        except ImportError:
+            return None
+
+def can_render(kind: str, ext: str) -> bool:
+    """Le service sait-il produire une miniature pour ce type de fichier ?"""
+    if kind == "photos":    return ext in IMG_EXT or not ext
+    if kind == "documents": return ext == "pdf" and _pdf_lib() is not None
+    if kind == "videos":    return _ffmpeg() is not None
+    return False
+
+def _pool_get() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, WORKERS))
+        return _pool
+
+def cache_path(content_hash: str, preset: str, fmt: str) -> str:
+    return os.path.join(CACHE_DIR, content_hash[:2], f"{content_hash}_{preset}.{fmt}")
+
+# ─── Génération (exécutée dans le pool de processus) ─────────────────────────
+def _open_source(src: str, source_kind: str):
+    from PIL import Image
+    if source_kind == "pdf":
+        fitz = _pdf_lib()
+        with fitz.open(src) as doc:
+            page = doc.load_page(0)
+            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    if source_kind == "video":
+        frame = src + ".frame.png"
+        subprocess.run([_ffmpeg() or "ffmpeg", "-loglevel", "error", "-y", "-ss", "1", "-i", src,
+                        "-frames:v", "1", frame], check=True, timeout=TIMEOUT)
+        try:
+            img = Image.open(frame); img.load(); return img
+        finally:
+            os.remove(frame)
+    img = Image.open(src)
+    img.draft("RGB", (PRESETS["xl"][0] * 2, PRESETS["xl"][0] * 2))   # JPEG : décodage réduit, bien plus rapide
+    return img
+
+def render_derivatives(src: str, source_kind: str, outputs: dict, fmt: str) -> list:
+    """Décode la source une fois puis écrit chaque preset (du plus grand au plus petit)."""
+    from PIL import Image, ImageOps
+    img = ImageOps.exif_transpose(_open_source(src, source_kind))
+    img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+    written = []
+    for preset in sorted(outputs, key=lambda p: -PRESETS[p][0]):
+        w, h = PRESETS[preset]
+        if h:
+            out = ImageOps.fit(img, (w, h), Image.LANCZOS)
+        else:
+            out = img.copy(); out.thumbnail((w, w * 4), Image.LANCZOS)
+        dest = outputs[preset]
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        if fmt == "avif":
+            out.save(tmp, "AVIF", quality=55)
+        else:
+            out.save(tmp, "WEBP", quality=80, method=4)
+        os.replace(tmp, dest)
+        written.append(dest)
+    return written
+
+# ─── Côté requête ────────────────────────────────────────────────────────────
+def _hint(*names) -> float | None:
+    for n in names:
+        try:
+            v = float(request.headers.get(n, ""))
+        except ValueError:
+            continue
+        if v > 0: return v
+    return None
+
+def _pick_preset() -> str:
+    """Plus petit preset couvrant la largeur affichée (Width est déjà en pixels physiques)."""
+    width = _hint("Sec-CH-Width", "Width")
+    if width is None:
+        return "m"
+    for p in HINT_PRESETS:
+        if PRESETS[p][0] >= width:
+            return p
+    return HINT_PRESETS[-1]
+
+def _pick_format() -> str:
+    from PIL import features
+    if "image/avif" in request.accept_mimetypes and features.check("avif"):
+        return "avif"
+    return "webp"
+
+def _fetch_source(m: Media) -> tuple[str, str, bool]:
+    """(chemin source, empreinte sha256, temporaire ?) — lecture en flux, jamais tout en RAM."""
+    from storage import storage_for
+    if m.public_id.startswith("yt:"):
+        # lien YouTube : l'« original » est la miniature recopiée (api/youtube.py)
+        src = cache_path(m.content_hash or "", "src", "jpg")
+        if not m.content_hash or not os.path.isfile(src): raise FileNotFoundError(src)
+        return src, m.content_hash, False
+    st = storage_for(m.url)
+    h = hashlib.sha256()
+    local = st.local_path(m.public_id)
+    if local and os.path.isfile(local):
+        with open(local, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                h.update(chunk)
+        return local, h.hexdigest(), False
+    os.makedirs(os.path.join(CACHE_DIR, "tmp"), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.join(CACHE_DIR, "tmp"))
+    with os.fdopen(fd, "wb") as out:
+        for chunk in st.stream(m.public_id, url=m.url):
+            h.update(chunk); out.write(chunk)
+    return tmp, h.hexdigest(), True
+
+def _ensure_derivatives(m: Media, kind: str, ext: str, fmt: str) -> str:
+    source_kind = {"documents": "pdf", "videos": "video"}.get(kind, "image")
+    src, digest, is_tmp = _fetch_source(m)
+    try:
+        outputs = {p: cache_path(digest, p, fmt) for p in PRESETS}
+        todo = {p: path for p, path in outputs.items() if not os.path.exists(path)}
+        if todo:
+            _pool_get().submit(render_derivatives, src, source_kind, todo, fmt).result(timeout=TIMEOUT)
+    finally:
+        if is_tmp and os.path.exists(src):
+            os.remove(src)
+    if m.content_hash != digest:
+        m.content_hash = digest
+        db.session.commit()
+    return digest
+
+@thumbs_bp.get("/thumb/<int:media_id>/<preset>")
+def thumb(media_id: int, preset: str):
+    from api.media import _guess_kind_from_url, _is_youtube
+    auto = preset == "auto"
+    if auto: preset = _pick_preset()
+    if preset not in PRESETS: abort(404)
+    m = db.session.get(Media, media_id)
+    if not m: abort(404)
+    if _is_youtube(m.url):
+        from api.youtube import is_mirrored
+        if not is_mirrored(m.content_hash): abort(404)        # miniature pas (ou plus) recopiée
+        kind, ext = "photos", "jpg"
+    else:
+        kind, ext = _guess_kind_from_url(m.url)
+    if not can_render(kind, ext): abort(404)
+    fmt = _pick_format()
+
+    path = cache_path(m.content_hash, preset, fmt) if m.content_hash else None
+    if not path or not os.path.exists(path):
+        key = (media_id, fmt)
+        with _inflight_lock:
+            ev = _inflight.get(key)
+            leader = ev is None
+            if leader:
+                ev = _inflight[key] = threading.Event()
+        try:
+            if leader:
+                # seule la génération occupe une place (limits.INLINE) ; les suiveurs attendent
+                if not limits.try_acquire("thumb"):
+                    return limits.refuse(503, "busy", 1)
+                try:
+                    digest = _ensure_derivatives(m, kind, ext, fmt)
+                finally:
+                    limits.release("thumb")
+            else:
+                ev.wait(TIMEOUT)
+                db.session.refresh(m)
+                digest = m.content_hash
+        except Exception:
+            abort(502)
+        finally:
+            if leader:
+                with _inflight_lock:
+                    _inflight.pop(key, None)
+                ev.set()
+        path = cache_path(digest, preset, fmt) if digest else None
+        if not path or not os.path.exists(path): abort(502)
+
+    resp = send_file(path, mimetype=f"image/{fmt}", conditional=True, etag=os.path.basename(path),
+                     max_age=31536000)
+    # même media_id = même contenu (pas de remplacement en place) → immuable
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    resp.headers["Vary"] = "Accept, Sec-CH-Width, Width" if auto else "Accept"
+    return resp
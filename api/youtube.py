@@ -0,0 +1,172 @@
+# api/youtube.py — liens YouTube : titre, durée et miniature résolus une fois, en tâche de fond
+# Rôle : add_youtube enregistre le lien tout de suite et planifie la résolution ; le worker
+#        interroge oEmbed (titre), l'API Data si YOUTUBE_API_KEY est définie (durée), prend
+#        la meilleure miniature disponible et la recopie dans le cache local de dérivés
+#        (api/thumbs.py). Les listes servent ensuite /thumb/<id>/… sans appel à youtube.com.
+# title NULL = pas encore résolu ; "" = résolu sans titre (vidéo privée, supprimée…).
+# YOUTUBE_FIXTURES=<dossier> : source locale au lieu du réseau (tests, hors ligne) —
+#   <id>.json ({"title": …, "duration": secondes}) et <id>.jpg facultatif ; pas de .json = vidéo inconnue.
+import os, re, json, hashlib, logging
+import click
+from flask import Blueprint, jsonify
+from sqlalchemy import select, update, func
+from extensions import db
+from models import Media
+from api import events, thumbs
+import jobs
+
+log = logging.getLogger(__name__)
+
+youtube_bp = Blueprint("youtube", __name__)
+
+BATCH    = 50
+WORKERS  = int(os.getenv("YOUTUBE_WORKERS", "4"))
+TIMEOUT  = 15
+OEMBED   = os.getenv("YOUTUBE_OEMBED_URL", "https://www.youtube.com/oembed")
+DATA_API = "https://www.googleapis.com/youtube/v3/videos"
+THUMBS   = ("maxresdefault", "sddefault", "hqdefault")   # de la meilleure à la toujours présente
+_ISO_DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?")
+
+# ─── Sources ─────────────────────────────────────────────────────────────────
+def _iso_duration(raw: str) -> float | None:
+    """Durée ISO 8601 de l'API Data (« PT1H2M3S ») → secondes."""
+    m = _ISO_DURATION.fullmatch(raw or "")
+    if not m or not any(m.groups()): return None
+    d, h, mi, s = m.groups()
+    return int(d or 0) * 86400 + int(h or 0) * 3600 + int(mi or 0) * 60 + float(s or 0)
+
+def _fixture(vid: str) -> dict | None:
+    base = os.path.join(os.getenv("YOUTUBE_FIXTURES"), vid)
+    try:
+        with open(base + ".json") as f:
+            info = json.load(f)
+    except FileNotFoundError:
+        return None
+    if os.path.isfile(base + ".jpg"):
+        with open(base + ".jpg", "rb") as f:
+            info["thumb"] = f.read()
+    return info
+
+def _remote(vid: str) -> dict | None:
+    import requests
+    info = {}
+    r = requests.get(OEMBED, params={"url": f"https://www.youtube.com/watch?v={vid}", "format": "json"},
+                     timeout=TIMEOUT)
+    if r.status_code == 404: return None             # supprimée ou privée
+    if r.ok:
+        o = r.json()
+        info["title"] = o.get("title")
+    elif r.status_code not in (401, 403):            # intégration désactivée : miniature seule
+        r.raise_for_status()
+    key = os.getenv("YOUTUBE_API_KEY")
+    if key:
+        d = requests.get(DATA_API, params={"id": vid, "part": "contentDetails", "key": key}, timeout=TIMEOUT)
+        items = d.json().get("items") if d.ok else None
+        if items: info["duration"] = _iso_duration(items[0]["contentDetails"].get("duration"))
+    for name in THUMBS:
+        t = requests.get(f"https://i.ytimg.com/vi/{vid}/{name}.jpg", timeout=TIMEOUT)
+        if t.ok and t.content:
+            info["thumb"] = t.content
+            break
+    return info
+
+def lookup(vid: str) -> dict | None:
+    """{title, duration, thumb (octets JPEG)} d'une vidéo ; None si elle n'existe pas (ou plus)."""
+    return _fixture(vid) if os.getenv("YOUTUBE_FIXTURES") else _remote(vid)
+
+# ─── Miniature locale ────────────────────────────────────────────────────────
+def mirror(data: bytes) -> str:
+    """
+    Range la miniature comme « original » du cache de dérivés (<empreinte>_src.jpg) et
+    produit les presets WebP ; /thumb/<id>/… les sert ensuite comme ceux d'une photo.
+    Renvoie l'empreinte, à ranger dans media.content_hash.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    src = thumbs.cache_path(digest, "src", "jpg")
+    if not os.path.exists(src):
+        os.makedirs(os.path.dirname(src), exist_ok=True)
+        tmp = f"{src}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, src)
+    todo = {p: path for p in thumbs.PRESETS if not os.path.exists(path := thumbs.cache_path(digest, p, "webp"))}
+    if todo:
+        thumbs._pool_get().submit(thumbs.render_derivatives, src, "image", todo, "webp").result(timeout=thumbs.TIMEOUT)
+    return digest
+
+def is_mirrored(content_hash: str | None) -> bool:
+    """Miniature recopiée par mirror() présente sur disque (sinon : lien youtube.com)."""
+    return bool(content_hash) and os.path.isfile(thumbs.cache_path(content_hash, "src", "jpg"))
+
+def resolve(vid: str) -> dict:
+    """Colonnes media (title, duration, content_hash) d'une vidéo ; exception si le réseau fait défaut."""
+    info = lookup(vid)
+    if info is None:
+        return {"title": ""}
+    out = {"title": (info.get("title") or "")[:300]}
+    if info.get("duration"): out["duration"] = float(info["duration"])
+    if info.get("thumb"): out["content_hash"] = mirror(info["thumb"])
+    return out
+
+# ─── Worker ──────────────────────────────────────────────────────────────────
+def pending(retry: bool = False):
+    cond = Media.title.is_(None) | (Media.title == "") if retry else Media.title.is_(None)
+    return select(Media.id, Media.public_id, Media.folder_id).where(Media.public_id.startswith("yt:"), cond)
+
+def backfill(job=None, batch: int = BATCH, retry: bool = False) -> dict:
+    """
+    Liens non résolus par lots (curseur sur l'id), appels réseau en parallèle hors
+    transaction, puis un UPDATE groupé et un événement par ligne (onglets ouverts
+    rafraîchis). Une ligne en échec réseau reste à NULL et sera reprise au prochain passage.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    todo = pending(retry)
+    stats = {"done": 0, "failed": 0,
+             "total": db.session.execute(select(func.count()).select_from(todo.subquery())).scalar()}
+    db.session.rollback()
+
+    def one(r):
+        try:
+            return r, resolve(r.public_id[3:])
+        except Exception as e:
+            log.warning("youtube media %s : %s", r.id, e)
+            return r, None
+
+    last = 0
+    with ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="youtube") as ex:
+        while True:
+            rows = db.session.execute(todo.where(Media.id > last).order_by(Media.id).limit(batch)).all()
+            db.session.rollback()        # pas de transaction ouverte pendant les appels réseau
+            if not rows: break
+            last = rows[-1].id
+            done = [(r, cols) for r, cols in ex.map(one, rows) if cols is not None]
+            stats["failed"] += len(rows) - len(done)
+            # UPDATE groupé par clé primaire : mêmes colonnes sur chaque ligne du lot
+            values = [{"id": r.id, "title": c["title"], "duration": c.get("duration"),
+                       "content_hash": c.get("content_hash")} for r, c in done]
+            if values:
+                db.session.execute(update(Media), values)
+                events.record_many([events.row("media", "update", r.id, folder_id=r.folder_id) for r, _ in done])
+                db.session.commit()
+            stats["done"] += len(values)
+            if job: job.update(**stats)
+    return stats
+
+def schedule():
+    """Lance la résolution des liens en attente (un seul job à la fois)."""
+    return jobs.active("youtube") or jobs.start("youtube", backfill)
+
+@youtube_bp.post("/api/media/youtube/resolve")
+def resolve_start():
+    job = schedule()
+    return jsonify({"ok": True, "job": job.id}), 202
+
+@youtube_bp.cli.command("resolve")
+@click.option("--batch", type=int, default=BATCH, show_default=True)
+@click.option("--retry", is_flag=True, help="reprend aussi les liens résolus sans titre")
+def resolve_cmd(batch, retry):
+    """Résout titres, durées et miniatures des liens YouTube : flask youtube resolve"""
+    class _Echo:
+        def update(self, **s): click.echo(f"{s['done']}/{s['total']} résolus, {s['failed']} en échec")
+    stats = backfill(_Echo(), batch, retry)
+    click.echo(f"Terminé : {stats['done']} résolus, {stats['failed']} en échec.")
@@ -1,9 +1,9 @@
 # app.py — Flask + SQLAlchemy (pool Neon robuste) + proxys fichiers
 from __future__ import annotations
-import os, sys, time, re, mimetypes
+import os, sys, time, re, html, mimetypes, hashlib
 from urllib.parse import urlparse
 
-from flask import Flask, render_template, url_for, Response, abort, request
+from flask import Flask, render_template, url_for, Response, abort, request, send_file, make_response
 from dotenv import load_dotenv
 from sqlalchemy import text
 from sqlalchemy.engine import make_url
@@ -29,6 +29,22 @@ def _choose_db_uri(app: Flask) -> str:
     return f"sqlite:///{sqlite_path}"
 
 
+# ---------- Proxy de fichiers : partagé avec asgi.py ----------
+_UA = {"User-Agent":"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome Safari"}
+
+def _guess_mime_from_url(u: str) -> str:
+    if re.search(r"\.pdf(?:$|\?)", u, re.I): return "application/pdf"
+    mt, _ = mimetypes.guess_type(u)
+    return mt or "application/octet-stream"
+
+def _iframe_page(url: str) -> str:
+    """Repli quand l'amont échoue : la visionneuse charge l'URL d'origine dans une iframe."""
+    return f"""<!doctype html>
+<html><head><meta charset="utf-8">
+<style>html,body,iframe{{margin:0;border:0;height:100%;width:100%;background:#111}}</style>
+</head><body><iframe src="{html.escape(url)}" title="Document"></iframe></body></html>"""
+
+
 def create_app() -> Flask:
     load_dotenv()
 
@@ -38,23 +54,34 @@ def create_app() -> Flask:
     # --- DB
     db_uri = _choose_db_uri(app)
     app.config["SQLALCHEMY_DATABASE_URI"] = db_uri
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_pre_ping": True,
+    # pool instrumenté (db_pool) : ping à chaque checkout, après inactivité ou aucun (DB_PING_MODE)
+    import db_pool
+    url = make_url(db_uri)
+    engine_options = {
         "pool_recycle": 280,
         "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
         "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
         "pool_timeout": 30,
-        "connect_args": {"sslmode": "require", "connect_timeout": 10},
+        **db_pool.engine_options(url),
     }
-    try:
-        url = make_url(db_uri)
-        app.logger.info("DB -> %s", url.render_as_string(hide_password=True))
-    except Exception:
-        app.logger.info("DB -> %s", db_uri)
+    if url.get_backend_name() == "postgresql":
+        engine_options["connect_args"] = {"sslmode": "require", "connect_timeout": 10}
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options
+    app.logger.info("DB -> %s", url.render_as_string(hide_password=True))
 
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "supersecret")
+    # Stockage local : laisser nginx/Apache envoyer les fichiers (X-Sendfile) si dispo
+    app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "0") in ("1", "true", "True")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # Derrière un proxy (hébergeur) : PROXY_HOPS proxys de confiance → REMOTE_ADDR et schéma
+    # lus dans X-Forwarded-For / -Proto (clé des seaux de limits.py). Tous les profils de
+    # gunicorn.conf.py ; routes servies par asgi.py : même règle (_remote).
+    hops = int(os.getenv("PROXY_HOPS", "0"))
+    if hops > 0:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=0)
+
     if app.debug:
         app.config["TEMPLATES_AUTO_RELOAD"] = True
         app.jinja_env.auto_reload = True
@@ -73,8 +100,14 @@ def create_app() -> Flask:
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Résumés de dossiers + journal des modifications : hooks de flush de db.session
+    from api import folder_stats, events
+    folder_stats.init_app(app)
+    events.init_app(app)
+
     with app.app_context():
         from models import Media, Folder  # noqa
+        db_pool.instrument(db.engine)
         try:
             if db.engine.url.get_backend_name() == "sqlite":
                 db.create_all()
@@ -86,21 +119,71 @@ def create_app() -> Flask:
     def _shutdown_session(exc=None):
         db.session.remove()
 
+    # Débit + concurrence des endpoints coûteux (upload, suppressions, proxys, miniatures)
+    import limits
+    limits.init_app(app)
+
     # Blueprints API
     from api.media import media_bp
     from api.folders import folders_bp
+    from api.export import export_bp
+    from api.thumbs import thumbs_bp
+    from api.jobs import jobs_bp
+    from api.hls import hls_bp
+    from api.events import events_bp
+    from api.metadata import metadata_bp
+    from api.similar import similar_bp
+    from api.youtube import youtube_bp
     app.register_blueprint(media_bp,   url_prefix="/api/media")
     app.register_blueprint(folders_bp, url_prefix="/api/folders")
+    app.register_blueprint(export_bp,  url_prefix="/api/export")
+    app.register_blueprint(jobs_bp,    url_prefix="/api/jobs")
+    app.register_blueprint(thumbs_bp)   # /thumb/<media_id>/<preset>
+    app.register_blueprint(hls_bp)      # /api/media/<id>/hls, /hls/<media_id>/<fichier>
+    app.register_blueprint(events_bp,  url_prefix="/api/events")
+    app.register_blueprint(metadata_bp)   # /api/timeline, /api/media/metadata/backfill
+    app.register_blueprint(similar_bp)    # /api/media/similar/<id>, /api/media/duplicates
+    app.register_blueprint(youtube_bp)    # /api/media/youtube/resolve
+
+    # CLI : flask storage reconcile
+    from storage.reconcile import storage_cli
+    app.cli.add_command(storage_cli)
 
     # Pages
     @app.route("/")
     def home():
         return render_template("index.html")
 
+    # Service worker à la racine (sa portée couvre tout le site) ; la coquille précachée
+    # reprend les URL ?v=<mtime> des pages, sa version suit donc les mêmes mtimes
+    @app.route("/sw.js")
+    def service_worker():
+        img_dir = os.path.join(app.static_folder, "img")
+        from api.hls import HLS_JS_VENDOR
+        files = ["css/main.css", "js/main.js"]
+        files += [HLS_JS_VENDOR] if os.path.exists(os.path.join(app.static_folder, HLS_JS_VENDOR)) else []
+        files += [f"img/{n}" for n in sorted(os.listdir(img_dir))] if os.path.isdir(img_dir) else []
+        tpl_dir = os.path.join(app.root_path, app.template_folder)
+        paths = [os.path.join(app.static_folder, f) for f in files]
+        paths += [os.path.join(tpl_dir, t) for t in ("base.html", "index.html", "gallery.html")]
+        stamp = "|".join(f"{p}:{int(os.stat(p).st_mtime)}" for p in paths if os.path.exists(p))
+        version = hashlib.sha1(stamp.encode()).hexdigest()[:12]
+        resp = make_response(render_template("sw.js", pages=["/", "/gallery"], static_files=files, version=version))
+        resp.mimetype = "application/javascript"
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
     @app.route("/gallery")
     @app.route("/galerie")
     def gallery():
-        return render_template("gallery.html")
+        from api.thumbs import ACCEPT_CH
+        from api.hls import HLS_JS_VENDOR, HLS_JS_CDN
+        vendor = os.path.join(app.static_folder, HLS_JS_VENDOR)
+        hls_js = (url_for("static", filename=HLS_JS_VENDOR, v=int(os.stat(vendor).st_mtime))
+                  if os.path.exists(vendor) else HLS_JS_CDN)
+        resp = make_response(render_template("gallery.html", hls_js=hls_js))
+        resp.headers["Accept-CH"] = ACCEPT_CH      # Width/DPR envoyés ensuite avec /thumb/<id>/auto
+        return resp
 
     # Debug DB
     @app.route("/__db")
@@ -113,14 +196,12 @@ def create_app() -> Flask:
             return {"url": url_str, "error": str(e)}, 500
         return {"url": url_str, "folder_count": f, "media_count": m}, 200
 
-    # ---------- Streaming helpers ----------
-    _UA = {"User-Agent":"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome Safari"}
-
-    def _guess_mime_from_url(u: str) -> str:
-        if re.search(r"\.pdf(?:$|\?)", u, re.I): return "application/pdf"
-        mt, _ = mimetypes.guess_type(u)
-        return mt or "application/octet-stream"
+    # Santé du pool de connexions (checkouts, attentes, invalidations, pings)
+    @app.route("/__pool")
+    def __pool():
+        return db_pool.stats(db.engine), 200
 
+    # ---------- Streaming helpers ----------
     def _stream_remote(url: str, filename: str | None = None, force_mime: str | None = None):
         ses = requests.Session()
         try:
@@ -138,11 +219,33 @@ def create_app() -> Flask:
             return resp
         except Exception:
             # Last resort: simple iframe fallback (still works for most viewers)
-            html = f"""<!doctype html>
-<html><head><meta charset="utf-8">
-<style>html,body,iframe{{margin:0;border:0;height:100%;width:100%;background:#111}}</style>
-</head><body><iframe src="{url}" title="Document"></iframe></body></html>"""
-            return html, 200, {"Content-Type": "text/html; charset=utf-8"}
+            return _iframe_page(url), 200, {"Content-Type": "text/html; charset=utf-8"}
+
+    # Stockage local : envoi direct depuis le disque (Range, ETag/If-Modified-Since, X-Sendfile)
+    def _send_local(path: str, filename: str | None = None, force_mime: str | None = None):
+        if not path or not os.path.isfile(path): abort(404)
+        resp = send_file(path, mimetype=force_mime or _guess_mime_from_url(path), conditional=True,
+                         download_name=filename or os.path.basename(path), max_age=3600)
+        resp.headers["Accept-Ranges"] = "bytes"
+        return resp
+
+    def _local_path_for(m) -> str | None:
+        from storage import storage_for
+        path = storage_for(m.url).local_path(m.public_id)
+        if path: return path
+        # copie complète déjà téléchargée par le proxy async (proxy_cache)
+        import proxy_cache
+        hit = proxy_cache.cached(m.id, m.url)
+        if hit and not hit[1].get("content_encoding"): return hit[0]
+        return None
+
+    @app.route("/media/<path:public_id>")
+    def local_media(public_id: str):
+        from storage import get_backend
+        resp = _send_local(get_backend("local").local_path(public_id))
+        # un public_id local n'est jamais réécrit (nom unique) → cache long
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return resp
 
     # Existing PDF proxy (kept for direct PDF opening)
     @app.route("/preview/<int:media_id>")
@@ -150,6 +253,10 @@ def create_app() -> Flask:
         from models import Media
         m = db.session.get(Media, media_id)
         if not m or not getattr(m, "url", None): abort(404)
+        local = _local_path_for(m)
+        # nom et type d'après l'URL : la copie du cache proxy s'appelle <id>.bin
+        if local: return _send_local(local, filename=os.path.basename(urlparse(m.url).path) or None,
+                                     force_mime=_guess_mime_from_url(m.url))
         return _stream_remote(m.url)
 
     # NEW: generic file proxy with extension in PATH (great for Office/Google viewers)
@@ -162,6 +269,8 @@ def create_app() -> Flask:
         if not m or not getattr(m, "url", None): abort(404)
         ext = os.path.splitext(filename)[1].lower()
         mime = mimetypes.types_map.get(ext, None) if ext else None
+        local = _local_path_for(m)
+        if local: return _send_local(local, filename=filename, force_mime=mime or _guess_mime_from_url(m.url))
         return _stream_remote(m.url, filename=filename, force_mime=mime)
 
     # alias utile si "python app.py"
@@ -0,0 +1,280 @@
+# asgi.py — point d'entrée ASGI : proxys de fichiers en async, API Flask inchangée
+# Lancer : uvicorn asgi:app --host 0.0.0.0 --port 5000
+#
+# /preview/<id> et /file/<id>/<nom> sont servis ici avec httpx en streaming async :
+# une coroutine par lecteur (et non un worker entier), contre-pression assurée par
+# le flow control du serveur (chaque `send` attend que le client ait lu).
+# Les lectures complètes d'un même média sont coalescées (proxy_cache : un seul
+# téléchargement amont, partagé par tous les lecteurs et gardé en cache disque).
+# /api/events (flux SSE) est aussi servi ici : une coroutine par onglet ouvert au lieu
+# d'un thread du pool WSGI bloqué pendant toute la durée du flux.
+# Tout le reste (API, pages, fichiers du stockage local) part vers l'app Flask,
+# exécutée dans un pool de threads (a2wsgi).
+import os, re, time, asyncio, mimetypes
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+from a2wsgi import WSGIMiddleware
+
+import limits, proxy_cache
+from app import app as flask_app, _UA, _guess_mime_from_url, _iframe_page
+from extensions import db
+from api import events
+
+MAX_STREAMS  = int(os.getenv("PROXY_MAX_STREAMS", "500"))   # flux proxy simultanés par process
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", "16"))         # threads pour l'app Flask
+CHUNK        = 64 * 1024
+PROXY_HOPS   = int(os.getenv("PROXY_HOPS", "0"))             # proxys de confiance (gunicorn.conf.py)
+
+_PREVIEW_RE = re.compile(r"^/preview/(\d+)$")
+_FILE_RE    = re.compile(r"^/file/(\d+)/(.+)$")
+
+wsgi = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+_streams = asyncio.Semaphore(MAX_STREAMS)
+_client: httpx.AsyncClient | None = None
+
+def _http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers=_UA, follow_redirects=True,
+            timeout=httpx.Timeout(20, connect=8),
+            limits=httpx.Limits(max_connections=MAX_STREAMS, max_keepalive_connections=50),
+        )
+    return _client
+
+def _lookup(media_id: int):
+    """(url, chemin local ou None) — exécuté dans un thread, avec le contexte Flask."""
+    from models import Media
+    from storage import storage_for
+    with flask_app.app_context():
+        m = db.session.get(Media, media_id)
+        if not m or not getattr(m, "url", None):
+            return None
+        return m.url, storage_for(m.url).local_path(m.public_id)
+
+def _header(scope, name: bytes) -> str | None:
+    for k, v in scope.get("headers", []):
+        if k == name:
+            return v.decode("latin-1")
+    return None
+
+def _remote(scope) -> str:
+    """Adresse du client pour limits.py : même règle que ProxyFix (app.py)."""
+    xff = [a.strip() for k, v in scope.get("headers", []) if k == b"x-forwarded-for"
+           for a in v.decode("latin-1").split(",") if a.strip()]
+    if PROXY_HOPS and len(xff) >= PROXY_HOPS:
+        return xff[-PROXY_HOPS]
+    return (scope.get("client") or ("?",))[0]
+
+async def _respond(send, status: int, body: bytes, content_type: str, extra=()):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type.encode()),
+                            (b"content-length", str(len(body)).encode()), *extra]})
+    await send({"type": "http.response.body", "body": body})
+
+async def _iframe_fallback(send, url: str):
+    # même repli que _stream_remote côté Flask
+    await _respond(send, 200, _iframe_page(url).encode(), "text/html; charset=utf-8")
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+def _headers(mime: str, name: str, upstream: dict) -> list:
+    headers = [(b"content-type", mime.encode()),
+               (b"content-disposition", f'inline; filename="{name}"'.encode("utf-8")),
+               (b"cache-control", b"public, max-age=3600"),
+               (b"accept-ranges", b"bytes")]
+    for h, v in upstream.items():
+        if v is not None:
+            headers.append((h.encode(), str(v).encode("latin-1")))
+    return headers
+
+def _parse_range(rng: str | None, size: int):
+    """Plage simple « bytes=a-b » → (début, fin incluse), sinon None."""
+    m = re.match(r"^bytes=(\d*)-(\d*)$", (rng or "").strip())
+    if not m or (not m.group(1) and not m.group(2)): return None
+    if m.group(1):
+        start, end = int(m.group(1)), int(m.group(2) or size - 1)
+    else:
+        start, end = max(0, size - int(m.group(2))), size - 1
+    end = min(end, size - 1)
+    return (start, end) if start <= end else None
+
+async def _send_body(send, receive, chunks):
+    watcher = asyncio.create_task(_wait_disconnect(receive))
+    try:
+        async for chunk in chunks:
+            if watcher.done():           # lecteur parti : on arrête de lire
+                return
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    except OSError:
+        pass
+    finally:
+        watcher.cancel()
+
+async def _file_chunks(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            data = await asyncio.to_thread(f.read, min(CHUNK, length))
+            if not data: return
+            length -= len(data)
+            yield data
+
+async def _send_cached(send, receive, path: str, meta: dict, rng, mime: str, name: str):
+    size = os.path.getsize(path)
+    span = _parse_range(rng, size) if rng else None
+    start, end = span or (0, size - 1)
+    upstream = {"content-length": end - start + 1, "content-encoding": meta.get("content_encoding"),
+                "etag": meta.get("etag"), "last-modified": meta.get("last_modified")}
+    if span: upstream["content-range"] = f"bytes {start}-{end}/{size}"
+    await send({"type": "http.response.start", "status": 206 if span else 200,
+                "headers": _headers(mime, name, upstream)})
+    await _send_body(send, receive, _file_chunks(path, start, end - start + 1))
+
+async def _proxy(scope, receive, send, media_id: int, filename: str | None = None):
+    row = await asyncio.to_thread(_lookup, media_id)
+    if row is None:
+        return await _respond(send, 404, b"Not Found", "text/plain")
+    url, local = row
+    if local:
+        # stockage local : send_file (Range, X-Sendfile) côté Flask est déjà optimal
+        return await wsgi(scope, receive, send)
+    # même seau de jetons que côté Flask ; la concurrence est bornée ici par _streams
+    wait = limits.check_rate("proxy", _remote(scope))
+    if wait:
+        return await _respond(send, 429, b"Too many requests", "text/plain",
+                              [(b"retry-after", str(wait).encode())])
+    if _streams.locked():
+        return await _respond(send, 503, b"Too many streams", "text/plain", [(b"retry-after", b"2")])
+
+    force_mime = None
+    if filename:
+        ext = os.path.splitext(filename)[1].lower()
+        force_mime = mimetypes.types_map.get(ext) if ext else None
+    rng = _header(scope, b"range")
+
+    async with _streams:
+        # lecture du .meta.json + utime : disque, donc hors de la boucle d'événements
+        hit = await asyncio.to_thread(proxy_cache.cached, media_id, url)
+        if hit:
+            path, meta = hit
+            mime = force_mime or meta.get("content_type") or _guess_mime_from_url(url)
+            name = filename or os.path.basename(urlparse(meta.get("url") or url).path) or "file"
+            return await _send_cached(send, receive, path, meta, rng, mime, name)
+        if rng:
+            # lecture partielle hors cache (seek vidéo) : passe-plat direct vers l'amont
+            return await _passthrough(scope, receive, send, url, rng, force_mime, filename)
+
+        # lecture complète : on rejoint (ou lance) le téléchargement unique de ce média
+        try:
+            flight = proxy_cache.join(media_id, url, _http_client())
+            meta = await flight.wait_meta()
+        except Exception:
+            return await _iframe_fallback(send, url)
+        mime = force_mime or meta.get("content_type") or _guess_mime_from_url(url)
+        name = filename or os.path.basename(urlparse(meta.get("url") or url).path) or "file"
+        upstream = {"content-length": meta.get("content_length"), "content-encoding": meta.get("content_encoding"),
+                    "etag": meta.get("etag"), "last-modified": meta.get("last_modified")}
+        await send({"type": "http.response.start", "status": 200, "headers": _headers(mime, name, upstream)})
+        try:
+            await _send_body(send, receive, flight.chunks())
+        except proxy_cache.UpstreamError:
+            pass        # amont coupé en route : le client voit une réponse tronquée
+
+async def _passthrough(scope, receive, send, url: str, rng: str, force_mime, filename):
+    client = _http_client()
+    try:
+        resp = await client.send(client.build_request("GET", url, headers={"Range": rng}), stream=True)
+    except httpx.HTTPError:
+        return await _iframe_fallback(send, url)
+    try:
+        if resp.status_code >= 400:
+            return await _iframe_fallback(send, url)
+        mime = force_mime or resp.headers.get("content-type") or _guess_mime_from_url(url)
+        name = filename or os.path.basename(urlparse(str(resp.url)).path) or "file"
+        upstream = {h: resp.headers.get(h) for h in
+                    ("content-length", "content-range", "content-encoding", "etag", "last-modified")}
+        await send({"type": "http.response.start", "status": resp.status_code,
+                    "headers": _headers(mime, name, upstream)})
+        await _send_body(send, receive, resp.aiter_raw(CHUNK))
+    except httpx.HTTPError:
+        pass
+    finally:
+        await resp.aclose()
+
+# ─── Flux SSE /api/events ────────────────────────────────────────────────────
+def _in_app(fn, *args):
+    with flask_app.app_context():
+        return fn(*args)
+
+async def _events(scope, receive, send):
+    wait = limits.check_rate("events", _remote(scope))
+    if wait:
+        return await _respond(send, 429, b"Too many requests", "text/plain",
+                              [(b"retry-after", str(wait).encode())])
+    if not limits.try_acquire("events"):
+        return await _respond(send, 503, b"Too many streams", "text/plain", [(b"retry-after", b"5")])
+    watcher = asyncio.create_task(_wait_disconnect(receive))
+    try:
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("last_event_id", [None])[0]
+        cursor = await asyncio.to_thread(_in_app, events.start_id, _header(scope, b"last-event-id"), query)
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]})
+
+        async def emit(text: str):
+            await send({"type": "http.response.body", "body": text.encode(), "more_body": True})
+
+        await emit(f"retry: {events.RETRY_MS}\n: curseur {cursor}\n\n")
+        end, beat = time.monotonic() + events.STREAM_MAX, time.monotonic()
+        while time.monotonic() < end and not watcher.done():
+            tick = events.seq()
+            batch, cursor = await asyncio.to_thread(_in_app, events.poll, cursor)
+            if batch:
+                await emit("".join(events.sse(eid, ev) for eid, ev in batch))
+                beat = time.monotonic()
+                if len(batch) >= events.BATCH: continue
+            elif time.monotonic() - beat >= events.HEARTBEAT:
+                beat = time.monotonic()
+                await emit(": ping\n\n")
+            # réveil : commit dans ce process (compteur en mémoire), départ du client ou POLL écoulé
+            until = time.monotonic() + events.POLL
+            while events.seq() == tick and not watcher.done() and time.monotonic() < until:
+                await asyncio.sleep(0.2)
+        if not watcher.done():
+            await send({"type": "http.response.body", "body": b""})
+    except OSError:
+        pass
+    finally:
+        watcher.cancel()
+        limits.release("events")
+
+async def _lifespan(receive, send):
+    while True:
+        msg = await receive()
+        if msg["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif msg["type"] == "lifespan.shutdown":
+            if _client is not None:
+                await _client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] == "http" and scope["method"] == "GET":
+        path = scope["path"]
+        m = _PREVIEW_RE.match(path)
+        if m:
+            return await _proxy(scope, receive, send, int(m.group(1)))
+        m = _FILE_RE.match(path)
+        if m:
+            return await _proxy(scope, receive, send, int(m.group(1)), filename=m.group(2))
+        if path == "/api/events":
+            return await _events(scope, receive, send)
+    return await wsgi(scope, receive, send)
@@ -0,0 +1,140 @@
+# db_pool.py — pool SQLAlchemy instrumenté : métriques, ping configurable
+# Rôle : voir la saturation du pool (/__pool) et éviter l'aller-retour de pre-ping
+#        à chaque checkout contre Neon quand on le souhaite.
+#
+# DB_PING_MODE
+#   checkout   (défaut) ping à chaque checkout, comme pool_pre_ping, mais chronométré ;
+#   idle       ping au checkout seulement si la connexion est restée inactive plus de
+#              DB_PING_INTERVAL s (une connexion rendue au pool vient de servir : vivante) ;
+#              « background », ancien nom, vaut idle ;
+#   off        aucun ping (pool_recycle reste actif).
+# API publique de SQLAlchemy seulement : options du QueuePool (pool_size, max_overflow,
+# pool_timeout, pool_recycle), méthodes connect/recreate/size/checkedout/overflow et
+# événements de pool ; la taille du pool ne change jamais en cours de route.
+import os, time, threading, logging
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+log = logging.getLogger(__name__)
+
+PING_MODE     = {"background": "idle"}.get(m := os.getenv("DB_PING_MODE", "checkout").lower(), m)
+PING_INTERVAL = float(os.getenv("DB_PING_INTERVAL", "30"))
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = self.connects = self.invalidations = self.soft_invalidations = 0
+        self.timeouts = 0
+        self.waits = 0; self.wait_ms = 0.0; self.wait_max_ms = 0.0
+        self.pings = self.ping_failures = 0
+        self.ping_ms = 0.0; self.ping_max_ms = 0.0
+        self.peak = 0            # pic de connexions sorties depuis le démarrage
+
+    def ping(self, ms: float, ok: bool):
+        with self.lock:
+            self.pings += 1; self.ping_ms += ms; self.ping_max_ms = max(self.ping_max_ms, ms)
+            if not ok: self.ping_failures += 1
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool qui mesure l'attente d'une connexion libre (pool et overflow épuisés)."""
+
+    def __init__(self, creator, pool_size: int = 5, max_overflow: int = 10, **kw):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kw)
+        self.stats = PoolStats()
+        self.cap = pool_size + max_overflow if max_overflow > -1 else None   # None : sans plafond
+
+    def recreate(self):
+        # engine.dispose() : nouveau pool, mêmes compteurs
+        new = super().recreate()
+        new.stats = self.stats
+        return new
+
+    def connect(self):
+        saturated = self.cap is not None and self.checkedout() >= self.cap
+        t0 = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self.stats.lock: self.stats.timeouts += 1
+            raise
+        finally:
+            if saturated:
+                ms = (time.perf_counter() - t0) * 1000
+                with self.stats.lock:
+                    self.stats.waits += 1; self.stats.wait_ms += ms
+                    self.stats.wait_max_ms = max(self.stats.wait_max_ms, ms)
+
+    def snapshot(self) -> dict:
+        s = self.stats
+        with s.lock:
+            return {
+                "ping_mode": PING_MODE,
+                "pool_size": self.size(), "max_connections": self.cap,
+                "connections": self.checkedin() + self.checkedout(),
+                "checked_in": self.checkedin(), "checked_out": self.checkedout(),
+                "overflow_in_use": max(0, self.overflow()), "peak_checked_out": s.peak,
+                "checkouts": s.checkouts, "connects": s.connects,
+                "invalidations": s.invalidations, "soft_invalidations": s.soft_invalidations,
+                "timeouts": s.timeouts,
+                "waits": {"count": s.waits, "avg_ms": round(s.wait_ms / s.waits, 2) if s.waits else 0,
+                          "max_ms": round(s.wait_max_ms, 2)},
+                "ping": {"count": s.pings, "failures": s.ping_failures,
+                         "avg_ms": round(s.ping_ms / s.pings, 2) if s.pings else 0,
+                         "max_ms": round(s.ping_max_ms, 2)},
+            }
+
+def _ping(engine, rec) -> bool:
+    t0 = time.perf_counter()
+    try:
+        engine.dialect.do_ping(rec.dbapi_connection)
+        ok = True
+    except Exception:
+        ok = False
+    engine.pool.stats.ping((time.perf_counter() - t0) * 1000, ok)
+    if ok: rec.info["verified_at"] = time.time()
+    return ok
+
+def engine_options(url) -> dict:
+    """Options moteur : pool instrumenté, pre-ping natif remplacé par le nôtre."""
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {"pool_pre_ping": PING_MODE != "off"}   # base en mémoire : pool par défaut
+    return {"poolclass": MeteredQueuePool, "pool_pre_ping": False}
+
+def instrument(engine):
+    if not isinstance(engine.pool, MeteredQueuePool): return
+    s = engine.pool.stats
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, rec):
+        rec.info["verified_at"] = time.time()
+        with s.lock: s.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, rec, proxy):
+        with s.lock:
+            s.checkouts += 1
+            s.peak = max(s.peak, engine.pool.checkedout())
+        if PING_MODE == "checkout" or (
+                PING_MODE == "idle" and time.time() - rec.info.get("verified_at", 0) > PING_INTERVAL):
+            if not _ping(engine, rec):
+                # le pool invalide la connexion et réessaie avec une neuve
+                raise exc.DisconnectionError()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, rec):
+        # rendue après usage : vivante à cet instant (invalidée sinon, dbapi_conn None)
+        if dbapi_conn is not None: rec.info["verified_at"] = time.time()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_conn, rec, e):
+        with s.lock: s.invalidations += 1
+
+    @event.listens_for(engine, "soft_invalidate")
+    def _on_soft_invalidate(dbapi_conn, rec, e):
+        with s.lock: s.soft_invalidations += 1
+
+def stats(engine) -> dict:
+    pool = engine.pool
+    if isinstance(pool, MeteredQueuePool):
+        return pool.snapshot()
+    return {"pool": type(pool).__name__, "status": pool.status()}
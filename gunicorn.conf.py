@@ -0,0 +1,140 @@
+# gunicorn.conf.py — profil serveur de production (lu par : gunicorn -c gunicorn.conf.py)
+# Rôle : un seul point d'entrée réglé pour notre mélange d'appels JSON courts et de flux
+#        longs (proxys de fichiers, SSE /api/events, HLS), au lieu des lancements par défaut.
+#
+# WEB_PROFILE
+#   asgi     (défaut) asgi:app sous UvicornWorker : proxys et SSE en coroutines,
+#            reste de l'API Flask dans le pool de threads a2wsgi (WSGI_THREADS) ;
+#   gthread  app:app, N threads par worker : un flux long occupe un thread ;
+#   gevent   app:app en greenlets (paquet `gevent`, optionnel) : milliers de flux par worker.
+# Nombre de workers / threads calculé d'après les CPU et la mémoire réellement allouées
+# (quotas cgroup d'un conteneur compris) ; WEB_CONCURRENCY et GUNICORN_THREADS priment.
+# preload_app : l'application est importée une fois dans le maître puis partagée par
+# copie sur écriture ; les connexions DB ouvertes avant le fork sont abandonnées.
+import os, math, multiprocessing
+
+PROFILE = os.getenv("WEB_PROFILE", "asgi").lower()
+if PROFILE not in ("asgi", "gthread", "gevent"):
+    raise RuntimeError(f"WEB_PROFILE inconnu : {PROFILE!r} (asgi, gthread, gevent)")
+
+if PROFILE == "gevent":
+    # avant tout import de socket/ssl/threading par l'application préchargée
+    from gevent import monkey
+    monkey.patch_all()
+
+WORKER_MEM_MB = int(os.getenv("WEB_WORKER_MEM_MB", "160"))   # empreinte d'un worker (Flask, SQLAlchemy, Pillow)
+MEM_FRACTION  = 0.75                                          # le reste : maître, cache disque, pics
+
+# ─── Ressources allouées ─────────────────────────────────────────────────────
+def _read(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def cpu_count() -> int:
+    """CPU utilisables : affinité du process, bornée par le quota cgroup (v2 puis v1)."""
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n = multiprocessing.cpu_count()
+    quota = _read("/sys/fs/cgroup/cpu.max")
+    if quota and not quota.startswith("max"):
+        q, period = (int(x) for x in quota.split()[:2])
+        n = min(n, math.ceil(q / period))
+    else:
+        q, period = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if q and period and int(q) > 0:
+            n = min(n, math.ceil(int(q) / int(period)))
+    return max(1, n)
+
+def memory_mb() -> int | None:
+    """Mémoire du conteneur (cgroup), sinon MemTotal ; None si inconnue."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        raw = _read(path)
+        if raw and raw.isdigit() and int(raw) < 1 << 60:
+            return int(raw) // (1 << 20)
+    for line in (_read("/proc/meminfo") or "").splitlines():
+        if line.startswith("MemTotal:"):
+            return int(line.split()[1]) // 1024
+    return None
+
+def sizing(profile: str, cpus: int, mem: int | None) -> tuple[int, int]:
+    """(workers, threads) : parallélisme CPU borné par la mémoire disponible."""
+    wanted = {"asgi": cpus + 1, "gthread": 2 * cpus + 1, "gevent": cpus + 1}[profile]
+    cap = max(1, int(mem * MEM_FRACTION // WORKER_MEM_MB)) if mem else wanted
+    workers = int(os.getenv("WEB_CONCURRENCY") or min(wanted, cap))
+    threads = int(os.getenv("GUNICORN_THREADS") or (8 if profile == "gthread" else 1))
+    return max(1, workers), max(1, threads)
+
+CPUS, MEM = cpu_count(), memory_mb()
+WORKERS, THREADS = sizing(PROFILE, CPUS, MEM)
+
+# ─── Réglages gunicorn ───────────────────────────────────────────────────────
+bind        = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+wsgi_app    = "asgi:app" if PROFILE == "asgi" else "app:app"
+worker_class = {"gthread": "gthread", "gevent": "gevent"}.get(PROFILE)
+if PROFILE == "asgi":
+    try:
+        import uvicorn_worker                      # paquet `uvicorn-worker` (successeur)
+        worker_class = "uvicorn_worker.UvicornWorker"
+    except ImportError:
+        worker_class = "uvicorn.workers.UvicornWorker"
+workers     = WORKERS
+threads     = THREADS
+worker_connections = int(os.getenv("WEB_CONNECTIONS", "1000"))   # gevent : flux simultanés par worker
+preload_app = True
+
+# Flux longs : timeout = délai de battement de cœur du worker (asgi, gthread, gevent), pas
+# durée maximale d'une requête ; un flux de 5 min ne tue donc pas son worker.
+timeout          = int(os.getenv("WEB_TIMEOUT", "60"))
+graceful_timeout = 30          # flux SSE coupés au redémarrage : EventSource se reconnecte
+# keep-alive au-delà du délai d'inactivité du proxy frontal (souvent 60 s) : c'est lui
+# qui ferme en premier, jamais une connexion qu'il croit encore ouverte (502 sinon)
+keepalive        = int(os.getenv("WEB_KEEPALIVE", "75"))
+# recyclage des workers (fuites lentes) ; le préchargement rend le redémarrage peu coûteux
+max_requests        = int(os.getenv("WEB_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+# proxys dont gunicorn/uvicorn acceptent les X-Forwarded-* ; jamais « * » par défaut : un
+# client s'inventerait une adresse par requête (seau de limits.py neuf à chaque fois)
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+worker_tmp_dir      = "/dev/shm" if os.path.isdir("/dev/shm") else None   # battement hors disque
+accesslog = os.getenv("WEB_ACCESS_LOG") or None
+loglevel  = os.getenv("WEB_LOG_LEVEL", "info")
+
+# Adresse client : gunicorn ne réécrit pas REMOTE_ADDR (forwarded_allow_ips ne vaut que pour
+# le schéma) et l'IP du proxy de l'hébergeur n'est pas toujours connue d'avance → PROXY_HOPS
+# (ProxyFix dans app.py, _remote dans asgi.py) : l'entrée de X-Forwarded-For ajoutée par le
+# dernier proxy, que le client ne peut pas forger. Sinon tous les clients partageraient le
+# seau de limits.py de l'adresse du proxy. PROXY_HOPS=0 : accès direct, sans proxy.
+os.environ.setdefault("PROXY_HOPS", "1")
+
+# gthread : un flux SSE /api/events tient un thread → au plus un quart des threads en flux,
+# les onglets suivants passent en relève courte (api/events.py)
+if PROFILE == "gthread":
+    os.environ.setdefault("EVENTS_MAX_STREAMS", str(max(1, THREADS // 4)))
+
+# Pool DB par worker : une connexion par thread de requête, le débordement absorbe les pics
+if PROFILE == "gthread":
+    os.environ.setdefault("DB_POOL_SIZE", str(THREADS))
+elif PROFILE == "asgi":
+    os.environ.setdefault("DB_POOL_SIZE", os.getenv("WSGI_THREADS", "16"))
+
+# ─── Hooks ───────────────────────────────────────────────────────────────────
+def _dispose(close: bool):
+    from app import app
+    from extensions import db
+    with app.app_context():
+        db.engine.dispose(close=close)
+
+def when_ready(server):
+    server.log.info("profil %s : %d worker(s) × %d thread(s), %s (CPU %d, mémoire %s Mo)",
+                    PROFILE, WORKERS, THREADS, worker_class, CPUS, MEM if MEM else "?")
+    # la connexion du préchauffage (app.py) ne doit pas être héritée par les workers
+    _dispose(close=True)
+
+def post_fork(server, worker):
+    # connexions du maître éventuellement héritées : abandonnées sans les fermer
+    # (les fermer côté enfant couperait la socket partagée avec le parent)
+    _dispose(close=False)
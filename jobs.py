@@ -0,0 +1,153 @@
+# jobs.py — tâches de fond légères (thread + contexte Flask) avec suivi de progression
+# Rôle : exécuter hors requête les opérations longues (fusion de gros dossiers,
+#        déplacement de préfixe distant…) et les suivre via GET /api/jobs/<id>.
+# État rangé dans la table job : n'importe quel worker répond au suivi et voit les jobs
+# actifs des autres (pas de fusion lancée deux fois). Le thread qui exécute garde l'objet
+# Job et l'enregistre (progression au plus toutes les SAVE_EVERY s) ; un battement
+# (updated_at) prouve qu'il vit encore : au-delà de STALE s sans battement, job perdu.
+import json, threading, time, uuid, logging
+from flask import current_app
+from sqlalchemy import select, insert, update, delete
+
+log = logging.getLogger(__name__)
+
+KEEP_SECONDS = 3600      # durée de conservation d'un job terminé
+SAVE_EVERY   = 1.0       # secondes entre deux écritures de la progression
+HEARTBEAT    = 30
+STALE        = 4 * HEARTBEAT
+ACTIVE       = ("queued", "running")
+
+def _table():
+    from models import BackgroundJob
+    return BackgroundJob.__table__
+
+class Job:
+    def __init__(self, kind: str, params: dict, job_id: str | None = None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind, self.params = kind, params
+        self.state = "queued"            # queued → running → done | error
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self._saved = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_row(cls, r) -> "Job":
+        job = cls(r.kind, json.loads(r.params or "{}"), r.id)
+        job.state, job.error = r.state, r.error
+        job.progress = json.loads(r.progress or "{}")
+        job.result = json.loads(r.result) if r.result else None
+        job.started_at, job.finished_at = r.started_at, r.finished_at
+        if job.state in ACTIVE and time.time() - (r.updated_at or 0) > STALE:
+            job.state, job.error = "error", "job perdu (worker arrêté)"
+        return job
+
+    def update(self, **progress):
+        with self._lock:
+            self.progress.update(progress)
+            due = time.monotonic() - self._saved >= SAVE_EVERY
+        if due: self.save()
+
+    def save(self):
+        """Enregistre l'état (connexion à part : la transaction du job n'est pas touchée)."""
+        from extensions import db
+        with self._lock:
+            self._saved = time.monotonic()
+            values = {"state": self.state, "progress": json.dumps(self.progress), "error": self.error,
+                      "result": json.dumps(self.result, default=str) if self.result is not None else None,
+                      "finished_at": self.finished_at, "updated_at": time.time()}
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(update(_table()).where(_table().c.id == self.id).values(**values))
+        except Exception as e:
+            log.warning("job %s : état non enregistré (%s)", self.id, e)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {"id": self.id, "kind": self.kind, "state": self.state, "params": self.params,
+                    "progress": dict(self.progress), "result": self.result, "error": self.error,
+                    "started_at": self.started_at, "finished_at": self.finished_at}
+
+_jobs: dict[str, Job] = {}       # jobs exécutés par ce process, jusqu'à leur fin
+_jobs_lock = threading.Lock()
+_beat = None
+
+def _heartbeat(app):
+    from extensions import db
+    while True:
+        time.sleep(HEARTBEAT)
+        with _jobs_lock:
+            ids = list(_jobs)
+        if not ids: continue
+        try:
+            with app.app_context(), db.engine.begin() as conn:
+                conn.execute(update(_table()).where(_table().c.id.in_(ids)).values(updated_at=time.time()))
+        except Exception as e:
+            log.warning("jobs : battement non enregistré (%s)", e)
+
+def start(kind: str, fn, params: dict | None = None) -> Job:
+    """Lance fn(job) dans un thread, avec le contexte de l'application courante."""
+    global _beat
+    from extensions import db
+    app = current_app._get_current_object()
+    job = Job(kind, params or {})
+    now = time.time()
+    with db.engine.begin() as conn:
+        conn.execute(delete(_table()).where(_table().c.finished_at < now - KEEP_SECONDS))
+        conn.execute(insert(_table()).values(id=job.id, kind=kind, state=job.state, params=json.dumps(job.params),
+                                             started_at=now, updated_at=now))
+    with _jobs_lock:
+        _jobs[job.id] = job
+        if _beat is None:
+            _beat = threading.Thread(target=_heartbeat, args=(app,), name="jobs-heartbeat", daemon=True)
+            _beat.start()
+
+    def _run():
+        with app.app_context():
+            job.state = "running"
+            job.save()
+            try:
+                job.result = fn(job)
+                job.state = "done"
+            except Exception as e:
+                db.session.rollback()
+                log.exception("job %s (%s) en échec", job.id, kind)
+                job.error, job.state = str(e), "error"
+            finally:
+                job.finished_at = time.time()
+                job.save()
+                with _jobs_lock:
+                    _jobs.pop(job.id, None)
+
+    threading.Thread(target=_run, name=f"job-{kind}-{job.id}", daemon=True).start()
+    return job
+
+def get(job_id: str) -> Job | None:
+    """Job de ce process (état le plus frais), sinon tel qu'enregistré par un autre worker."""
+    from extensions import db
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job: return job
+    with db.engine.connect() as conn:
+        r = conn.execute(select(_table()).where(_table().c.id == job_id)).first()
+    return Job.from_row(r) if r else None
+
+def active(kind: str, **params) -> Job | None:
+    """Job du même type, non terminé, lancé avec ces paramètres (évite les doublons)."""
+    from extensions import db
+    with _jobs_lock:
+        for j in _jobs.values():
+            if j.kind == kind and j.finished_at is None and all(j.params.get(k) == v for k, v in params.items()):
+                return j
+    T = _table()
+    with db.engine.connect() as conn:
+        rows = conn.execute(select(T).where(T.c.kind == kind, T.c.state.in_(ACTIVE),
+                                            T.c.updated_at > time.time() - STALE)).all()
+    for r in rows:
+        job = Job.from_row(r)
+        if all(job.params.get(k) == v for k, v in params.items()):
+            return job
+    return None
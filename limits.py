@@ -0,0 +1,188 @@
+# limits.py — limitation de débit (token bucket) + contrôle d'admission par endpoint
+# Rôle : protéger les endpoints coûteux (upload, suppressions, proxys, miniatures)
+#        sans toucher aux appels bon marché (listes), qui ne passent jamais ici.
+#
+# Chaque classe d'endpoint a :
+#   - un seau de jetons par client (débit/s + rafale) → 429 + Retry-After ;
+#   - un sémaphore de concurrence par process, pris sans attendre → 503 + Retry-After.
+#     Classes de INLINE : sémaphore pris par la vue elle-même autour du seul travail coûteux
+#     (miniatures : génération ffmpeg/PIL ; un dérivé déjà sur disque n'en prend pas).
+# Réglage par variable d'env : LIMIT_<CLASSE>="débit,rafale,concurrence"
+#   ex. LIMIT_UPLOAD="0.5,10,4" ; débit 0 = pas de seau, concurrence 0 = pas de sémaphore.
+# RATE_LIMIT_REDIS_URL : seaux partagés entre workers/instances (paquet `redis`, optionnel) ;
+# sinon (ou si Redis tombe) les seaux vivent en mémoire du process.
+# Clé des seaux : adresse du client (derrière un proxy : PROXY_HOPS → ProxyFix, app.py).
+import os, math, time, threading, logging
+
+log = logging.getLogger(__name__)
+
+# classe → (jetons/s, rafale, requêtes simultanées par process)
+DEFAULTS = {
+    "upload": (1.0, 20, 4),
+    "delete": (2.0, 10, 2),
+    "proxy":  (5.0, 60, 32),
+    "thumb":  (20.0, 200, 8),     # générations simultanées (INLINE)
+    "events": (0.5, 10, 32),      # flux SSE longs : une place par onglet ouvert
+}
+
+# endpoint Flask → classe
+ENDPOINTS = {
+    "media.upload":        "upload",
+    "media.import_manifest": "upload",
+    "media.delete_media":  "delete",
+    "media.bulk_delete":   "delete",
+    "preview":             "proxy",
+    "file_with_ext":       "proxy",
+    "thumbs.thumb":        "thumb",
+    "events.stream":       "events",
+}
+
+# classes dont la vue prend elle-même la place de concurrence (try_acquire / release)
+INLINE = {"thumb"}
+
+ENABLED = os.getenv("RATE_LIMIT", "1") not in ("0", "false", "False")
+
+def _conf(name: str):
+    raw = os.getenv(f"LIMIT_{name.upper()}")
+    if not raw: return DEFAULTS[name]
+    try:
+        rate, burst, conc = (x.strip() for x in raw.split(","))
+        return float(rate), int(burst), int(conc)
+    except ValueError:
+        log.warning("LIMIT_%s invalide (%r) : valeurs par défaut", name.upper(), raw)
+        return DEFAULTS[name]
+
+CLASSES = {name: _conf(name) for name in DEFAULTS}
+
+# ─── Seaux de jetons ─────────────────────────────────────────────────────────
+class LocalBuckets:
+    """Seaux en mémoire du process ; les entrées pleines et inactives sont purgées."""
+
+    SWEEP_EVERY = 60
+
+    def __init__(self):
+        self._b = {}                  # (classe, client) → [jetons, horodatage]
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+
+    def take(self, key: tuple, rate: float, burst: int, cost: float = 1) -> float:
+        """0 si admis, sinon nombre de secondes avant qu'un jeton soit disponible."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._swept > self.SWEEP_EVERY:
+                self._sweep(now)
+            tokens, ts = self._b.get(key) or (burst, now)
+            tokens = min(burst, tokens + (now - ts) * rate)
+            if tokens >= cost:
+                self._b[key] = [tokens - cost, now]
+                return 0
+            self._b[key] = [tokens, now]
+            return (cost - tokens) / rate
+
+    def _sweep(self, now: float):
+        self._swept = now
+        for key, (tokens, ts) in list(self._b.items()):
+            rate, burst, _ = CLASSES[key[0]]
+            if tokens + (now - ts) * rate >= burst:
+                del self._b[key]
+
+_LUA = """
+local v = redis.call('HMGET', KEYS[1], 't', 'ts')
+local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local t = tonumber(v[1]) or burst
+local ts = tonumber(v[2]) or now
+t = math.min(burst, t + math.max(0, now - ts) * rate)
+local wait = 0
+if t >= cost then t = t - cost else wait = (cost - t) / rate end
+redis.call('HSET', KEYS[1], 't', t, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisBuckets:
+    """Mêmes seaux, partagés via Redis (script Lua atomique). Repli local si Redis échoue."""
+
+    def __init__(self, url: str, fallback: LocalBuckets):
+        import redis
+        self._r = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.2)
+        self._script = self._r.register_script(_LUA)
+        self._fallback = fallback
+        self._down_until = 0.0
+
+    def take(self, key: tuple, rate: float, burst: int, cost: float = 1) -> float:
+        if time.monotonic() < self._down_until:
+            return self._fallback.take(key, rate, burst, cost)
+        try:
+            return float(self._script(keys=[f"rl:{key[0]}:{key[1]}"], args=[rate, burst, time.time(), cost]))
+        except Exception as e:
+            # Redis lent ou absent : on ne bloque pas les requêtes, on repasse en local 30 s
+            log.warning("rate limit : Redis indisponible (%s), seaux locaux", e)
+            self._down_until = time.monotonic() + 30
+            return self._fallback.take(key, rate, burst, cost)
+
+def _make_buckets():
+    local = LocalBuckets()
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if not url: return local
+    try:
+        return RedisBuckets(url, local)
+    except ImportError:
+        log.warning("RATE_LIMIT_REDIS_URL défini mais paquet `redis` absent : seaux locaux")
+        return local
+
+buckets = _make_buckets()
+_slots = {name: threading.BoundedSemaphore(c) for name, (_, _, c) in CLASSES.items() if c > 0}
+
+# ─── Admission ───────────────────────────────────────────────────────────────
+def check_rate(cls: str, client: str) -> float:
+    """0 si le client peut passer, sinon Retry-After en secondes (≥ 1)."""
+    rate, burst, _ = CLASSES[cls]
+    if not ENABLED or rate <= 0: return 0
+    wait = buckets.take((cls, client or "?"), rate, burst)
+    return max(1, math.ceil(wait)) if wait > 0 else 0
+
+def try_acquire(cls: str) -> bool:
+    """Prend une place de concurrence sans attendre (False → délester en 503)."""
+    sem = _slots.get(cls)
+    return not ENABLED or sem is None or sem.acquire(blocking=False)
+
+def release(cls: str):
+    sem = _slots.get(cls)
+    if ENABLED and sem is not None:
+        sem.release()
+
+def refuse(status: int, error: str, retry: int):
+    from flask import jsonify
+    resp = jsonify({"ok": False, "error": error})
+    resp.status_code = status
+    resp.headers["Retry-After"] = str(retry)
+    return resp
+
+def init_app(app):
+    """Branche les contrôles sur les endpoints listés dans ENDPOINTS."""
+    from flask import request, g
+
+    @app.before_request
+    def _admit():
+        cls = ENDPOINTS.get(request.endpoint or "")
+        if cls is None: return None
+        wait = check_rate(cls, request.remote_addr)
+        if wait: return refuse(429, "rate_limited", wait)
+        if cls in INLINE: return None
+        if not try_acquire(cls): return refuse(503, "busy", 1)
+        g._limit_slot = cls
+        return None
+
+    @app.after_request
+    def _hand_over(resp):
+        # réponse en streaming : la place n'est rendue qu'une fois le corps envoyé
+        cls = g.pop("_limit_slot", None)
+        if cls is not None:
+            resp.call_on_close(lambda: release(cls))
+        return resp
+
+    @app.teardown_request
+    def _release_on_error(exc=None):
+        cls = g.pop("_limit_slot", None)   # after_request non atteint (exception)
+        if cls is not None:
+            release(cls)
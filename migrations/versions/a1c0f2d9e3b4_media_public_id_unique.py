@@ -0,0 +1,38 @@
+# migrations/versions/a1c0f2d9e3b4_media_public_id_unique.py — index unique sur media.public_id
+# (cible des INSERT ... ON CONFLICT DO NOTHING de l'import en masse)
+# Les anciennes versions d'add_youtube créaient des doublons (« yt:unknown », même vidéo
+# ajoutée deux fois) : on garde l'id le plus bas de chaque public_id ; un doublon exact
+# (même URL, même dossier) est supprimé, les autres reçoivent un suffixe « ~<id> ».
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a1c0f2d9e3b4'
+down_revision = 'add_kind_pinned'
+branch_labels = None
+depends_on = None
+
+media = sa.table('media', sa.column('id', sa.Integer), sa.column('public_id', sa.String),
+                 sa.column('url', sa.String), sa.column('folder_id', sa.Integer))
+
+def _dedupe(bind):
+    dup = (sa.select(media.c.public_id).group_by(media.c.public_id)
+           .having(sa.func.count() > 1).scalar_subquery())
+    rows = bind.execute(sa.select(media.c.id, media.c.public_id, media.c.url, media.c.folder_id)
+                        .where(media.c.public_id.in_(dup)).order_by(media.c.public_id, media.c.id)).all()
+    seen = {}                        # public_id → {(url, dossier)} des lignes déjà vues
+    for r in rows:
+        prev = seen.setdefault(r.public_id, set())
+        if (r.url, r.folder_id) in prev:
+            bind.execute(sa.delete(media).where(media.c.id == r.id))
+        elif prev:
+            suffix = f"~{r.id}"
+            bind.execute(sa.update(media).where(media.c.id == r.id)
+                         .values(public_id=r.public_id[:255 - len(suffix)] + suffix))
+        prev.add((r.url, r.folder_id))
+
+def upgrade():
+    _dedupe(op.get_bind())
+    op.create_index('uq_media_public_id', 'media', ['public_id'], unique=True)
+
+def downgrade():
+    op.drop_index('uq_media_public_id', table_name='media')
@@ -0,0 +1,17 @@
+# migrations/versions/a7c2e9f4b1d6_media_phash.py — empreinte perceptuelle des photos (doublons)
+# Remplissage : flask similar backfill (ou POST /api/media/phash/backfill)
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a7c2e9f4b1d6'
+down_revision = 'f6b1d8e2a4c3'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('media') as b:
+        b.add_column(sa.Column('phash', sa.BigInteger(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('media') as b:
+        b.drop_column('phash')
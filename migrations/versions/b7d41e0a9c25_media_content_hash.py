@@ -0,0 +1,16 @@
+# migrations/versions/b7d41e0a9c25_media_content_hash.py — empreinte du contenu (cache des miniatures)
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b7d41e0a9c25'
+down_revision = 'a1c0f2d9e3b4'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('media') as b:
+        b.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('media') as b:
+        b.drop_column('content_hash')
@@ -0,0 +1,17 @@
+# migrations/versions/b8d3f1a6c2e7_media_title.py — titre des médias (liens YouTube résolus par oEmbed)
+# Remplissage : flask youtube resolve (ou POST /api/media/youtube/resolve)
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b8d3f1a6c2e7'
+down_revision = 'a7c2e9f4b1d6'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('media') as b:
+        b.add_column(sa.Column('title', sa.String(length=300), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('media') as b:
+        b.drop_column('title')
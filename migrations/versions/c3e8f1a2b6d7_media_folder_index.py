@@ -0,0 +1,13 @@
+# migrations/versions/c3e8f1a2b6d7_media_folder_index.py — index (folder_id, id) : listes, comptages, fusions par lots
+from alembic import op
+
+revision = 'c3e8f1a2b6d7'
+down_revision = 'b7d41e0a9c25'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_media_folder_id', 'media', ['folder_id', 'id'])
+
+def downgrade():
+    op.drop_index('ix_media_folder_id', table_name='media')
@@ -0,0 +1,28 @@
+# migrations/versions/c9e4b2f7a1d3_job.py — état des tâches de fond partagé entre workers (jobs.py)
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'c9e4b2f7a1d3'
+down_revision = 'b8d3f1a6c2e7'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'job',
+        sa.Column('id', sa.String(12), primary_key=True),
+        sa.Column('kind', sa.String(32), nullable=False),
+        sa.Column('state', sa.String(16), nullable=False),
+        sa.Column('params', sa.Text(), nullable=True),
+        sa.Column('progress', sa.Text(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+        sa.Column('finished_at', sa.Float(), nullable=True),
+    )
+    op.create_index('ix_job_kind_state', 'job', ['kind', 'state'])
+
+def downgrade():
+    op.drop_index('ix_job_kind_state', table_name='job')
+    op.drop_table('job')
@@ -0,0 +1,19 @@
+# migrations/versions/d1a7e3c5b9f2_folder_name_lower.py — index lower(name) : saisie semi-automatique des dossiers
+# istartswith compile en lower(name) LIKE 'préfixe%' : l'index unique sur name ne sert pas.
+# Postgres : text_pattern_ops, préfixe indexable quelle que soit la collation.
+# SQLite : index d'expression créé aussi (même schéma), mais son LIKE ne s'en sert pas ;
+# la table folder y reste petite.
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd1a7e3c5b9f2'
+down_revision = 'c9e4b2f7a1d3'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_folder_name_lower', 'folder', [sa.func.lower(sa.column('name')).label('name_lower')],
+                    postgresql_ops={'name_lower': 'text_pattern_ops'})
+
+def downgrade():
+    op.drop_index('ix_folder_name_lower', table_name='folder')
@@ -0,0 +1,76 @@
+# migrations/versions/d4f2a7c9e1b8_folder_stats.py — résumé par dossier (folder_stats) + index de tri des dossiers
+import re
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd4f2a7c9e1b8'
+down_revision = 'c3e8f1a2b6d7'
+branch_labels = None
+depends_on = None
+
+# Classement par type figé à cette révision (copie de api/media._guess_kind_from_url) :
+# la migration ne dépend pas du code applicatif, qui peut évoluer ensuite.
+_IMG = {"jpg", "jpeg", "png", "gif", "webp", "bmp", "svg", "heic", "heif", "avif"}
+_VID = {"mp4", "webm", "ogg", "mov", "m4v", "3gp", "mkv"}
+_AUD = {"mp3", "wav", "m4a", "aac", "ogg", "oga", "flac"}
+_DOC = {"pdf", "doc", "docx", "ppt", "pptx", "xls", "xlsx", "odt", "ods", "odp", "txt", "csv"}
+
+def _kind(url):
+    u = (url or "").lower()
+    if "youtube.com" in u or "youtu.be" in u: return "videos"
+    m = re.search(r"\.([a-z0-9]{2,5})$", u.split("?")[0])
+    ext = m.group(1) if m else ""
+    for kind, exts in (("photos", _IMG), ("videos", _VID), ("audio", _AUD), ("documents", _DOC)):
+        if ext in exts: return kind
+    if "/video/upload/" in u: return "videos"
+    if "/image/upload/" in u: return "photos"
+    return "documents"
+
+def _fill(bind):
+    """Remplissage initial en un parcours de media (Core seulement)."""
+    media = sa.table('media', sa.column('id', sa.Integer), sa.column('folder_id', sa.Integer),
+                     sa.column('url', sa.String), sa.column('created_at', sa.DateTime))
+    folder = sa.table('folder', sa.column('id', sa.Integer))
+    stats = sa.table('folder_stats', *(sa.column(c) for c in (
+        'folder_id', 'media_count', 'photos', 'videos', 'audio', 'documents', 'last_added_at', 'cover_media_id')))
+    acc = {fid: {"media_count": 0, "photos": 0, "videos": 0, "audio": 0, "documents": 0,
+                 "last_added_at": None, "cover": None, "any": None}
+           for fid in bind.execute(sa.select(folder.c.id)).scalars()}
+    rows = bind.execute(sa.select(media.c.folder_id, media.c.url, media.c.created_at, media.c.id)
+                        .where(media.c.folder_id.is_not(None)))
+    for fid, url, created, mid in rows:
+        d = acc.get(fid)
+        if d is None: continue
+        kind = _kind(url)
+        d["media_count"] += 1; d[kind] += 1
+        if created is not None and (d["last_added_at"] is None or created > d["last_added_at"]):
+            d["last_added_at"] = created
+        d["any"] = max(d["any"] or 0, mid)
+        if kind in ("photos", "videos"): d["cover"] = max(d["cover"] or 0, mid)
+    cols = ("media_count", "photos", "videos", "audio", "documents", "last_added_at")
+    values = [{"folder_id": fid, "cover_media_id": d["cover"] or d["any"], **{k: d[k] for k in cols}}
+              for fid, d in acc.items()]
+    for i in range(0, len(values), 5000):
+        bind.execute(sa.insert(stats), values[i:i + 5000])
+
+def upgrade():
+    op.create_table(
+        'folder_stats',
+        sa.Column('folder_id', sa.Integer(), sa.ForeignKey('folder.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('media_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('photos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('videos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('audio', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('documents', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_added_at', sa.DateTime(), nullable=True),
+        sa.Column('cover_media_id', sa.Integer(), nullable=True),
+    )
+    op.create_index('ix_folder_stats_count', 'folder_stats', ['media_count', 'folder_id'])
+    op.create_index('ix_folder_created_at', 'folder', ['created_at', 'id'])
+    # remplissage initial (classement par type fait en Python, comme à l'écriture)
+    _fill(op.get_bind())
+
+def downgrade():
+    op.drop_index('ix_folder_created_at', table_name='folder')
+    op.drop_index('ix_folder_stats_count', table_name='folder_stats')
+    op.drop_table('folder_stats')
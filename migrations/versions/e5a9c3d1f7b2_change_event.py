@@ -0,0 +1,22 @@
+# migrations/versions/e5a9c3d1f7b2_change_event.py — journal des modifications (flux SSE /api/events)
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'e5a9c3d1f7b2'
+down_revision = 'd4f2a7c9e1b8'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'change_event',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('entity', sa.String(16), nullable=False),
+        sa.Column('op', sa.String(16), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=True),
+        sa.Column('data', sa.Text(), nullable=True),
+    )
+
+def downgrade():
+    op.drop_table('change_event')
@@ -0,0 +1,27 @@
+# migrations/versions/f6b1d8e2a4c3_media_metadata.py — métadonnées des médias + index de la chronologie
+# Remplissage : flask metadata backfill (ou POST /api/media/metadata/backfill)
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'f6b1d8e2a4c3'
+down_revision = 'e5a9c3d1f7b2'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('media') as b:
+        b.add_column(sa.Column('taken_at', sa.DateTime(), nullable=True))
+        b.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        b.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        b.add_column(sa.Column('duration', sa.Float(), nullable=True))
+        b.add_column(sa.Column('mime', sa.String(length=100), nullable=True))
+        b.add_column(sa.Column('size_bytes', sa.BigInteger(), nullable=True))
+    op.create_index('ix_media_taken_at', 'media', ['taken_at', 'id'])
+    op.create_index('ix_media_folder_taken', 'media', ['folder_id', 'taken_at', 'id'])
+
+def downgrade():
+    op.drop_index('ix_media_folder_taken', table_name='media')
+    op.drop_index('ix_media_taken_at', table_name='media')
+    with op.batch_alter_table('media') as b:
+        for col in ('size_bytes', 'mime', 'duration', 'height', 'width', 'taken_at'):
+            b.drop_column(col)
@@ -13,6 +13,7 @@ from extensions import db
 
 class Folder(db.Model):
     __tablename__ = "folder"
+    __table_args__ = (db.Index("ix_folder_created_at", "created_at", "id"),)
     id         = db.Column(db.Integer, primary_key=True)
     name       = db.Column(db.String(160), unique=True, nullable=False)
     pinned     = db.Column(db.Boolean, default=False)
@@ -20,14 +21,72 @@ class Folder(db.Model):
     medias     = db.relationship("Media", backref="folder",
                                  cascade="all, delete-orphan", lazy=True)
 
+# saisie semi-automatique (/api/folders/page?mode=typeahead) : lower(name) LIKE 'préfixe%' ;
+# text_pattern_ops rend le préfixe indexable sous Postgres quelle que soit la collation
+db.Index("ix_folder_name_lower", db.func.lower(Folder.name).label("name_lower"),
+         postgresql_ops={"name_lower": "text_pattern_ops"})
+
 class Media(db.Model):
     __tablename__ = "media"
+    __table_args__ = (db.Index("uq_media_public_id", "public_id", unique=True),
+                      db.Index("ix_media_folder_id", "folder_id", "id"),
+                      db.Index("ix_media_taken_at", "taken_at", "id"),
+                      db.Index("ix_media_folder_taken", "folder_id", "taken_at", "id"))
     id         = db.Column(db.Integer, primary_key=True)
     url        = db.Column(db.String(600), nullable=False)
     public_id  = db.Column(db.String(255), nullable=False)   # cloudinary ou 'yt:<id>'
     folder_id  = db.Column(db.Integer, db.ForeignKey("folder.id"), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True)   # sha256 de l'original (cache miniatures)
+    # métadonnées extraites une fois (api/metadata.py) ; mime NULL = pas encore traitée
+    taken_at   = db.Column(db.DateTime, nullable=True)       # prise de vue (EXIF, conteneur), sinon date d'ajout
+    width      = db.Column(db.Integer, nullable=True)
+    height     = db.Column(db.Integer, nullable=True)
+    duration   = db.Column(db.Float, nullable=True)          # secondes (audio, vidéo)
+    mime       = db.Column(db.String(100), nullable=True)
+    size_bytes = db.Column(db.BigInteger, nullable=True)
+    phash      = db.Column(db.BigInteger, nullable=True)     # dHash 64 bits (signé), api/similar.py
+    title      = db.Column(db.String(300), nullable=True)    # YouTube : oEmbed (api/youtube.py) ; "" = résolu sans titre
+
+
 
 
 
+class FolderStats(db.Model):
+    """Résumé par dossier, tenu à jour par deltas à chaque écriture (api/folder_stats.py)."""
+    __tablename__ = "folder_stats"
+    __table_args__ = (db.Index("ix_folder_stats_count", "media_count", "folder_id"),)
+    folder_id      = db.Column(db.Integer, db.ForeignKey("folder.id", ondelete="CASCADE"), primary_key=True)
+    media_count    = db.Column(db.Integer, nullable=False, default=0)
+    photos         = db.Column(db.Integer, nullable=False, default=0)
+    videos         = db.Column(db.Integer, nullable=False, default=0)
+    audio          = db.Column(db.Integer, nullable=False, default=0)
+    documents      = db.Column(db.Integer, nullable=False, default=0)
+    last_added_at  = db.Column(db.DateTime, nullable=True)
+    cover_media_id = db.Column(db.Integer, nullable=True)   # dernière photo/vidéo (sinon dernier média)
+
+class ChangeEvent(db.Model):
+    """Journal des modifications, écrit dans la transaction de chaque écriture (api/events.py).
+    L'id sert de curseur au flux SSE /api/events (Last-Event-ID)."""
+    __tablename__ = "change_event"
+    id         = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    entity     = db.Column(db.String(16), nullable=False)     # media | folder
+    op         = db.Column(db.String(16), nullable=False)     # insert | update | delete | move | import
+    entity_id  = db.Column(db.Integer, nullable=True)
+    data       = db.Column(db.Text, nullable=True)            # JSON (dossier d'origine, cible…)
 
+class BackgroundJob(db.Model):
+    """État des tâches de fond (jobs.py), lisible par tous les workers ; horodatages epoch."""
+    __tablename__ = "job"
+    __table_args__ = (db.Index("ix_job_kind_state", "kind", "state"),)
+    id          = db.Column(db.String(12), primary_key=True)
+    kind        = db.Column(db.String(32), nullable=False)
+    state       = db.Column(db.String(16), nullable=False)     # queued | running | done | error
+    params      = db.Column(db.Text, nullable=True)            # JSON
+    progress    = db.Column(db.Text, nullable=True)            # JSON
+    result      = db.Column(db.Text, nullable=True)            # JSON
+    error       = db.Column(db.Text, nullable=True)
+    started_at  = db.Column(db.Float, nullable=False)
+    updated_at  = db.Column(db.Float, nullable=False)          # battement du worker qui exécute
+    finished_at = db.Column(db.Float, nullable=True)
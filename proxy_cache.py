@@ -0,0 +1,244 @@
+# proxy_cache.py — coalescence des téléchargements amont + cache disque des proxys
+# Rôle : quand des dizaines de clients ouvrent /preview/<id> en même temps, un seul
+# téléchargement amont est lancé (« single-flight ») ; il écrit dans un fichier
+# .part que chaque lecteur suit à son rythme (tee), puis devient le cache disque.
+#
+# Fichiers sous PROXY_CACHE_DIR (instance/proxy-cache par défaut) :
+#   <id>.part       téléchargement en cours      <id>.bin   copie complète
+#   <id>.meta.json  en-têtes amont + URL source  <id>.lock  verrou inter-workers
+# PROXY_CROSS_WORKER_LOCK=1 : un seul worker (process) télécharge, les autres
+# suivent le .part sur disque (fcntl.flock, donc Linux/macOS uniquement).
+# Sans verrou, chaque worker écrit ses propres <id>.<pid>.part / .meta.json et ne
+# publie (os.replace) la copie qu'une fois complète : pas d'écrasement mutuel.
+# Une copie n'est servie que si son URL source est encore celle du média (id réutilisé
+# après suppression, fichier renommé) ; evict() la retire à la suppression / au renommage.
+import os, json, time, asyncio
+
+try:
+    import fcntl
+except ImportError:          # Windows : coalescence par process seulement
+    fcntl = None
+
+CACHE_DIR    = os.getenv("PROXY_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "instance", "proxy-cache")
+MAX_BYTES    = int(os.getenv("PROXY_CACHE_MAX_MB", "2048")) * 1024 * 1024
+CROSS_WORKER = os.getenv("PROXY_CROSS_WORKER_LOCK", "0") in ("1", "true", "True") and fcntl is not None
+CHUNK        = 64 * 1024
+META_TIMEOUT = 20
+PART_MAX_AGE = 3600       # .part orphelins (worker tué en plein téléchargement)
+
+class UpstreamError(Exception):
+    pass
+
+def _paths(media_id: int):
+    base = os.path.join(CACHE_DIR, str(media_id))
+    return base + ".bin", base + ".part", base + ".meta.json", base + ".lock"
+
+def _own(path: str) -> str:
+    """Variante propre au process d'un fichier de cache (<id>.<pid>.part…)."""
+    base, name = os.path.split(path)
+    mid, rest = name.split(".", 1)
+    return os.path.join(base, f"{mid}.{os.getpid()}.{rest}")
+
+def _remove(*paths):
+    for p in paths:
+        try: os.remove(p)
+        except FileNotFoundError: pass
+
+def cached(media_id: int, url: str):
+    """(chemin, méta) si une copie complète de cette URL existe, sinon None."""
+    bin_, _, metap, _ = _paths(media_id)
+    try:
+        with open(metap) as f:
+            meta = json.load(f)
+        if meta.get("source") != url:        # autre média (id réutilisé) ou fichier renommé
+            return None
+        os.utime(bin_)       # LRU : la date de modif sert d'horodatage d'accès
+        return bin_, meta
+    except (FileNotFoundError, ValueError):
+        return None
+
+def evict(media_ids):
+    """Retire les copies complètes (suppression, renommage côté stockage)."""
+    for mid in media_ids:
+        bin_, _, metap, _ = _paths(mid)
+        _remove(metap, bin_)
+
+def prune():
+    """Supprime les copies les plus anciennes au-delà de PROXY_CACHE_MAX_MB."""
+    try:
+        entries = list(os.scandir(CACHE_DIR))
+    except FileNotFoundError:
+        return
+    stale = time.time() - PART_MAX_AGE
+    for e in entries:
+        if e.name.endswith((".part", ".tmp")) and e.stat().st_mtime < stale: _remove(e.path)
+    entries = [e for e in entries if e.name.endswith(".bin")]
+    stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(s for _, s, _ in stats)
+    if total <= MAX_BYTES: return
+    for _, size, path in sorted(stats):
+        for p in (path, path[:-4] + ".meta.json"):
+            try: os.remove(p)
+            except FileNotFoundError: pass
+        total -= size
+        if total <= MAX_BYTES * 0.9: return
+
+def _open_growing(part: str, bin_: str):
+    try:
+        return open(part, "rb")
+    except FileNotFoundError:
+        return open(bin_, "rb")      # déjà renommé : téléchargement terminé
+
+class Flight:
+    """Téléchargement amont unique, partagé par tous les lecteurs du process."""
+
+    def __init__(self, media_id: int, url: str):
+        self.media_id, self.url = media_id, url
+        self.part = None
+        self.meta = None
+        self.size = 0
+        self.done = False
+        self.error = None
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def run(self, client, lock_fd=None):
+        bin_, part, metap, _ = _paths(self.media_id)
+        # verrou tenu : noms partagés, suivis par les autres workers (FileFollower) ;
+        # sinon noms propres au process, publiés seulement une fois le fichier complet
+        shared = lock_fd is not None
+        if not shared: part, own_meta = _own(part), _own(metap)
+        self.part = part
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            async with client.stream("GET", self.url) as resp:
+                if resp.status_code >= 400:
+                    raise UpstreamError(f"HTTP {resp.status_code}")
+                length = resp.headers.get("content-length")
+                meta = {"url": str(resp.url), "source": self.url,
+                        "content_type": resp.headers.get("content-type"),
+                        "content_encoding": resp.headers.get("content-encoding"),
+                        "content_length": int(length) if length and length.isdigit() else None,
+                        "etag": resp.headers.get("etag"),
+                        "last_modified": resp.headers.get("last-modified")}
+                with open(part, "wb", buffering=0) as out:
+                    with open((metap if shared else own_meta) + ".tmp", "w") as f:
+                        json.dump(meta, f)
+                    os.replace(f.name, metap if shared else own_meta)
+                    self.meta = meta
+                    await self._notify()
+                    async for chunk in resp.aiter_raw(CHUNK):
+                        out.write(chunk)
+                        self.size += len(chunk)
+                        await self._notify()
+            os.replace(part, bin_)
+            if not shared: os.replace(own_meta, metap)
+            self.done = True
+        except Exception as e:
+            self.error = e if isinstance(e, UpstreamError) else UpstreamError(str(e))
+            _remove(part, metap if shared else own_meta)
+        finally:
+            _flights.pop(self.media_id, None)
+            if lock_fd is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN); os.close(lock_fd)
+            await self._notify()
+            if self.done: prune()
+
+    async def wait_meta(self) -> dict:
+        async with self._changed:
+            await asyncio.wait_for(
+                self._changed.wait_for(lambda: self.meta is not None or self.error is not None),
+                META_TIMEOUT)
+        if self.error and self.meta is None:
+            raise self.error
+        return self.meta
+
+    async def chunks(self):
+        bin_ = _paths(self.media_id)[0]
+        with _open_growing(self.part, bin_) as f:
+            pos = 0
+            while True:
+                if pos < self.size or (self.done and pos < os.fstat(f.fileno()).st_size):
+                    data = f.read(CHUNK)
+                    pos += len(data)
+                    if data:
+                        yield data
+                        continue
+                if self.done: return
+                if self.error: raise self.error
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.size > pos or self.done or self.error is not None)
+
+class FileFollower:
+    """Lecteur d'un téléchargement mené par un autre worker (suivi du .part sur disque)."""
+
+    POLL = 0.05
+
+    def __init__(self, media_id: int, url: str):
+        self.media_id, self.url = media_id, url
+
+    def _leader_gone(self) -> bool:
+        _, _, _, lockp = _paths(self.media_id)
+        fd = os.open(lockp, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return True
+        except BlockingIOError:
+            return False
+        finally:
+            os.close(fd)
+
+    async def wait_meta(self) -> dict:
+        bin_, _, metap, _ = _paths(self.media_id)
+        deadline = time.monotonic() + META_TIMEOUT
+        while True:
+            try:
+                with open(metap) as f:
+                    meta = json.load(f)
+                if meta.get("source") == self.url: return meta    # sinon : méta d'une copie périmée
+            except (FileNotFoundError, ValueError):
+                pass
+            if self._leader_gone() or time.monotonic() > deadline:
+                raise UpstreamError("leader_gone")
+            await asyncio.sleep(self.POLL)
+
+    async def chunks(self):
+        bin_, part, _, _ = _paths(self.media_id)
+        with _open_growing(part, bin_) as f:
+            while True:
+                data = f.read(CHUNK)
+                if data:
+                    yield data
+                    continue
+                if os.path.exists(bin_) and f.tell() >= os.fstat(f.fileno()).st_size:
+                    return
+                if not os.path.exists(bin_) and self._leader_gone():
+                    raise UpstreamError("leader_gone")
+                await asyncio.sleep(self.POLL)
+
+_flights: dict[int, Flight] = {}
+
+def join(media_id: int, url: str, client):
+    """Rejoint le téléchargement en cours de ce média, ou le démarre (sans await : atomique)."""
+    fl = _flights.get(media_id)
+    if fl is not None:
+        return fl
+    lock_fd = None
+    if CROSS_WORKER:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        lock_fd = os.open(_paths(media_id)[3], os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock_fd)
+            return FileFollower(media_id, url)
+    fl = _flights[media_id] = Flight(media_id, url)
+    # tâche indépendante du premier client : elle continue si celui-ci abandonne
+    fl.task = asyncio.create_task(fl.run(client, lock_fd))
+    return fl
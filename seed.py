@@ -2,15 +2,10 @@
 import os
 from app import app, db
 from models import Media, Folder, Album
-import cloudinary
-import cloudinary.uploader
+from storage import get_storage
 
-# Configuration Cloudinary depuis les variables d'environnement
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-)
+# Stockage depuis les variables d'environnement (STORAGE_BACKEND=cloudinary|local)
+storage = get_storage()
 
 # Liste de fichiers locaux à uploader pour le seed (ex: ./seed_media/)
 SEED_FILES = [
@@ -34,19 +29,21 @@ with app.app_context():
 
     db.session.commit()
 
-    # Upload sur Cloudinary et création des Media
+    # Upload sur le stockage et création des Media
     for file_path in SEED_FILES:
         if not os.path.exists(file_path):
             print(f"Fichier introuvable: {file_path}")
             continue
 
-        upload_result = cloudinary.uploader.upload(
-            file_path,
-            folder=os.getenv("CLOUDINARY_FOLDER") or "seed_media"
-        )
+        with open(file_path, "rb") as fh:
+            upload_result = storage.put(
+                fh,
+                folder=os.getenv("CLOUDINARY_FOLDER") or "seed_media",
+                filename=os.path.basename(file_path)
+            )
 
         media = Media(
-            url=upload_result["secure_url"],
+            url=upload_result["url"],
             public_id=upload_result["public_id"],
             folder=folder1
         )
@@ -0,0 +1,45 @@
+# storage/__init__.py — accès au stockage des médias (Cloudinary, disque local, mémoire)
+# Rôle : `get_storage()` = backend des nouveaux uploads (STORAGE_BACKEND),
+#        `storage_for(url)` = backend qui détient un média existant.
+import os
+
+BASE_FOLDER      = os.getenv("CLOUDINARY_FOLDER", "galerie-flask")
+LOCAL_URL_PREFIX = "/media/"
+
+_backends = {}
+_default = None
+
+def get_backend(name: str):
+    """Instance unique par backend (config lue à la première utilisation)."""
+    if name not in _backends:
+        if name == "local":
+            from storage.local import LocalStorage
+            _backends[name] = LocalStorage()
+        elif name == "memory":
+            from storage.memory import MemoryStorage
+            _backends[name] = MemoryStorage()
+        else:
+            from storage.cloudinary_backend import CloudinaryStorage
+            _backends[name] = CloudinaryStorage()
+    return _backends[name]
+
+def get_storage():
+    """Backend configuré pour les nouveaux fichiers (STORAGE_BACKEND=cloudinary|local|memory)."""
+    global _default
+    if _default is None:
+        _default = get_backend(os.getenv("STORAGE_BACKEND", "cloudinary").lower())
+    return _default
+
+def set_storage(backend):
+    """Remplace le backend courant (tests : set_storage(MemoryStorage()))."""
+    global _default
+    _backends[backend.name] = backend
+    _default = backend
+    return backend
+
+def storage_for(url: str):
+    """Backend d'un média existant, déduit de son URL (une galerie peut mélanger les backends)."""
+    u = url or ""
+    if u.startswith(LOCAL_URL_PREFIX): return get_backend("local")
+    if u.startswith("memory://"):      return get_backend("memory")
+    return get_backend("cloudinary")
@@ -0,0 +1,58 @@
+# storage/base.py — interface commune des backends de stockage
+# Chaque backend range un fichier sous un `public_id` (« dossier/…/nom ») et sait
+# le servir, le supprimer, le lister et en donner une miniature.
+# Méthodes abstraites : obligatoires (un backend incomplet ne s'instancie pas) ;
+# les autres ont un repli neutre (pas de miniature, pas de listing…).
+from abc import ABC, abstractmethod
+
+class Storage(ABC):
+    name = "base"
+
+    @abstractmethod
+    def put(self, fileobj, folder: str, filename: str) -> dict:
+        """Enregistre un fichier → {public_id, url, resource_type, bytes, raw}."""
+
+    @abstractmethod
+    def delete(self, public_id: str, url: str | None = None, resource_type: str | None = None) -> bool:
+        """Supprime le fichier → True s'il n'existe plus (déjà absent compris)."""
+
+    @abstractmethod
+    def rename(self, public_id: str, new_public_id: str, url: str | None = None,
+               resource_type: str | None = None) -> dict:
+        """Déplace un fichier (sans écraser) → {public_id, url}."""
+
+    def folder_prefix(self, folder: str) -> str:
+        """Préfixe des public_id produits par put(…, folder=folder)."""
+        return folder.strip("/")
+
+    @abstractmethod
+    def url(self, public_id: str, resource_type: str = "image") -> str:
+        """URL publique du fichier original."""
+
+    def thumbnail(self, public_id: str, kind: str, url: str, width: int = 480, height: int | None = 320) -> str:
+        """URL de miniature (recadrée si height, sinon proportions conservées), ou "" si le backend n'en produit pas."""
+        return ""
+
+    def streaming_url(self, public_id: str, url: str) -> str:
+        """Manifeste HLS adaptatif fourni par le backend, ou "" (segmentation locale sinon)."""
+        return ""
+
+    def metadata(self, public_id: str, url: str) -> dict:
+        """{width, height, duration, bytes, format, taken_at} connus du backend sans relire
+        l'original, ou {} (extraction depuis le fichier, api/metadata.py)."""
+        return {}
+
+    @abstractmethod
+    def stream(self, public_id: str, url: str | None = None, chunk_size: int = 64 * 1024):
+        """Itérateur d'octets sur le fichier original."""
+
+    def local_path(self, public_id: str) -> str | None:
+        """Chemin disque si le fichier est servable directement (send_file), sinon None."""
+        return None
+
+    def subfolders(self, prefix: str) -> list[str]:
+        return []
+
+    def list(self, prefix: str, page_size: int = 500):
+        """Pages de ressources {public_id, resource_type, url, bytes, created_at}."""
+        return iter(())
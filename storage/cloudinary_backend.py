@@ -0,0 +1,125 @@
+# storage/cloudinary_backend.py — backend Cloudinary (Upload API + Admin API)
+import os, mimetypes
+import requests
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+from cloudinary.utils import cloudinary_url
+
+from storage.base import Storage
+
+RESOURCE_TYPES = ("image", "video", "raw")
+STREAMING      = {"streaming_profile": "auto", "format": "m3u8"}   # profil choisi d'après la source
+_UA = {"User-Agent": "galerie-flask"}
+
+def resource_type_from_url(url: str) -> str:
+    """Cloudinary exige le bon resource_type pour destroy ; on le lit dans l'URL."""
+    u = (url or "").lower()
+    if "/video/upload/" in u: return "video"
+    if "/raw/upload/"   in u: return "raw"
+    return "image"
+
+def _meta(res: dict) -> dict:
+    """Réponse Upload/Admin API → métadonnées normalisées (date EXIF si media_metadata)."""
+    exif = res.get("media_metadata") or res.get("image_metadata") or {}
+    out = {k: res[k] for k in ("width", "height", "duration", "bytes", "format") if res.get(k) is not None}
+    taken = exif.get("DateTimeOriginal") or exif.get("CreateDate") or exif.get("DateTime")
+    if taken: out["taken_at"] = taken
+    return out
+
+class CloudinaryStorage(Storage):
+    name = "cloudinary"
+
+    def __init__(self):
+        # config paresseuse : rien n'est lu tant qu'aucun appel ne parle au stockage
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            secure=True,
+        )
+
+    def put(self, fileobj, folder: str, filename: str) -> dict:
+        opts = {"media_metadata": True}          # EXIF/XMP renvoyés avec la réponse d'upload
+        if (mimetypes.guess_type(filename or "")[0] or "").startswith("video/"):
+            # échelle HLS préparée dès l'upload (sinon générée au premier accès au manifeste)
+            opts.update(eager=[STREAMING], eager_async=True)
+        res = cloudinary.uploader.upload(fileobj, folder=folder, resource_type="auto",
+                                         overwrite=False, invalidate=True, **opts)
+        return {"public_id": res["public_id"], "url": res["secure_url"],
+                "resource_type": res.get("resource_type", "image"),
+                "bytes": res.get("bytes", 0), "meta": _meta(res), "raw": res}
+
+    def delete(self, public_id: str, url: str | None = None, resource_type: str | None = None) -> bool:
+        rt = resource_type or resource_type_from_url(url)
+        res = cloudinary.uploader.destroy(public_id, invalidate=True, resource_type=rt)
+        return res.get("result") in ("ok", "not found")
+
+    def rename(self, public_id: str, new_public_id: str, url: str | None = None,
+               resource_type: str | None = None) -> dict:
+        rt = resource_type or resource_type_from_url(url)
+        res = cloudinary.uploader.rename(public_id, new_public_id, resource_type=rt,
+                                         overwrite=False, invalidate=True)
+        return {"public_id": res["public_id"], "url": res["secure_url"]}
+
+    def url(self, public_id: str, resource_type: str = "image") -> str:
+        u, _ = cloudinary_url(public_id, resource_type=resource_type, type="upload", secure=True)
+        return u
+
+    def thumbnail(self, public_id: str, kind: str, url: str, width: int = 480, height: int | None = 320) -> str:
+        # sans hauteur : réduction simple (jamais d'agrandissement), pour la visionneuse
+        tr = ({"width": width, "height": height, "crop": "fill", "gravity": "auto"} if height
+              else {"width": width, "crop": "limit"})
+        tr.update(quality="auto", fetch_format="auto")
+        if kind == "videos":
+            u, _ = cloudinary_url(public_id, resource_type="video", type="upload", format="jpg",
+                                  transformation=[{**tr, "start_offset": "auto"}])
+            return u
+        if kind == "photos":
+            u, _ = cloudinary_url(public_id, resource_type="image", type="upload", transformation=[tr])
+            return u
+        return ""
+
+    def streaming_url(self, public_id: str, url: str) -> str:
+        if resource_type_from_url(url) != "video": return ""
+        u, _ = cloudinary_url(public_id, resource_type="video", type="upload", secure=True, **STREAMING)
+        return u
+
+    def metadata(self, public_id: str, url: str) -> dict:
+        res = cloudinary.api.resource(public_id, resource_type=resource_type_from_url(url), media_metadata=True)
+        return _meta(res)
+
+    def stream(self, public_id: str, url: str | None = None, chunk_size: int = 64 * 1024):
+        r = requests.get(url or self.url(public_id), headers=_UA, stream=True, timeout=20)
+        r.raise_for_status()
+        try:
+            for chunk in r.iter_content(chunk_size):
+                if chunk: yield chunk
+        finally:
+            r.close()
+
+    def subfolders(self, prefix: str) -> list[str]:
+        out, cursor = [], None
+        while True:
+            kw = {"max_results": 500}
+            if cursor: kw["next_cursor"] = cursor
+            res = cloudinary.api.subfolders(prefix, **kw)
+            out += [f["path"] for f in res.get("folders", [])]
+            cursor = res.get("next_cursor")
+            if not cursor:
+                return out
+
+    def list(self, prefix: str, page_size: int = 500):
+        for rt in RESOURCE_TYPES:
+            cursor = None
+            while True:
+                kw = {"type": "upload", "resource_type": rt, "prefix": prefix, "max_results": page_size}
+                if cursor: kw["next_cursor"] = cursor
+                res = cloudinary.api.resources(**kw)
+                yield [{"public_id": r["public_id"], "resource_type": rt,
+                        "url": r.get("secure_url"), "bytes": r.get("bytes", 0),
+                        "created_at": r.get("created_at")}
+                       for r in res.get("resources", [])]
+                cursor = res.get("next_cursor")
+                if not cursor:
+                    break
@@ -0,0 +1,95 @@
+# storage/local.py — backend disque local (déploiement privé / hors ligne)
+# Les fichiers vivent sous MEDIA_ROOT/<public_id> et sont servis par /media/<public_id>
+# (send_file : X-Sendfile si USE_X_SENDFILE=1, en-têtes conditionnels, Range).
+import os, shutil, tempfile, uuid, mimetypes
+from datetime import datetime, timezone
+from urllib.parse import quote
+from werkzeug.utils import secure_filename, safe_join
+
+from storage.base import Storage
+from storage import LOCAL_URL_PREFIX
+
+_ROOT_DEFAULT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "media")
+
+def _resource_type(filename: str) -> str:
+    mt = mimetypes.guess_type(filename)[0] or ""
+    if mt.startswith("image/"): return "image"
+    if mt.startswith(("video/", "audio/")): return "video"
+    return "raw"
+
+class LocalStorage(Storage):
+    name = "local"
+
+    def __init__(self, root: str | None = None):
+        self.root = os.path.abspath(root or os.getenv("MEDIA_ROOT") or _ROOT_DEFAULT)
+        os.makedirs(self.root, exist_ok=True)
+
+    def local_path(self, public_id: str) -> str | None:
+        return safe_join(self.root, public_id)
+
+    def folder_prefix(self, folder: str) -> str:
+        return "/".join(secure_filename(p) or "_" for p in folder.split("/") if p)
+
+    def put(self, fileobj, folder: str, filename: str) -> dict:
+        name = f"{uuid.uuid4().hex[:12]}_{secure_filename(filename) or 'file'}"
+        public_id = f"{self.folder_prefix(folder)}/{name}"
+        dest = self.local_path(public_id)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        # écriture atomique : un lecteur ne voit jamais un fichier à moitié copié
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".up-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(getattr(fileobj, "stream", fileobj), out, 1024 * 1024)
+            os.replace(tmp, dest)
+        except Exception:
+            if os.path.exists(tmp): os.remove(tmp)
+            raise
+        return {"public_id": public_id, "url": self.url(public_id),
+                "resource_type": _resource_type(filename),
+                "bytes": os.path.getsize(dest), "raw": {}}
+
+    def delete(self, public_id: str, url: str | None = None, resource_type: str | None = None) -> bool:
+        path = self.local_path(public_id)
+        if path and os.path.exists(path):
+            os.remove(path)
+        return True
+
+    def rename(self, public_id: str, new_public_id: str, url: str | None = None,
+               resource_type: str | None = None) -> dict:
+        src, dest = self.local_path(public_id), self.local_path(new_public_id)
+        if not src or not dest: raise ValueError("public_id invalide")
+        if os.path.exists(dest): raise FileExistsError(new_public_id)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.rename(src, dest)             # même système de fichiers : atomique
+        return {"public_id": new_public_id, "url": self.url(new_public_id)}
+
+    def url(self, public_id: str, resource_type: str = "image") -> str:
+        return LOCAL_URL_PREFIX + quote(public_id)
+
+    def stream(self, public_id: str, url: str | None = None, chunk_size: int = 64 * 1024):
+        with open(self.local_path(public_id), "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def subfolders(self, prefix: str) -> list[str]:
+        base = self.local_path(prefix.strip("/"))
+        if not base or not os.path.isdir(base): return []
+        return [f"{prefix.strip('/')}/{e.name}" for e in os.scandir(base) if e.is_dir()]
+
+    def list(self, prefix: str, page_size: int = 500):
+        base = self.local_path(prefix.strip("/"))
+        if not base or not os.path.isdir(base): return
+        page = []
+        for dirpath, _, files in os.walk(base):
+            for fn in files:
+                if fn.startswith(".up-"): continue
+                full = os.path.join(dirpath, fn)
+                st = os.stat(full)
+                pid = os.path.relpath(full, self.root).replace(os.sep, "/")
+                page.append({"public_id": pid, "resource_type": _resource_type(fn),
+                             "url": self.url(pid), "bytes": st.st_size,
+                             "created_at": datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat()})
+                if len(page) >= page_size:
+                    yield page; page = []
+        if page:
+            yield page
@@ -0,0 +1,69 @@
+# storage/memory.py — faux stockage en mémoire (tests, démos hors ligne)
+# Même interface que les vrais backends, sans réseau ni disque.
+import threading
+
+from storage.base import Storage
+
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self, page_size: int = 100):
+        self.page_size = page_size
+        self.resources = {}          # public_id → {public_id, resource_type, url, bytes}
+        self.blobs = {}              # public_id → contenu (fichiers passés par put)
+        self.deleted = []
+        self._lock = threading.Lock()
+
+    def add(self, public_id: str, resource_type: str = "image", size: int = 0) -> dict:
+        res = {"public_id": public_id, "resource_type": resource_type,
+               "url": self.url(public_id, resource_type), "bytes": size}
+        with self._lock:
+            self.resources[public_id] = res
+        return res
+
+    def put(self, fileobj, folder: str, filename: str) -> dict:
+        data = fileobj.read()
+        public_id = f"{folder.strip('/')}/{filename}"
+        res = self.add(public_id, size=len(data))
+        with self._lock:
+            self.blobs[public_id] = data
+        return {**res, "raw": {}}
+
+    def delete(self, public_id: str, url: str | None = None, resource_type: str | None = None) -> bool:
+        with self._lock:
+            self.resources.pop(public_id, None)
+            self.blobs.pop(public_id, None)
+            self.deleted.append(public_id)
+        return True
+
+    def rename(self, public_id: str, new_public_id: str, url: str | None = None,
+               resource_type: str | None = None) -> dict:
+        with self._lock:
+            if new_public_id in self.resources: raise FileExistsError(new_public_id)
+            res = self.resources.pop(public_id)
+            res = {**res, "public_id": new_public_id, "url": self.url(new_public_id, res["resource_type"])}
+            self.resources[new_public_id] = res
+            if public_id in self.blobs:
+                self.blobs[new_public_id] = self.blobs.pop(public_id)
+        return {"public_id": new_public_id, "url": res["url"]}
+
+    def url(self, public_id: str, resource_type: str = "image") -> str:
+        return f"memory://{resource_type}/{public_id}"
+
+    def stream(self, public_id: str, url: str | None = None, chunk_size: int = 64 * 1024):
+        data = self.blobs.get(public_id, b"")
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    def subfolders(self, prefix: str) -> list[str]:
+        base = prefix.rstrip("/") + "/"
+        subs = {base + pid[len(base):].split("/", 1)[0]
+                for pid in self.resources if pid.startswith(base) and "/" in pid[len(base):]}
+        return sorted(subs)
+
+    def list(self, prefix: str, page_size: int | None = None):
+        size = page_size or self.page_size
+        with self._lock:
+            ids = sorted(pid for pid in self.resources if pid.startswith(prefix))
+        for i in range(0, len(ids), size):
+            yield [self.resources[pid] for pid in ids[i:i + size] if pid in self.resources]
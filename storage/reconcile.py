@@ -0,0 +1,180 @@
+# storage/reconcile.py — réconciliation table media ↔ stockage distant
+# Rôle : repérer (et corriger) les ressources orphelines côté stockage
+#        et les lignes media dont le fichier distant a disparu.
+# Usage : flask storage reconcile [--fix-orphans] [--fix-missing] [-v]
+import queue, threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, delete
+from extensions import db
+from models import Media
+from api import folder_stats, events
+from storage import get_storage, storage_for, BASE_FOLDER
+import proxy_cache
+
+SAMPLE_MAX = 50
+
+def iter_remote_pages(storage, prefixes, workers: int = 4, page_size: int = 500, stop=None):
+    """
+    Liste chaque préfixe dans son propre thread et remonte les pages au fil de l'eau
+    via une file bornée (le listing ne prend jamais d'avance illimitée sur le diff).
+    Produit des tuples ("page", prefix, [ressources]) ou ("error", prefix, exception).
+    """
+    stop = stop or threading.Event()
+    q = queue.Queue(maxsize=max(2, workers * 2))
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5); return
+            except queue.Full:
+                continue
+
+    def _worker(prefix):
+        try:
+            for page in storage.list(prefix, page_size=page_size):
+                if stop.is_set(): return
+                _put(("page", prefix, page))
+        except Exception as e:
+            _put(("error", prefix, e))
+        finally:
+            _put(("done", prefix, None))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reconcile") as ex:
+        for p in prefixes:
+            ex.submit(_worker, p)
+        pending = len(prefixes)
+        try:
+            while pending:
+                kind, prefix, payload = q.get()
+                if kind == "done":
+                    pending -= 1
+                else:
+                    yield kind, prefix, payload
+        finally:
+            stop.set()
+
+def _is_recent(res: dict, cutoff: datetime) -> bool:
+    ts = res.get("created_at")
+    if not ts: return False
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00")) > cutoff
+    except ValueError:
+        return False
+
+def reconcile(storage=None, base: str = BASE_FOLDER, fix_orphans: bool = False,
+              fix_missing: bool = False, workers: int = 4, page_size: int = 500,
+              grace_seconds: int = 3600, on_event=None) -> dict:
+    """
+    1) liste le stockage dossier par dossier (en parallèle) et, page par page,
+       cherche les public_id dans la table media (index unique → lookup indexé) :
+       ce qui n'existe pas en base est orphelin ;
+    2) parcourt ensuite la base en streaming : une ligne sous un préfixe listé
+       sans ressource distante correspondante est « manquante ».
+    Les éléments plus récents que `grace_seconds` sont ignorés (upload en cours).
+    """
+    storage = storage or get_storage()
+    on_event = on_event or (lambda kind, data: None)
+    base = base.rstrip("/")
+    started = datetime.now(timezone.utc)
+    cutoff = started - timedelta(seconds=grace_seconds)
+
+    prefixes = [p.rstrip("/") + "/" for p in storage.subfolders(base)] or [base + "/"]
+    report = {"prefixes": len(prefixes), "remote": 0, "orphans": 0, "missing": 0,
+              "deleted_remote": 0, "deleted_db": 0, "errors": [],
+              "orphan_samples": [], "missing_samples": []}
+    seen, failed = set(), set()
+
+    deleter = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reconcile-del")
+    deletions = []
+
+    for kind, prefix, payload in iter_remote_pages(storage, prefixes, workers, page_size):
+        if kind == "error":
+            failed.add(prefix)
+            report["errors"].append({"prefix": prefix, "error": str(payload)})
+            on_event("error", {"prefix": prefix, "error": str(payload)})
+            continue
+        page = {r["public_id"]: r for r in payload}
+        if not page: continue
+        seen.update(page)
+        report["remote"] += len(page)
+        known = set(db.session.execute(
+            select(Media.public_id).where(Media.public_id.in_(list(page)))).scalars())
+        for pid in page.keys() - known:
+            res = page[pid]
+            if _is_recent(res, cutoff): continue
+            report["orphans"] += 1
+            if len(report["orphan_samples"]) < SAMPLE_MAX: report["orphan_samples"].append(pid)
+            on_event("orphan", res)
+            if fix_orphans:
+                deletions.append(deleter.submit(storage.delete, pid, resource_type=res.get("resource_type")))
+        db.session.rollback()   # ne pas garder de transaction ouverte pendant le listing
+
+    # Lignes media de CE backend (une galerie peut en mélanger plusieurs sous le même
+    # BASE_FOLDER), sous les préfixes listés avec succès, créées avant le début du listing
+    missing_ids = []
+    listed = tuple(p for p in prefixes if p not in failed)
+    stmt = (select(Media.id, Media.public_id, Media.url, Media.created_at)
+            .where(Media.public_id.startswith(base + "/", autoescape=True))
+            .order_by(Media.id)
+            .execution_options(stream_results=True, yield_per=1000))
+    naive_start = started.replace(tzinfo=None)
+    for mid, pid, url, created in db.session.execute(stmt):
+        if pid in seen or not pid.startswith(listed): continue
+        if storage_for(url).name != storage.name: continue
+        if created and created >= naive_start - timedelta(seconds=grace_seconds): continue
+        report["missing"] += 1
+        if len(report["missing_samples"]) < SAMPLE_MAX: report["missing_samples"].append(pid)
+        on_event("missing", {"id": mid, "public_id": pid})
+        missing_ids.append(mid)
+
+    if fix_missing and missing_ids:
+        for i in range(0, len(missing_ids), 500):
+            chunk = missing_ids[i:i + 500]
+            stmt = delete(Media).where(Media.id.in_(chunk))
+            if db.engine.dialect.delete_returning:
+                rows = db.session.execute(stmt.returning(Media.folder_id, Media.url, Media.id)).all()
+                folder_stats.apply_rows(db.session.connection(), removed=[(r.folder_id, r.url) for r in rows])
+            else:
+                rows = db.session.execute(select(Media.folder_id, Media.id).where(Media.id.in_(chunk))).all()
+                db.session.execute(stmt)
+                folder_stats.rebuild(db.session.connection(), {r.folder_id for r in rows} - {None})
+            events.record_many([events.row("media", "delete", r.id, folder_id=r.folder_id) for r in rows])
+            db.session.commit()
+            proxy_cache.evict([r.id for r in rows])
+            report["deleted_db"] += len(chunk)
+
+    for fut in deletions:
+        try:
+            if fut.result(): report["deleted_remote"] += 1
+        except Exception as e:
+            report["errors"].append({"delete": str(e)})
+    deleter.shutdown(wait=True)
+    return report
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+storage_cli = AppGroup("storage", help="Stockage distant des médias.")
+
+@storage_cli.command("reconcile")
+@click.option("--fix-orphans", is_flag=True, help="Supprime côté stockage les ressources absentes de la base.")
+@click.option("--fix-missing", is_flag=True, help="Supprime de la base les médias dont le fichier a disparu.")
+@click.option("--workers", type=int, default=4, show_default=True, help="Listings de dossiers en parallèle.")
+@click.option("--grace", type=int, default=3600, show_default=True, help="Ignore ce qui a moins de N secondes.")
+@click.option("-v", "--verbose", is_flag=True, help="Affiche chaque orphelin / manquant.")
+def reconcile_cmd(fix_orphans, fix_missing, workers, grace, verbose):
+    """Compare la table media et le stockage (dossier CLOUDINARY_FOLDER)."""
+    def _echo(kind, data):
+        if kind == "error" or verbose:
+            click.echo(f"{kind:8} {data.get('public_id') or data}")
+    r = reconcile(fix_orphans=fix_orphans, fix_missing=fix_missing, workers=workers,
+                  grace_seconds=grace, on_event=_echo)
+    click.echo(f"dossiers listés : {r['prefixes']} — ressources distantes : {r['remote']}")
+    click.echo(f"orphelins (stockage sans ligne media) : {r['orphans']}"
+               + (f" — supprimés : {r['deleted_remote']}" if fix_orphans else ""))
+    click.echo(f"manquants (ligne media sans fichier)  : {r['missing']}"
+               + (f" — supprimés : {r['deleted_db']}" if fix_missing else ""))
+    if r["errors"]:
+        click.echo(f"erreurs : {len(r['errors'])} (préfixes en erreur exclus du diff)")
@@ -0,0 +1,128 @@
+// templates/sw.js — service worker servi à la racine par /sw.js (portée : tout le site)
+// Rôle : coquille statique versionnée en précache, listes API en stale-while-revalidate,
+//        miniatures récentes en cache borné, météo/géoloc avec durée de vie.
+// La version change avec les URL ?v=<mtime> des fichiers statiques : tout déploiement
+// qui modifie la coquille installe un nouveau worker et purge l'ancienne.
+const VERSION    = {{ version|tojson }};
+const SHELL      = [{% for p in pages %}{{ p|tojson }}, {% endfor %}
+{%- for f in static_files %}{{ url_for('static', filename=f)|tojson }}{{ ", " if not loop.last }}{% endfor %}];
+const SHELL_CACHE = `shell-${VERSION}`;
+const API_CACHE   = 'api-v1';
+const THUMB_CACHE = 'thumbs-v1';
+const EXT_CACHE   = 'ext-v1';
+const MAX_THUMBS  = 300;
+const MAX_API     = 200;
+
+// API externes du bandeau (météo, localisation) : durée de vie par hôte
+const EXT_TTL = {
+  'ipapi.co': 24*3600e3, 'ipinfo.io': 24*3600e3,
+  'api.open-meteo.com': 3600e3,
+  'nominatim.openstreetmap.org': 7*24*3600e3,
+};
+const API_LISTS = [/^\/api\/media\/list(\/|$)/, /^\/api\/folders\/(list|page)$/];
+// miniatures de cartes uniquement (pas les originaux ni les dérivés plein écran)
+const LOCAL_THUMB = /^\/thumb\/\d+\/(s|m|l|auto)$/;
+const CLOUD_THUMB = /\/upload\/[^/]*\bc_fill\b/;
+
+self.addEventListener('install', (e)=>{
+  e.waitUntil((async()=>{
+    const c=await caches.open(SHELL_CACHE);
+    // un fichier manquant ne doit pas bloquer l'installation (addAll est tout ou rien)
+    await Promise.all(SHELL.map(u=>c.add(new Request(u,{cache:'reload'})).catch(()=>{})));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', (e)=>{
+  e.waitUntil((async()=>{
+    for(const k of await caches.keys()) if(k.startsWith('shell-') && k!==SHELL_CACHE) await caches.delete(k);
+    await self.clients.claim();
+  })());
+});
+
+async function trim(name, max){
+  // keys() suit l'ordre d'insertion : on retire les plus anciennes entrées
+  const c=await caches.open(name), keys=await c.keys();
+  for(let i=0; i<keys.length-max; i++) await c.delete(keys[i]);
+}
+
+function cacheable(res){ return res && res.ok && (res.type==='basic' || res.type==='cors'); }
+
+async function staleWhileRevalidate(e, name, max){
+  const c=await caches.open(name), hit=await c.match(e.request);
+  const net=fetch(e.request).then(async res=>{
+    if(cacheable(res)){ await c.put(e.request, res.clone()); if(max) await trim(name, max); }
+    return res;
+  });
+  if(hit){ e.waitUntil(net.catch(()=>{})); return hit; }
+  return net;
+}
+
+async function cacheFirst(e, name, max){
+  const c=await caches.open(name), hit=await c.match(e.request);
+  if(hit){
+    // réinsérée en fin de liste : l'éviction retire les moins récemment vues
+    e.waitUntil(c.delete(e.request).then(()=>c.put(e.request, hit.clone())));
+    return hit;
+  }
+  const res=await fetch(e.request);
+  if(cacheable(res)) e.waitUntil(c.put(e.request, res.clone()).then(()=>trim(name, max)));
+  return res;
+}
+
+async function withTtl(e, ttl){
+  const c=await caches.open(EXT_CACHE), hit=await c.match(e.request);
+  if(hit && Date.now()-Number(hit.headers.get('sw-fetched-at')||0) < ttl) return hit;
+  try{
+    const res=await fetch(e.request);
+    if(cacheable(res)){
+      const body=await res.clone().blob(), headers=new Headers(res.headers);
+      headers.set('sw-fetched-at', String(Date.now()));
+      e.waitUntil(c.put(e.request, new Response(body,{status:res.status, statusText:res.statusText, headers})));
+    }
+    return res;
+  }catch(err){
+    if(hit) return hit;            // hors ligne : dernière valeur connue, même expirée
+    throw err;
+  }
+}
+
+self.addEventListener('fetch', (e)=>{
+  const req=e.request, url=new URL(req.url);
+  const same = url.origin===self.location.origin;
+
+  if(req.method!=='GET'){
+    // écriture sur l'API : les listes en cache ne reflètent plus la base
+    if(same && url.pathname.startsWith('/api/'))
+      e.respondWith(fetch(req).then(res=>{ if(res.ok) e.waitUntil(caches.delete(API_CACHE)); return res; }));
+    return;
+  }
+  if(req.headers.has('range')) return;          // vidéos/audio : laissés au réseau
+
+  if(same){
+    if(req.mode==='navigate'){
+      // page : affichée tout de suite depuis le cache, rafraîchie en arrière-plan
+      e.respondWith(caches.match(url.pathname, {cacheName:SHELL_CACHE}).then(hit=>{
+        const net=fetch(req).then(async res=>{
+          if(cacheable(res) && SHELL.includes(url.pathname)) await (await caches.open(SHELL_CACHE)).put(url.pathname, res.clone());
+          return res;
+        });
+        if(hit){ e.waitUntil(net.catch(()=>{})); return hit; }
+        return net;
+      }));
+      return;
+    }
+    if(url.pathname.startsWith('/static/')){
+      e.respondWith(caches.match(req).then(hit=>hit || fetch(req)));
+      return;
+    }
+    if(API_LISTS.some(r=>r.test(url.pathname))){ e.respondWith(staleWhileRevalidate(e, API_CACHE, MAX_API)); return; }
+    if(LOCAL_THUMB.test(url.pathname)){ e.respondWith(cacheFirst(e, THUMB_CACHE, MAX_THUMBS)); return; }
+    return;
+  }
+  if(url.hostname==='res.cloudinary.com' && CLOUD_THUMB.test(url.pathname)){
+    e.respondWith(cacheFirst(e, THUMB_CACHE, MAX_THUMBS)); return;
+  }
+  const ttl=EXT_TTL[url.hostname];
+  if(ttl) e.respondWith(withTtl(e, ttl));
+});
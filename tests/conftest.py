@@ -0,0 +1,46 @@
+# tests/conftest.py — application de test : SQLite et caches dans un dossier temporaire,
+# stockage en mémoire (storage/memory.py), sans limitation de débit. Lancer : python -m pytest
+import os, sys, tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="galerie-tests-")
+os.environ.update({
+    "DATABASE_URL":     f"sqlite:///{_TMP}/test.db",
+    "MEDIA_ROOT":       os.path.join(_TMP, "media"),
+    "THUMB_CACHE_DIR":  os.path.join(_TMP, "thumbs"),
+    "HLS_DIR":          os.path.join(_TMP, "hls"),
+    "PROXY_CACHE_DIR":  os.path.join(_TMP, "proxy"),
+    "STORAGE_BACKEND":  "memory",
+    "RATE_LIMIT":       "0",
+    "CLOUDINARY_CLOUD_NAME": "test",
+})
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app as flask_app
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+@pytest.fixture
+def db(app):
+    """Base vide à chaque test, dans un contexte d'application."""
+    from extensions import db as _db
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        yield _db
+        _db.session.remove()
+
+@pytest.fixture
+def storage():
+    """Backend mémoire neuf, installé comme stockage courant."""
+    from storage import set_storage
+    from storage.memory import MemoryStorage
+    return set_storage(MemoryStorage(page_size=2))
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
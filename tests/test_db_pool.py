@@ -0,0 +1,67 @@
+# tests/test_db_pool.py — db_pool.py : checkout / retour, attentes, pings, dispose
+import threading, time
+import pytest
+from sqlalchemy import create_engine, text, exc
+import db_pool
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_pool, "PING_MODE", "checkout")
+    eng = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=db_pool.MeteredQueuePool,
+                        pool_size=1, max_overflow=1, pool_timeout=0.3, pool_pre_ping=False)
+    db_pool.instrument(eng)
+    yield eng
+    eng.dispose()
+
+def test_checkout_and_return_are_counted(engine):
+    with engine.connect() as c1, engine.connect() as c2:
+        c1.execute(text("select 1")); c2.execute(text("select 1"))
+        s = db_pool.stats(engine)
+        assert (s["checked_out"], s["overflow_in_use"], s["max_connections"]) == (2, 1, 2)
+    s = db_pool.stats(engine)
+    assert s["checked_out"] == 0 and s["checkouts"] == 2 and s["peak_checked_out"] == 2
+    assert s["connects"] == 2 and s["ping"]["count"] == 2 and s["pool_size"] == 1
+
+def test_saturated_pool_records_wait_and_timeout(engine):
+    held = [engine.connect(), engine.connect()]
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    # une place se libère pendant l'attente : attente mesurée, pas d'échec
+    threading.Timer(0.1, held.pop().close).start()
+    with engine.connect():
+        pass
+    held[0].close()
+    s = db_pool.stats(engine)
+    assert s["timeouts"] == 1 and s["waits"]["count"] == 2 and s["waits"]["max_ms"] >= 90
+
+def test_failed_ping_replaces_the_connection(engine, monkeypatch):
+    with engine.connect(): pass
+    calls = []
+    real = engine.dialect.do_ping
+    def flaky(conn):
+        calls.append(conn)
+        if len(calls) == 1: raise engine.dialect.dbapi.OperationalError("server closed the connection")
+        return real(conn)
+    monkeypatch.setattr(engine.dialect, "do_ping", flaky)
+    with engine.connect() as c:
+        assert c.execute(text("select 1")).scalar() == 1
+    s = db_pool.stats(engine)
+    assert s["ping"]["failures"] == 1 and s["invalidations"] == 1 and s["connects"] == 2
+
+def test_idle_mode_pings_only_after_inactivity(engine, monkeypatch):
+    monkeypatch.setattr(db_pool, "PING_MODE", "idle")
+    monkeypatch.setattr(db_pool, "PING_INTERVAL", 0.2)
+    for _ in range(3):
+        with engine.connect(): pass
+    assert db_pool.stats(engine)["ping"]["count"] == 0
+    time.sleep(0.3)
+    with engine.connect(): pass
+    assert db_pool.stats(engine)["ping"]["count"] == 1
+
+def test_dispose_keeps_stats_and_limits(engine):
+    with engine.connect(): pass
+    engine.dispose()
+    assert isinstance(engine.pool, db_pool.MeteredQueuePool)
+    with engine.connect(): pass
+    s = db_pool.stats(engine)
+    assert s["checkouts"] == 2 and s["max_connections"] == 2 and s["pool_size"] == 1
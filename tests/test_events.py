@@ -0,0 +1,44 @@
+# tests/test_events.py — hooks de flush (change_event, folder_stats) limités à db.session
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from models import Folder, Media, FolderStats, ChangeEvent
+
+def _count(db, model):
+    return db.session.execute(select(func.count()).select_from(model)).scalar()
+
+def test_app_session_records_events_and_stats(db):
+    f = Folder(name="A"); db.session.add(f); db.session.flush()
+    db.session.add(Media(folder_id=f.id, public_id="a/x.jpg", url="memory://image/a/x.jpg"))
+    db.session.commit()
+    ops = db.session.execute(select(ChangeEvent.entity, ChangeEvent.op).order_by(ChangeEvent.id)).all()
+    assert [tuple(o) for o in ops] == [("folder", "insert"), ("media", "insert")]
+    assert db.session.get(FolderStats, f.id).photos == 1
+
+def test_other_sessions_are_not_hooked(db):
+    with Session(db.engine) as s:            # outil, migration, script : session hors application
+        f = Folder(name="B"); s.add(f); s.flush()
+        s.add(Media(folder_id=f.id, public_id="b/x.jpg", url="memory://image/b/x.jpg"))
+        s.commit()
+    assert _count(db, ChangeEvent) == 0 and _count(db, FolderStats) == 0
+
+def test_poll_returns_events_after_cursor(client, db):
+    start = client.get("/api/events/poll").get_json()
+    assert start["events"] == []
+    client.post("/api/folders/create", json={"name": "Vacances"})
+    body = client.get(f"/api/events/poll?last_event_id={start['cursor']}").get_json()
+    assert [(e["entity"], e["op"]) for e in body["events"]] == [("folder", "insert")]
+    assert body["cursor"] == body["events"][-1]["event_id"]
+    assert client.get(f"/api/events/poll?last_event_id={body['cursor']}").get_json()["events"] == []
+
+def test_stream_cap_refuses_then_frees(client, db, monkeypatch):
+    import threading
+    from api import events
+    monkeypatch.setattr(events, "_streams", threading.BoundedSemaphore(1))
+    first = client.get("/api/events")
+    assert first.status_code == 200
+    refused = client.get("/api/events")
+    assert refused.status_code == 503 and refused.headers["Retry-After"] == "5"
+    first.close()                      # onglet fermé : place rendue
+    again = client.get("/api/events")
+    assert again.status_code == 200
+    again.close()
@@ -0,0 +1,59 @@
+# tests/test_jobs.py — jobs.py : état en base, lisible depuis un autre worker
+import json, threading, time
+import jobs
+
+def _wait(job_id, timeout=5):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        j = jobs.get(job_id)
+        if j and j.state in ("done", "error"): return j
+        time.sleep(0.02)
+    raise AssertionError("job non terminé")
+
+def _other_worker(job_id):
+    """Vue d'un autre process : registre local vide, seule la table compte."""
+    with jobs._jobs_lock:
+        assert job_id not in jobs._jobs
+    return jobs.get(job_id)
+
+def test_result_and_progress_are_visible_from_any_worker(client, db):
+    go = threading.Event()
+    def work(job):
+        job.update(moved=3, total=10); job.save()
+        go.wait(5)
+        return {"moved": 10}
+    job = jobs.start("folder_merge", work, {"source_id": 1, "target_id": 2})
+    time.sleep(0.2)
+    with jobs._jobs_lock:
+        local = jobs._jobs.pop(job.id)               # comme si la requête tombait ailleurs
+    seen = jobs.get(job.id)
+    assert seen.state == "running" and seen.progress == {"moved": 3, "total": 10}
+    assert jobs.active("folder_merge", source_id=1).id == job.id
+    assert jobs.active("folder_merge", source_id=2) is None
+    with jobs._jobs_lock:
+        jobs._jobs[job.id] = local
+    go.set()
+    _wait(job.id)
+    r = client.get(f"/api/jobs/{job.id}").get_json()
+    assert r["job"]["state"] == "done" and r["job"]["result"] == {"moved": 10}
+    assert _other_worker(job.id).result == {"moved": 10}
+    assert jobs.active("folder_merge", source_id=1) is None
+
+def test_failed_job_reports_error(client, db):
+    def boom(job): raise RuntimeError("disque plein")
+    job = jobs.start("folder_move", boom, {"folder_id": 1})
+    j = _wait(job.id)
+    assert j.state == "error" and j.error == "disque plein"
+
+def test_job_of_dead_worker_is_lost(client, db):
+    T = jobs._table()
+    old = time.time() - jobs.STALE - 1
+    db.session.execute(T.insert().values(id="deadbeef0000", kind="folder_move", state="running",
+                                         params=json.dumps({"folder_id": 7}), started_at=old, updated_at=old))
+    db.session.commit()
+    assert jobs.active("folder_move", folder_id=7) is None
+    r = client.get("/api/jobs/deadbeef0000").get_json()["job"]
+    assert r["state"] == "error"
+
+def test_unknown_job_is_404(client, db):
+    assert client.get("/api/jobs/nope").status_code == 404
@@ -0,0 +1,62 @@
+# tests/test_reconcile.py — storage/reconcile.py contre le stockage en mémoire
+from datetime import datetime, timedelta
+from storage import BASE_FOLDER
+from storage.reconcile import reconcile
+from models import Folder, Media
+
+OLD = datetime.utcnow() - timedelta(days=1)
+
+def _row(db, public_id, url, folder):
+    m = Media(public_id=public_id, url=url, folder_id=folder.id, created_at=OLD)
+    db.session.add(m)
+    return m
+
+def _setup(db, storage):
+    """3 fichiers distants : a et b connus de la base, orphan inconnu ; ligne lost sans fichier."""
+    f = Folder(name="General"); db.session.add(f); db.session.flush()
+    for name in ("a.jpg", "b.jpg", "orphan.jpg"):
+        storage.add(f"{BASE_FOLDER}/General/{name}")
+    for name in ("a.jpg", "b.jpg", "lost.jpg"):
+        pid = f"{BASE_FOLDER}/General/{name}"
+        _row(db, pid, storage.url(pid), f)
+    # même dossier, autre backend : jamais « manquant » pour le stockage en mémoire
+    _row(db, f"{BASE_FOLDER}/General/local.jpg", f"/media/{BASE_FOLDER}/General/local.jpg", f)
+    db.session.commit()
+
+def test_dry_run_reports_without_changes(db, storage):
+    _setup(db, storage)
+    r = reconcile(storage, grace_seconds=0)
+    assert (r["remote"], r["orphans"], r["missing"]) == (3, 1, 1)
+    assert r["orphan_samples"] == [f"{BASE_FOLDER}/General/orphan.jpg"]
+    assert r["missing_samples"] == [f"{BASE_FOLDER}/General/lost.jpg"]
+    assert (r["deleted_remote"], r["deleted_db"]) == (0, 0)
+    assert storage.deleted == [] and db.session.query(Media).count() == 4
+
+def test_fix_orphans_deletes_remote_only(db, storage):
+    _setup(db, storage)
+    r = reconcile(storage, fix_orphans=True, grace_seconds=0)
+    assert r["deleted_remote"] == 1
+    assert storage.deleted == [f"{BASE_FOLDER}/General/orphan.jpg"]
+    assert db.session.query(Media).count() == 4
+
+def test_fix_missing_deletes_row_of_this_backend(db, storage):
+    _setup(db, storage)
+    r = reconcile(storage, fix_missing=True, grace_seconds=0)
+    assert r["deleted_db"] == 1 and storage.deleted == []
+    left = {m.public_id.rsplit("/", 1)[1] for m in db.session.query(Media)}
+    assert left == {"a.jpg", "b.jpg", "local.jpg"}
+
+def test_grace_period_skips_recent_rows(db, storage):
+    _setup(db, storage)
+    db.session.query(Media).update({"created_at": datetime.utcnow()})
+    db.session.commit()
+    r = reconcile(storage, fix_missing=True, grace_seconds=3600)
+    assert r["missing"] == 0 and db.session.query(Media).count() == 4
+
+def test_failed_prefix_is_excluded(db, storage):
+    _setup(db, storage)
+    def broken(prefix, page_size=None):
+        raise ConnectionError("listing")
+    storage.list = broken
+    r = reconcile(storage, fix_missing=True, grace_seconds=0)
+    assert r["errors"] and r["missing"] == 0 and db.session.query(Media).count() == 4
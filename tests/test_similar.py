@@ -0,0 +1,110 @@
+# tests/test_similar.py — api/similar.py : empreinte dHash, recherche par distance, doublons
+import pytest
+from PIL import Image, ImageDraw, ImageEnhance
+from api import similar
+from models import Folder, Media
+
+def _picture(seed: int) -> Image.Image:
+    """Image synthétique : dégradé + quelques formes placées selon seed."""
+    im = Image.linear_gradient("L").resize((320, 240)).convert("RGB")
+    d = ImageDraw.Draw(im)
+    for k in range(4):
+        x, y = (seed * 97 + k * 61) % 260, (seed * 53 + k * 89) % 180
+        d.rectangle((x, y, x + 50, y + 50), fill=((seed * 40) % 255, 255 - k * 50, (k * 70) % 255))
+    return im
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """Chaque test tourne avec NumPy (si installé) et avec le repli en Python pur."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(similar, "_np", lambda: None)
+    similar._index.invalidate()
+    yield request.param
+    similar._index.invalidate()
+
+def _dist(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def test_dhash_is_stable_under_resize_and_brightness():
+    im = _picture(1)
+    h = similar.dhash(im)
+    assert 0 <= h < 1 << 64
+    # copies retouchées : sous le seuil des doublons
+    assert _dist(h, similar.dhash(im.resize((160, 120)))) <= similar.DUP_THRESHOLD
+    assert _dist(h, similar.dhash(ImageEnhance.Brightness(im).enhance(1.15))) <= similar.DUP_THRESHOLD
+    assert _dist(h, similar.dhash(im.transpose(Image.FLIP_LEFT_RIGHT))) > 20
+    assert _dist(h, similar.dhash(_picture(2))) > similar.DUP_THRESHOLD
+
+def test_db_roundtrip_keeps_all_bits():
+    for h in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        v = similar.to_db(h)
+        assert -(1 << 63) <= v < 1 << 63 and similar.from_db(v) == h
+
+@pytest.mark.parametrize("t", [0, 1, 6, 10])
+def test_bands_cover_64_bits(t):
+    bands = similar._bands(t)
+    assert len(bands) == t + 1
+    assert bands[0][0] == 0 and sum(w for _, w in bands) == 64
+    assert all(o2 == o1 + w1 for (o1, w1), (o2, _) in zip(bands, bands[1:]))
+
+def _seed(db, hashes: dict, folder_of=lambda name: "A") -> dict:
+    folders, ids = {}, {}
+    for name, h in hashes.items():
+        fname = folder_of(name)
+        if fname not in folders:
+            folders[fname] = Folder(name=fname); db.session.add(folders[fname]); db.session.flush()
+        m = Media(url=f"memory://image/{name}", public_id=name, folder_id=folders[fname].id,
+                  phash=similar.to_db(h), width=100, height=100)
+        db.session.add(m); db.session.flush()
+        ids[name] = m.id
+    db.session.commit()
+    return ids, {k: f.id for k, f in folders.items()}
+
+BASE = 0xF0F0_1234_5678_9ABC
+
+def test_nearest_orders_by_distance(db, backend):
+    ids, _ = _seed(db, {"same": BASE, "d1": BASE ^ 1, "d3": BASE ^ 0b111 << 40, "far": ~BASE & (1 << 64) - 1})
+    hits = similar.nearest(BASE, threshold=4)
+    assert hits == [(ids["same"], 0), (ids["d1"], 1), (ids["d3"], 3)]
+    assert similar.nearest(BASE, threshold=0) == [(ids["same"], 0)]
+    assert similar.nearest(BASE, threshold=64, limit=2) == hits[:2]
+
+def test_nearest_filters_by_folder(db, backend):
+    ids, folders = _seed(db, {"a": BASE, "b": BASE ^ 2}, folder_of=lambda n: n.upper())
+    assert similar.nearest(BASE, 8, folder_id=folders["B"]) == [(ids["b"], 1)]
+
+def test_find_duplicates_groups_and_keep(db, backend):
+    near = {
+        # groupe 1 : chaîne x — y — z (x et z à distance 8, réunis par transitivité)
+        "x": BASE, "y": BASE ^ 0xF, "z": BASE ^ 0xFF,
+        # groupe 2 : bits différents dans plusieurs bandes
+        "p": 0x0123_4567_89AB_CDEF, "q": 0x0123_4567_89AB_CDEF ^ (1 << 63 | 1 << 31 | 1),
+        "alone": 0xAAAA_AAAA_AAAA_AAAA,
+    }
+    ids, _ = _seed(db, near)
+    db.session.get(Media, ids["q"]).width = 400          # plus grande : gardée
+    db.session.commit()
+    r = similar.find_duplicates(threshold=4)
+    groups = {tuple(g["ids"]): g["keep"] for g in r["groups"]}
+    assert groups == {(ids["x"], ids["y"], ids["z"]): ids["x"], (ids["p"], ids["q"]): ids["q"]}
+    assert r["photos"] == 6 and r["duplicates"] == 3
+    assert similar.find_duplicates(threshold=0)["groups"] == []
+
+def test_find_duplicates_matches_brute_force(db, backend):
+    import random
+    rnd = random.Random(7)
+    hashes = {}
+    for i in range(120):
+        h = rnd.getrandbits(64)
+        hashes[f"r{i}"] = h
+        for k in range(rnd.randrange(3)):      # quelques copies légèrement modifiées
+            hashes[f"r{i}c{k}"] = h ^ (1 << rnd.randrange(64)) ^ (1 << rnd.randrange(64))
+    ids, _ = _seed(db, hashes)
+    by_id = {ids[n]: h for n, h in hashes.items()}
+    pairs = {frozenset((a, b)) for a in by_id for b in by_id if a < b and _dist(by_id[a], by_id[b]) <= 4}
+    got = similar.find_duplicates(threshold=4)["groups"]
+    for a, b in map(tuple, pairs):
+        assert any(a in g["ids"] and b in g["ids"] for g in got)
+    assert sum(len(g["ids"]) for g in got) == len({m for p in pairs for m in p})
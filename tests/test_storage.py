@@ -0,0 +1,27 @@
+# tests/test_storage.py — storage/base.py : contrat des backends (méthodes abstraites)
+import pytest
+from storage.base import Storage
+from storage.local import LocalStorage
+from storage.memory import MemoryStorage
+
+REQUIRED = {"put", "delete", "rename", "url", "stream"}
+
+def test_required_methods_are_abstract():
+    assert Storage.__abstractmethods__ == REQUIRED
+    with pytest.raises(TypeError):
+        Storage()
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class Partial(Storage):
+        def put(self, fileobj, folder, filename): return {}
+    with pytest.raises(TypeError, match="delete"):
+        Partial()
+
+@pytest.mark.parametrize("cls", [LocalStorage, MemoryStorage])
+def test_backends_implement_the_contract(cls, tmp_path):
+    backend = cls(str(tmp_path)) if cls is LocalStorage else cls()
+    assert not type(backend).__abstractmethods__
+
+def test_cloudinary_backend_implements_the_contract():
+    mod = pytest.importorskip("storage.cloudinary_backend")
+    assert not mod.CloudinaryStorage.__abstractmethods__
@@ -0,0 +1,44 @@
+# tests/test_upload.py — upload : métadonnées sans téléchargement dans la requête
+import io, time
+from PIL import Image
+import jobs
+from api import metadata, similar
+from models import Media
+
+def _jpeg(size=(300, 200)) -> io.BytesIO:
+    b = io.BytesIO(); Image.new("RGB", size, "teal").save(b, "JPEG"); b.seek(0)
+    return b
+
+def _upload(client, name="a.jpg"):
+    return client.post("/api/media/upload", data={"image": (_jpeg(), name)}, content_type="multipart/form-data")
+
+def _wait(kind, timeout=10):
+    end = time.monotonic() + timeout
+    while (job := jobs.active(kind)) and time.monotonic() < end:
+        time.sleep(0.05)
+    assert job is None, f"job {kind} non terminé"
+
+def test_remote_upload_defers_metadata_to_background(client, db, storage, monkeypatch):
+    def no_download(*a, **k): raise AssertionError("original téléchargé pendant la requête")
+    scheduled = []
+    monkeypatch.setattr(storage, "stream", no_download)
+    monkeypatch.setattr(metadata, "schedule", lambda: scheduled.append(True))
+    r = _upload(client)
+    assert r.status_code == 201 and scheduled
+    mid = r.get_json()["media"]["id"]
+    assert db.session.get(Media, mid).mime is None
+    monkeypatch.undo()
+    metadata.schedule()                   # tâche de fond : extraction, puis empreinte
+    _wait("metadata"); _wait("phash")
+    db.session.expire_all()
+    m = db.session.get(Media, mid)
+    assert (m.mime, m.width, m.height) == ("image/jpeg", 300, 200)
+    assert m.phash is not None
+
+def test_scheduling_failure_keeps_201(client, db, storage, monkeypatch):
+    def boom(*a, **k): raise RuntimeError("pool plein")
+    monkeypatch.setattr(metadata, "schedule", boom)
+    monkeypatch.setattr(similar, "schedule", boom)
+    r = _upload(client)
+    assert r.status_code == 201 and r.get_json()["ok"] is True
+    assert db.session.query(Media).count() == 1
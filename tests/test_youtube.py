@@ -0,0 +1,68 @@
+# tests/test_youtube.py — liens YouTube via YOUTUBE_FIXTURES (sans réseau)
+import io, json
+import pytest
+from PIL import Image
+from api import youtube
+from models import Media
+
+VID = "dQw4w9WgXcQ"
+
+@pytest.fixture
+def fixtures(tmp_path, monkeypatch):
+    """Une vidéo connue (titre, durée, miniature) ; tout autre id = vidéo inconnue."""
+    (tmp_path / f"{VID}.json").write_text(json.dumps({"title": "Never Gonna", "duration": 213}))
+    Image.new("RGB", (480, 360), "navy").save(tmp_path / f"{VID}.jpg", "JPEG")
+    monkeypatch.setenv("YOUTUBE_FIXTURES", str(tmp_path))
+    # résolution synchrone : le test lit le résultat juste après la requête
+    monkeypatch.setattr(youtube, "schedule", lambda: youtube.backfill())
+    return tmp_path
+
+def _add(client, url):
+    return client.post("/api/media/add_youtube", json={"url": url})
+
+def test_add_youtube_resolves_title_and_mirrors_thumbnail(client, db, fixtures):
+    r = _add(client, f"https://www.youtube.com/watch?v={VID}")
+    assert r.status_code == 201
+    mid = r.get_json()["media"]["id"]
+    m = db.session.get(Media, mid)
+    db.session.refresh(m)
+    assert (m.public_id, m.title, m.duration) == (f"yt:{VID}", "Never Gonna", 213.0)
+
+    item = client.get("/api/media/list").get_json()["items"][0]
+    assert item["title"] == "Never Gonna"
+    assert item["thumb"] == f"/thumb/{mid}/auto"           # miniature recopiée, plus youtube.com
+    t = client.get(f"/thumb/{mid}/s", headers={"Accept": "image/webp"})
+    assert t.status_code == 200 and t.mimetype == "image/webp"
+    assert Image.open(io.BytesIO(t.data)).size == (240, 160)
+
+def test_unknown_video_is_resolved_without_title(client, db, fixtures):
+    r = _add(client, "https://youtu.be/unknown123")
+    m = db.session.get(Media, r.get_json()["media"]["id"])
+    db.session.refresh(m)
+    assert m.title == ""
+    assert r.get_json()["media"]["thumb"].startswith("https://img.youtube.com/")
+
+def test_duplicate_link_returns_existing(client, db, fixtures):
+    first = _add(client, f"https://www.youtube.com/watch?v={VID}").get_json()["media"]
+    r = _add(client, f"https://youtu.be/{VID}")
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["existing"] is True and body["media"]["id"] == first["id"]
+    assert db.session.query(Media).count() == 1
+
+@pytest.mark.parametrize("url", ["https://www.youtube.com/", "https://www.youtube.com/watch?v=",
+                                 "https://example.com/watch?v=dQw4w9WgXcQ", ""])
+def test_bad_url_is_rejected(client, db, fixtures, url):
+    r = _add(client, url)
+    assert r.status_code == 400 and r.get_json()["error"] == "bad_youtube_url"
+    assert db.session.query(Media).count() == 0
+
+def test_thumbnail_routing_follows_the_mirrored_file(client, db, fixtures):
+    mid = _add(client, f"https://youtu.be/{VID}").get_json()["media"]["id"]
+    m = db.session.get(Media, mid)
+    db.session.refresh(m)
+    m.content_hash = "0" * 64              # autre écrivain de content_hash : pas de miniature derrière
+    db.session.commit()
+    item = client.get("/api/media/list").get_json()["items"][0]
+    assert item["thumb"] == f"https://img.youtube.com/vi/{VID}/hqdefault.jpg"
+    assert client.get(f"/thumb/{mid}/s").status_code == 404
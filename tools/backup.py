@@ -0,0 +1,272 @@
+# tools/backup.py — sauvegarde incrémentale par blocs adressés par contenu (PC privé / clé USB)
+# Usage (depuis la racine du projet) :
+#   python tools/backup.py backup  /e/galerie-backup          # instantané DB + médias locaux
+#   python tools/backup.py restore /e/galerie-backup [--snapshot ID] [--delete]
+#   python tools/backup.py verify  /e/galerie-backup          # relit et contrôle tous les blocs
+#   python tools/backup.py prune   /e/galerie-backup --keep 7 # garde les 7 derniers instantanés
+#
+# Dépôt cible :
+#   blocks/<2 hex>/<sha256>       blocs bruts, écrits une seule fois (jamais réécrits)
+#   snapshots/<AAAAMMJJ-HHMMSS>.json
+#       {"files": {"db/gallery.db": {"size", "mtime", "block_size", "blocks": [sha256…]},
+#                  "media/<public_id>": {…}}}
+# Restaurer avec l'application arrêtée (la base est remplacée d'un bloc).
+# <dépôt>/.lock : posé par backup et prune (exclusifs) — prune supprime les blocs qu'aucun
+# manifeste ne cite, donc aussi ceux d'une sauvegarde en cours dont le manifeste manque encore.
+# Verrou resté après un arrêt brutal : vérifier qu'aucune commande ne tourne, puis le supprimer.
+# La DB est copiée à chaud par l'API backup de SQLite (instantané cohérent même si
+# l'application tourne), puis découpée en blocs fixes alignés sur les pages : une
+# modification de quelques lignes ne produit que quelques blocs neufs. Les médias
+# inchangés (taille + mtime identiques au dernier instantané) ne sont même pas relus.
+import os, sys, json, time, shutil, sqlite3, hashlib, argparse, tempfile, threading, contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+BASE       = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB         = os.getenv("BACKUP_DB") or os.path.join(BASE, "instance", "gallery.db")
+MEDIA_ROOT = os.getenv("MEDIA_ROOT") or os.path.join(BASE, "instance", "media")
+DB_BLOCK    = 1 << 20        # 1 Mio : multiple de toute taille de page SQLite
+MEDIA_BLOCK = 4 << 20
+WORKERS     = min(8, (os.cpu_count() or 2) * 2)
+
+_stats_lock = threading.Lock()
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _block_path(repo: str, h: str) -> str:
+    return os.path.join(repo, "blocks", h[:2], h)
+
+def _read_blocks(path: str, block_size: int):
+    with open(path, "rb") as f:
+        while chunk := f.read(block_size):
+            yield chunk
+
+# ─── Sauvegarde ──────────────────────────────────────────────────────────────
+def _store(repo: str, data: bytes, stats: dict) -> str:
+    h = _sha(data)
+    dest = _block_path(repo, h)
+    if os.path.exists(dest):
+        with _stats_lock: stats["reused"] += 1
+        return h
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data); f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, dest)
+    with _stats_lock: stats["written"] += 1; stats["bytes"] += len(data)
+    return h
+
+def _store_file(repo: str, path: str, block_size: int, stats: dict) -> dict:
+    st = os.stat(path)
+    blocks = [_store(repo, b, stats) for b in _read_blocks(path, block_size)]
+    return {"size": st.st_size, "mtime": int(st.st_mtime), "block_size": block_size, "blocks": blocks}
+
+def _snapshot_db(dest: str):
+    """Copie cohérente d'une base SQLite en service (API backup, page par page)."""
+    src = sqlite3.connect(DB)
+    dst = sqlite3.connect(dest)
+    try:
+        src.backup(dst, pages=1024)
+    finally:
+        dst.close(); src.close()
+
+@contextlib.contextmanager
+def _locked(repo: str, what: str):
+    path = os.path.join(repo, ".lock")
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        with open(path, encoding="utf-8") as f:
+            held = f.read().strip() or "?"
+        sys.exit(f"❌ dépôt verrouillé ({held}) : {what} refusé. Verrou périmé ? supprimer {path}")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(f"{what} pid {os.getpid()} depuis {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    try:
+        yield
+    finally:
+        os.remove(path)
+
+def _latest(repo: str) -> tuple[str | None, dict]:
+    snaps = sorted(os.listdir(os.path.join(repo, "snapshots"))) if os.path.isdir(os.path.join(repo, "snapshots")) else []
+    snaps = [s[:-5] for s in snaps if s.endswith(".json")]
+    return (snaps[-1], _load(repo, snaps[-1])) if snaps else (None, {"files": {}})
+
+def _load(repo: str, snap_id: str) -> dict:
+    with open(os.path.join(repo, "snapshots", f"{snap_id}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def backup(repo: str) -> str:
+    os.makedirs(os.path.join(repo, "snapshots"), exist_ok=True)
+    with _locked(repo, "backup"):
+        return _backup(repo)
+
+def _backup(repo: str) -> str:
+    t0 = time.time()
+    _, prev = _latest(repo)
+    stats = {"written": 0, "reused": 0, "bytes": 0, "unchanged": 0}
+    files = {}
+
+    if os.path.exists(DB):
+        with tempfile.TemporaryDirectory() as tmp:
+            snap = os.path.join(tmp, "gallery.db")
+            _snapshot_db(snap)
+            files["db/gallery.db"] = _store_file(repo, snap, DB_BLOCK, stats)
+
+    def one(rel: str, path: str):
+        st, old = os.stat(path), prev["files"].get(rel)
+        if old and old["size"] == st.st_size and old["mtime"] == int(st.st_mtime) \
+                and all(os.path.exists(_block_path(repo, h)) for h in old["blocks"]):
+            with _stats_lock: stats["unchanged"] += 1
+            return rel, old
+        return rel, _store_file(repo, path, MEDIA_BLOCK, stats)
+
+    todo = []
+    for root, _dirs, names in os.walk(MEDIA_ROOT):
+        for n in names:
+            if n.startswith(".up-"): continue            # upload en cours d'écriture
+            path = os.path.join(root, n)
+            todo.append(("media/" + os.path.relpath(path, MEDIA_ROOT).replace(os.sep, "/"), path))
+    with ThreadPoolExecutor(WORKERS) as ex:
+        for rel, entry in ex.map(lambda a: one(*a), todo):
+            files[rel] = entry
+
+    snap_id = stamp = time.strftime("%Y%m%d-%H%M%S")
+    n = 1
+    while os.path.exists(os.path.join(repo, "snapshots", f"{snap_id}.json")):
+        n += 1; snap_id = f"{stamp}-{n}"
+    manifest = {"created_at": time.time(), "files": files}
+    out = os.path.join(repo, "snapshots", f"{snap_id}.json")
+    with open(out + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(out + ".tmp", out)
+    print(f"✅ instantané {snap_id} : {len(files)} fichiers ({stats['unchanged']} inchangés), "
+          f"{stats['written']} blocs écrits ({stats['bytes'] / 1e6:.1f} Mo), {stats['reused']} réutilisés "
+          f"— {time.time() - t0:.1f}s")
+    return snap_id
+
+# ─── Restauration ────────────────────────────────────────────────────────────
+def _dest_for(rel: str) -> str:
+    if rel.startswith("db/"): return DB
+    return os.path.join(MEDIA_ROOT, *rel[len("media/"):].split("/"))
+
+def _stale_blocks(path: str, entry: dict) -> list[int]:
+    """Indices des blocs à réécrire (vérification du fichier en place)."""
+    n = len(entry["blocks"])
+    if not os.path.exists(path): return list(range(n))
+    if os.path.getsize(path) != entry["size"]:
+        have = []
+    else:
+        have = [_sha(b) for b in _read_blocks(path, entry["block_size"])]
+    return [i for i, h in enumerate(entry["blocks"]) if i >= len(have) or have[i] != h]
+
+def _read_block(repo: str, h: str) -> bytes:
+    with open(_block_path(repo, h), "rb") as f:
+        data = f.read()
+    if _sha(data) != h:
+        raise IOError(f"bloc corrompu : {h}")
+    return data
+
+def _patch(repo: str, path: str, entry: dict, stale: list[int]):
+    """Réécrit seulement les blocs fautifs sur une copie, puis la substitue d'un bloc."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.restore-tmp"
+    if os.path.exists(path) and len(stale) < len(entry["blocks"]):
+        shutil.copyfile(path, tmp)
+        mode = "r+b"
+    else:
+        mode = "wb"
+    bs = entry["block_size"]
+    with open(tmp, mode) as f:
+        for i in stale:
+            f.seek(i * bs); f.write(_read_block(repo, entry["blocks"][i]))
+        f.truncate(entry["size"]); f.flush(); os.fsync(f.fileno())
+    if path == DB:
+        # un journal WAL restant s'appliquerait par-dessus la base restaurée
+        for ext in ("-wal", "-shm"):
+            if os.path.exists(path + ext): os.remove(path + ext)
+    os.replace(tmp, path)
+    os.utime(path, (time.time(), entry["mtime"]))
+
+def restore(repo: str, snap_id: str | None = None, delete: bool = False):
+    t0 = time.time()
+    snap_id, manifest = (snap_id, _load(repo, snap_id)) if snap_id else _latest(repo)
+    if not snap_id:
+        sys.exit("❌ aucun instantané dans " + repo)
+    files = manifest["files"]
+
+    def check(rel: str):
+        return rel, _stale_blocks(_dest_for(rel), files[rel])
+
+    # vérification en parallèle (le hachage libère le GIL), réécriture des seuls blocs fautifs
+    with ThreadPoolExecutor(WORKERS) as ex:
+        todo = [(rel, stale) for rel, stale in ex.map(check, files) if stale]
+        for _ in ex.map(lambda a: _patch(repo, _dest_for(a[0]), files[a[0]], a[1]), todo):
+            pass
+    patched, blocks = len(todo), sum(len(s) for _, s in todo)
+
+    removed = 0
+    if delete and os.path.isdir(MEDIA_ROOT):
+        keep = {os.path.normcase(os.path.abspath(_dest_for(r))) for r in files if r.startswith("media/")}
+        for root, _dirs, names in os.walk(MEDIA_ROOT):
+            for n in names:
+                p = os.path.join(root, n)
+                if os.path.normcase(os.path.abspath(p)) not in keep:
+                    os.remove(p); removed += 1
+    print(f"✅ instantané {snap_id} restauré : {len(files)} fichiers vérifiés, {patched} mis à jour "
+          f"({blocks} blocs), {removed} supprimés — {time.time() - t0:.1f}s")
+
+# ─── Contrôle et ménage ──────────────────────────────────────────────────────
+def _referenced(repo: str) -> set:
+    refs = set()
+    for s in os.listdir(os.path.join(repo, "snapshots")):
+        if s.endswith(".json"):
+            for entry in _load(repo, s[:-5])["files"].values():
+                refs.update(entry["blocks"])
+    return refs
+
+def verify(repo: str) -> int:
+    refs = sorted(_referenced(repo))
+    def ok(h):
+        try:
+            _read_block(repo, h); return None
+        except (IOError, OSError) as e:
+            return f"{h}: {e}"
+    with ThreadPoolExecutor(WORKERS) as ex:
+        bad = [e for e in ex.map(ok, refs) if e]
+    for e in bad: print("❌", e)
+    print(f"{'✅' if not bad else '⚠️ '} {len(refs)} blocs contrôlés, {len(bad)} en erreur")
+    return 1 if bad else 0
+
+def prune(repo: str, keep: int):
+    if keep < 1:
+        sys.exit("❌ --keep doit valoir au moins 1")
+    with _locked(repo, "prune"):
+        snaps = sorted(s for s in os.listdir(os.path.join(repo, "snapshots")) if s.endswith(".json"))
+        removed = snaps[:-keep]
+        for s in removed:
+            os.remove(os.path.join(repo, "snapshots", s))
+        refs, freed = _referenced(repo), 0
+        for root, _dirs, names in os.walk(os.path.join(repo, "blocks")):
+            for n in names:
+                if n not in refs:
+                    p = os.path.join(root, n); freed += os.path.getsize(p); os.remove(p)
+    print(f"✅ {len(removed)} instantanés retirés, {freed / 1e6:.1f} Mo libérés")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sauvegarde incrémentale DB SQLite + médias locaux")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("backup", "restore", "verify", "prune"):
+        p = sub.add_parser(name); p.add_argument("repo", help="dossier du dépôt (ex. /e/galerie-backup)")
+        if name == "restore":
+            p.add_argument("--snapshot", help="identifiant d'instantané (défaut : le plus récent)")
+            p.add_argument("--delete", action="store_true", help="supprime les médias absents de l'instantané")
+        if name == "prune":
+            p.add_argument("--keep", type=int, default=7)
+    a = ap.parse_args(argv)
+    if a.cmd == "backup":  backup(a.repo)
+    if a.cmd == "restore": restore(a.repo, a.snapshot, a.delete)
+    if a.cmd == "verify":  sys.exit(verify(a.repo))
+    if a.cmd == "prune":   prune(a.repo, a.keep)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# tools/bench_phash.py — temps de recherche des photos proches (api/similar.py) sans base
+# Usage (depuis la racine du projet) :
+#   python tools/bench_phash.py                        # 10k, 50k, 100k empreintes, seuil 6
+#   python tools/bench_phash.py --sizes 100000 --threshold 10 --dup-rate 0.05
+#
+# Empreintes aléatoires (uniformes) + une part de copies à 1-3 bits près (rafales).
+# Mesure nearest (/api/media/similar) et la recherche de paires des doublons (_pairs),
+# avec NumPy puis en Python pur (--no-python pour sauter ce dernier, lent au-delà de 50k).
+# Des photos réelles remplissent les cases moins uniformément : ordre de grandeur seulement.
+import os, sys, time, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import similar
+
+def make(n: int, dup_rate: float, rnd: random.Random) -> list[int]:
+    out = []
+    while len(out) < n:
+        h = rnd.getrandbits(64)
+        out.append(h)
+        if rnd.random() < dup_rate:
+            for _ in range(rnd.randint(1, 3)):
+                h ^= 1 << rnd.randrange(64)
+            out.append(h)
+    return out[:n]
+
+def run(hashes: list[int], threshold: int, np) -> dict:
+    n = len(hashes)
+    ids, folders = list(range(1, n + 1)), [0] * n
+    if np is not None:
+        data = (np.array(ids, dtype=np.int64), np.array(folders, dtype=np.int64), np.array(hashes, dtype=np.uint64))
+    else:
+        data = (ids, folders, hashes)
+    similar._np = lambda: np
+    similar._index._data, similar._index._at = data, float("inf")      # index déjà chargé
+    t0 = time.perf_counter()
+    for h in hashes[:20]:
+        similar.nearest(h, similar.SIMILAR_MAX)
+    t_near = (time.perf_counter() - t0) / 20
+    t0 = time.perf_counter()
+    pairs = similar._pairs(np, data[2], threshold)
+    return {"nearest_ms": t_near * 1000, "pairs_s": time.perf_counter() - t0, "pairs": len(pairs)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", default="10000,50000,100000")
+    ap.add_argument("--threshold", type=int, default=similar.DUP_THRESHOLD)
+    ap.add_argument("--dup-rate", type=float, default=0.02)
+    ap.add_argument("--no-python", action="store_true", help="NumPy seulement")
+    a = ap.parse_args()
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+        print("NumPy absent : Python pur seulement")
+    modes = ([("numpy", numpy)] if numpy is not None else []) + ([] if a.no_python else [("python", None)])
+    print(f"{'photos':>8} {'mode':>7} {'nearest':>10} {'doublons':>10} {'paires':>8}")
+    for n in (int(x) for x in a.sizes.split(",")):
+        hashes = make(n, a.dup_rate, random.Random(n))
+        for name, np in modes:
+            r = run(hashes, a.threshold, np)
+            print(f"{n:>8} {name:>7} {r['nearest_ms']:>8.2f}ms {r['pairs_s']:>9.2f}s {r['pairs']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# tools/bench_server.py — comparaison des profils de gunicorn.conf.py (asgi, gthread, gevent)
+# Usage (depuis la racine du projet, base locale de préférence) :
+#   python tools/bench_server.py                               # tous les profils disponibles
+#   python tools/bench_server.py --profiles asgi,gthread --streams 200 --duration 30
+#   python tools/bench_server.py --url https://galerie.example  # serveur déjà lancé (pas de mémoire)
+#
+# Charge mixte représentative : --streams flux SSE /api/events tenus ouverts pendant que
+# --clients clients enchaînent des lectures JSON (pages de dossiers, listes de médias).
+# Par profil : requêtes/s, latences p50/p95/p99, erreurs, flux encore ouverts à la fin
+# et mémoire PSS totale (maître + workers, pages partagées par préchargement comptées une fois).
+import os, sys, time, signal, argparse, tempfile, threading, subprocess
+import httpx
+
+BASE  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ["/api/folders/page?limit=50", "/api/media/list?limit=60", "/api/folders/list"]
+
+def _children(pid: int) -> list[int]:
+    out = []
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                out += [int(c) for c in f.read().split()]
+        except OSError:
+            pass
+    return out
+
+def pss_mb(pid: int) -> float | None:
+    """PSS cumulée du process et de ses descendants (Linux uniquement)."""
+    total, todo = 0, [pid]
+    try:
+        while todo:
+            p = todo.pop()
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                total += next(int(l.split()[1]) for l in f if l.startswith("Pss:"))
+            todo += _children(p)
+    except (OSError, StopIteration):
+        return None
+    return total / 1024
+
+def _pct(values: list, q: float) -> float:
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+def _hold_stream(url: str, stop: threading.Event, alive: list):
+    try:
+        with httpx.Client(timeout=httpx.Timeout(10, read=None)) as c:
+            with c.stream("GET", url + "/api/events") as r:
+                if r.status_code != 200: return
+                alive.append(1)
+                try:
+                    for _ in r.iter_lines():
+                        if stop.is_set(): break
+                finally:
+                    alive.pop()
+    except httpx.HTTPError:
+        pass
+
+def _client(url: str, stop: threading.Event, lat: list, errors: list, i: int):
+    with httpx.Client(base_url=url, timeout=30) as c:
+        n = i
+        while not stop.is_set():
+            t = time.perf_counter()
+            try:
+                ok = c.get(PATHS[n % len(PATHS)]).status_code < 500
+            except httpx.HTTPError:
+                ok = False
+            (lat if ok else errors).append(time.perf_counter() - t)
+            n += 1
+
+def run(url: str, a, server_pid: int | None = None) -> dict:
+    stop, alive, lat, errors = threading.Event(), [], [], []
+    streams = [threading.Thread(target=_hold_stream, args=(url, stop, alive), daemon=True) for _ in range(a.streams)]
+    for t in streams: t.start()
+    time.sleep(2)                               # flux établis avant la mesure
+    opened = len(alive)
+    clients = [threading.Thread(target=_client, args=(url, stop, lat, errors, i), daemon=True) for i in range(a.clients)]
+    t0 = time.perf_counter()
+    for t in clients: t.start()
+    time.sleep(a.duration)
+    mem = pss_mb(server_pid) if server_pid else None
+    still = len(alive)
+    stop.set()
+    for t in clients: t.join(35)
+    elapsed = time.perf_counter() - t0
+    return {"rps": len(lat) / elapsed, "p50": _pct(lat, .50), "p95": _pct(lat, .95), "p99": _pct(lat, .99),
+            "errors": len(errors), "streams": f"{still}/{opened}", "pss": mem}
+
+def _wait_up(url: str, proc: subprocess.Popen, timeout: float = 60) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end and proc.poll() is None:
+        try:
+            if httpx.get(url + "/api/folders/list", timeout=2).status_code < 500: return True
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    return False
+
+def bench_profile(profile: str, a) -> dict | None:
+    env = {**os.environ, "WEB_PROFILE": profile, "PORT": str(a.port), "RATE_LIMIT": "0",
+           "WEB_LOG_LEVEL": "warning"}
+    if a.workers: env["WEB_CONCURRENCY"] = str(a.workers)
+    log = tempfile.TemporaryFile("w+")          # pas de tube : un journal bavard ne bloque pas le serveur
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"], cwd=BASE, env=env,
+                            stdout=subprocess.DEVNULL, stderr=log, text=True)
+    url = f"http://127.0.0.1:{a.port}"
+    try:
+        if not _wait_up(url, proc):
+            log.seek(0)
+            last = (log.read().strip().splitlines() or ["délai dépassé"])[-1]
+            print(f"⚠️  {profile} : démarrage impossible ({last})")
+            return None
+        return run(url, a, proc.pid)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(40)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Banc d'essai des profils serveur (gunicorn.conf.py)")
+    ap.add_argument("--profiles", default="asgi,gthread,gevent")
+    ap.add_argument("--url", help="serveur déjà lancé : mesure ce seul serveur")
+    ap.add_argument("--port", type=int, default=5055)
+    ap.add_argument("--workers", type=int, help="WEB_CONCURRENCY imposé (comparaison à nombre égal)")
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--streams", type=int, default=50, help="flux SSE tenus ouverts")
+    ap.add_argument("--duration", type=float, default=20, help="secondes de mesure par profil")
+    a = ap.parse_args(argv)
+
+    results = {}
+    if a.url:
+        results[a.url] = run(a.url.rstrip("/"), a)
+    else:
+        for profile in [p.strip() for p in a.profiles.split(",") if p.strip()]:
+            print(f"… {profile}")
+            if (r := bench_profile(profile, a)) is not None: results[profile] = r
+
+    print(f"\n{'profil':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'erreurs':>9}{'flux':>10}{'PSS Mo':>9}")
+    for name, r in results.items():
+        pss = f"{r['pss']:.0f}" if r["pss"] else "-"
+        print(f"{name:<10}{r['rps']:>9.1f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}"
+              f"{r['errors']:>9}{r['streams']:>10}{pss:>9}")
+
+if __name__ == "__main__":
+    main()
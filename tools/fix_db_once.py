@@ -18,7 +18,16 @@ def has_col(table, col):
 for tbl, col, sql in [
     ("media",  "created_at", "ALTER TABLE media  ADD COLUMN created_at TEXT"),
     ("folder", "created_at", "ALTER TABLE folder ADD COLUMN created_at TEXT"),
-    ("folder", "pinned",     "ALTER TABLE folder ADD COLUMN pinned INTEGER DEFAULT 0")
+    ("folder", "pinned",     "ALTER TABLE folder ADD COLUMN pinned INTEGER DEFAULT 0"),
+    ("media",  "content_hash", "ALTER TABLE media ADD COLUMN content_hash VARCHAR(64)"),
+    ("media",  "taken_at",   "ALTER TABLE media ADD COLUMN taken_at DATETIME"),
+    ("media",  "width",      "ALTER TABLE media ADD COLUMN width INTEGER"),
+    ("media",  "height",     "ALTER TABLE media ADD COLUMN height INTEGER"),
+    ("media",  "duration",   "ALTER TABLE media ADD COLUMN duration FLOAT"),
+    ("media",  "mime",       "ALTER TABLE media ADD COLUMN mime VARCHAR(100)"),
+    ("media",  "size_bytes", "ALTER TABLE media ADD COLUMN size_bytes BIGINT"),
+    ("media",  "phash",      "ALTER TABLE media ADD COLUMN phash BIGINT"),
+    ("media",  "title",      "ALTER TABLE media ADD COLUMN title VARCHAR(300)"),
 ]:
     try:
         if not has_col(tbl, col):
@@ -29,5 +38,39 @@ for tbl, col, sql in [
     except Exception as e:
         print("SKIP :", tbl, col, "-", e)
 
+cur.execute("""CREATE TABLE IF NOT EXISTS folder_stats (
+    folder_id INTEGER PRIMARY KEY REFERENCES folder(id) ON DELETE CASCADE,
+    media_count INTEGER NOT NULL DEFAULT 0, photos INTEGER NOT NULL DEFAULT 0,
+    videos INTEGER NOT NULL DEFAULT 0, audio INTEGER NOT NULL DEFAULT 0,
+    documents INTEGER NOT NULL DEFAULT 0, last_added_at DATETIME, cover_media_id INTEGER)""")
+print("TABLE: folder_stats (remplir avec : flask folders rebuild-stats)")
+
+cur.execute("""CREATE TABLE IF NOT EXISTS change_event (
+    id INTEGER PRIMARY KEY, created_at DATETIME NOT NULL, entity VARCHAR(16) NOT NULL,
+    op VARCHAR(16) NOT NULL, entity_id INTEGER, data TEXT)""")
+print("TABLE: change_event")
+
+# doublons de public_id (anciens add_youtube) : même règle que la migration a1c0f2d9e3b4 —
+# id le plus bas conservé, doublon exact supprimé, les autres suffixés « ~<id> »
+cur.execute("""DELETE FROM media WHERE EXISTS (SELECT 1 FROM media k WHERE k.public_id = media.public_id
+               AND k.id < media.id AND k.url = media.url AND k.folder_id IS media.folder_id)""")
+cur.execute("""UPDATE media SET public_id = substr(public_id, 1, 255 - length('~' || id)) || '~' || id
+               WHERE EXISTS (SELECT 1 FROM media k WHERE k.public_id = media.public_id AND k.id < media.id)""")
+if cur.rowcount: print("DEDUP: media.public_id,", cur.rowcount, "renommés")
+
+for name, sql in [
+    ("uq_media_public_id", "CREATE UNIQUE INDEX IF NOT EXISTS uq_media_public_id ON media(public_id)"),
+    ("ix_media_folder_id", "CREATE INDEX IF NOT EXISTS ix_media_folder_id ON media(folder_id, id)"),
+    ("ix_media_taken_at", "CREATE INDEX IF NOT EXISTS ix_media_taken_at ON media(taken_at, id)"),
+    ("ix_media_folder_taken", "CREATE INDEX IF NOT EXISTS ix_media_folder_taken ON media(folder_id, taken_at, id)"),
+    ("ix_folder_created_at", "CREATE INDEX IF NOT EXISTS ix_folder_created_at ON folder(created_at, id)"),
+    ("ix_folder_stats_count", "CREATE INDEX IF NOT EXISTS ix_folder_stats_count ON folder_stats(media_count, folder_id)"),
+]:
+    try:
+        cur.execute(sql)
+        print("INDEX:", name)
+    except Exception as e:
+        print("SKIP :", name, "-", e)
+
 con.commit(); con.close()
 print("Done ->", DB)
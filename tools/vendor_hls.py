@@ -0,0 +1,37 @@
+# tools/vendor_hls.py — copie locale du lecteur hls.js (static/js/vendor/hls.min.js)
+# Usage (depuis la racine du projet) :
+#   python tools/vendor_hls.py              # version figée dans api/hls.py (HLS_JS_VERSION)
+#   python tools/vendor_hls.py --force      # retélécharge même si le fichier existe
+#
+# Une fois le fichier présent, /gallery le sert depuis /static (même origine, ?v=<mtime>)
+# et le service worker le précache : plus de requête vers le CDN. Le fichier est à committer ;
+# pour changer de version, modifier HLS_JS_VERSION puis relancer avec --force.
+import os, sys, base64, hashlib, argparse
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.hls import HLS_JS_VERSION, HLS_JS_VENDOR, HLS_JS_CDN
+
+DEST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", HLS_JS_VENDOR)
+
+def main():
+    ap = argparse.ArgumentParser(description="Télécharge hls.js dans static/js/vendor")
+    ap.add_argument("--force", action="store_true", help="remplace le fichier existant")
+    args = ap.parse_args()
+    if os.path.exists(DEST) and not args.force:
+        print(f"{DEST} existe déjà (--force pour remplacer)"); return
+    r = requests.get(HLS_JS_CDN, timeout=30)
+    r.raise_for_status()
+    body = r.content
+    if b"Hls" not in body[:200000]:
+        sys.exit(f"réponse inattendue de {HLS_JS_CDN} ({len(body)} octets)")
+    os.makedirs(os.path.dirname(DEST), exist_ok=True)
+    tmp = DEST + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(f"/* hls.js {HLS_JS_VERSION} — {HLS_JS_CDN} */\n".encode() + body)
+    os.replace(tmp, DEST)
+    sri = "sha384-" + base64.b64encode(hashlib.sha384(body).digest()).decode()
+    print(f"hls.js {HLS_JS_VERSION} → {DEST} ({len(body)} octets, {sri})")
+
+if __name__ == "__main__":
+    main()